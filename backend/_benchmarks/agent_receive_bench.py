@@ -0,0 +1,108 @@
+"""
+Benchmark: Agent receive loop, 100 ms polling vs event-driven
+
+N agents connect to a minimal in-process relay. Reports:
+    - idle CPU per agent (process CPU time while no message is sent)
+    - dispatch latency of `user_input` events (relay send -> handler called)
+
+for the old receive loop (`wait_for(ws.recv(), timeout=0.1)` in a loop) and for `Agent.main_loop`.
+
+Usage:
+    python _benchmarks/agent_receive_bench.py [--agents 20] [--idle 5] [--events 200]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import websockets
+
+from agent.abstract_agent import Agent
+
+class PollingAgent(Agent):
+    """The receive loop before it became event-driven"""
+
+    async def check_message(self):
+        try:
+            message = await asyncio.wait_for(self.ws.recv(), timeout=0.1)
+            return json.loads(message)
+        except (json.JSONDecodeError, asyncio.TimeoutError):
+            return None
+
+    async def main_loop(self):
+        while True:
+            try:
+                message = await self.check_message()
+                if not message or type(message) is not dict:
+                    continue
+                self.handle_message(message)
+            except websockets.ConnectionClosed:
+                break
+
+async def run(agent_cls: type[Agent], args) -> tuple[float, list[float]]:
+    connections = []
+    all_connected = asyncio.Event()
+
+    async def relay(ws):
+        connections.append(ws)
+        await ws.send(json.dumps({"type": "system", "message": "successfully connected", "capabilities": []}))
+        if len(connections) == args.agents:
+            all_connected.set()
+        await ws.wait_closed()
+
+    latencies: list[float] = []
+    async with websockets.serve(relay, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+
+        agents = []
+        for i in range(args.agents):
+            agent = agent_cls(f"ws://127.0.0.1:{port}", f"bench-{i}")
+
+            @agent.on("user_input")
+            def handle_user_input(_, time_iso, event_data):
+                latencies.append(time.perf_counter() - event_data["sent_at"])
+
+            agents.append(agent)
+        tasks = [asyncio.create_task(agent.run()) for agent in agents]
+        await all_connected.wait()
+        await asyncio.sleep(0.5)
+
+        # idle CPU
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        await asyncio.sleep(args.idle)
+        idle_cpu = (time.process_time() - cpu_start) / (time.perf_counter() - wall_start) / args.agents
+
+        # dispatch latency
+        for i in range(args.events):
+            ws = connections[i % len(connections)]
+            await ws.send(json.dumps({"time": "", "data": {"type": "user_input", "sent_at": time.perf_counter()}}))
+            await asyncio.sleep(args.interval_ms / 1000)
+        await asyncio.sleep(0.2)
+
+        for agent in agents:
+            await agent.stop()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return idle_cpu, latencies
+
+def describe(idle_cpu: float, latencies: list[float]) -> str:
+    q = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return f"idle CPU/agent {idle_cpu * 100:6.3f} %   dispatch p50 {q[49] * 1000:6.2f} ms   p99 {q[98] * 1000:6.2f} ms"
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, default=20, help="number of agents")
+    parser.add_argument("--idle", type=float, default=5, help="idle measurement time (s)")
+    parser.add_argument("--events", type=int, default=200, help="user_input events sent")
+    parser.add_argument("--interval-ms", type=float, default=7, help="interval between events (ms)")
+    args = parser.parse_args()
+
+    print(f"polling      | {describe(*await run(PollingAgent, args))}")
+    print(f"event-driven | {describe(*await run(Agent, args))}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
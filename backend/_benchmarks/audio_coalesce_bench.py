@@ -0,0 +1,110 @@
+"""
+Benchmark: one `say_aloud` event per TTS delta vs audio coalesced into frames (tts/coalesce.py)
+
+Mocked streaming TTS in the style of DashScope realtime: after `--first-ms`, deltas of `--chunk-ms`
+of 24 kHz 16-bit PCM arrive `--speed` times faster than real time. Sentences go through `TTSPipeline`
+with `WavStreamEncoder` as in `BasicChattingAgent`, emitted audio is "played" back to back as in the
+frontend. For every `tts_frame_ms` reports:
+    - say_aloud messages per second of audio and per sentence
+    - bytes on the wire (binary frames, envelope included)
+    - time to first audio
+    - stalls: silence while the player waits for the next frame of a sentence
+
+Usage:
+    python _benchmarks/audio_coalesce_bench.py [--frame-ms 0 100 200 300] [--chunk-ms 40] [--speed 3]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import time
+
+from agent.tts_pipeline import TTSPipeline
+from tts.coalesce import coalesce
+from tts.codecs import encode_utterance
+from tts.wav_stream import WavStreamEncoder
+from ws_protocol import encode_frame_into
+
+SAMPLE_RATE = 24000
+BYTE_RATE = SAMPLE_RATE * 2
+
+class Player:
+    """Plays emitted audio back to back, counts messages and records stalls within sentences"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.buffer = bytearray()
+        self.messages = 0
+        self.wire_bytes = 0
+        self.audio_bytes = 0
+        self.first_audio: float = None
+        self.play_end: float = None
+        self.stalls: list[float] = []
+
+    async def emit(self, event_data: dict, media_data=None):
+        if event_data.get("type") != "say_aloud":
+            return
+        now = time.perf_counter()
+        with encode_frame_into(self.buffer, {"type": "event", "data": event_data}, media_data) as frame:
+            self.wire_bytes += len(frame)
+        audio = sum(len(part) for part in media_data) - (44 if event_data["format"] == "wav" else 0)
+        self.messages += 1
+        self.audio_bytes += audio
+        if self.first_audio is None:
+            self.first_audio = now - self.start
+            self.play_end = now
+        elif now > self.play_end:
+            if event_data["format"] == "pcm": # a continuation arrived late (not the start of a sentence)
+                self.stalls.append(now - self.play_end)
+            self.play_end = now
+        self.play_end += audio / BYTE_RATE
+
+def mock_tts(args):
+    chunk = b"\0" * (BYTE_RATE * args.chunk_ms // 1000)
+    async def synthesize_stream(text: str):
+        await asyncio.sleep(args.first_ms / 1000)
+        for _ in range(int(args.sentence_s * 1000 / args.chunk_ms)):
+            yield chunk
+            await asyncio.sleep(args.chunk_ms / args.speed / 1000)
+    return synthesize_stream
+
+async def run(args, frame_ms) -> Player:
+    player = Player()
+    encoder = WavStreamEncoder("pcm", SAMPLE_RATE)
+    synthesize_stream = mock_tts(args)
+
+    async def synthesize_audio(text: str):
+        async for message in encode_utterance(coalesce(synthesize_stream(text), frame_ms, encoder.chunk_byte_rate), encoder, pcm_continuation=True):
+            yield message
+
+    pipeline = TTSPipeline(synthesize_audio, player.emit, look_ahead=2, concurrent=False)
+    for i in range(args.sentences):
+        await pipeline.speak(f"第 {i} 句。")
+    await pipeline.join()
+    return player
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frame-ms", type=int, nargs="+", default=[0, 100, 200, 300], help="tts_frame_ms values (0: one message per delta)")
+    parser.add_argument("--chunk-ms", type=int, default=40, help="audio per TTS delta (ms)")
+    parser.add_argument("--speed", type=float, default=3, help="TTS speed (x real time)")
+    parser.add_argument("--first-ms", type=float, default=150, help="TTS latency until the first delta (ms)")
+    parser.add_argument("--sentence-s", type=float, default=3, help="audio per sentence (s)")
+    parser.add_argument("--sentences", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{args.chunk_ms} ms deltas at {args.speed:g}x real time, {args.sentences} sentences of {args.sentence_s:g} s")
+    print(f"{'frame ms':>9} | {'msgs/s audio':>12} | {'msgs/sentence':>13} | {'wire KiB/s':>10} | {'TTFA ms':>8} | {'stalls':>6} | {'stall ms':>8}")
+    baseline = None
+    for frame_ms in args.frame_ms:
+        player = await run(args, frame_ms or None)
+        seconds = player.audio_bytes / BYTE_RATE
+        rate = player.messages / seconds
+        baseline = baseline or rate
+        print(f"{frame_ms or '-':>9} | {rate:12.1f} | {player.messages / args.sentences:13.1f} | {player.wire_bytes / 1024 / seconds:10.1f} | "
+              f"{player.first_audio * 1000:8.1f} | {len(player.stalls):6d} | {sum(player.stalls) * 1000:8.1f}   ({rate / baseline:.0%} of the messages)")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+"""
+Benchmark: bandwidth and encoding CPU of the say_aloud audio codecs (tts/codecs.py)
+
+Speech (`--wav`, by default the Genie reference audio, resampled to each rate) is sent as the agent
+does: `--utterance-s` sentences in frames of `--frame-ms` through `encode_utterance` (for frontends that
+decode "pcm" continuation frames), every event assembled into a binary frame. For DashScope's 24 kHz
+and Genie's 32 kHz mono reports per codec:
+    - bytes on the wire per second of audio (binary frames, envelope included) and vs "wav"
+    - agent CPU per second of audio (encoding + framing, time.process_time)
+    - messages per second of audio (the flush of mp3 / opus may add one per sentence)
+
+Codecs whose encoder library is not installed ("mp3": lameenc, "opus": opuslib + libopus) are
+listed as unavailable.
+
+Usage:
+    python _benchmarks/audio_codec_bench.py [--wav tts/ref_audio/paimeng.wav] [--rates 24000 32000] [--frame-ms 200]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import time
+import wave
+
+import numpy as np
+
+from tts.codecs import CODECS, WAV, encode_utterance
+from tts.wav_stream import WavStreamEncoder
+from ws_protocol import encode_frame_into
+
+ALL_CODECS = [WAV, "mulaw", "ima_adpcm", "mp3", "opus"]
+
+def load_speech(path: str, sample_rate: int) -> np.ndarray:
+    """Mono 16-bit samples of a WAV file at `sample_rate` (linear interpolation)"""
+    with wave.open(path, "rb") as f:
+        samples = np.frombuffer(f.readframes(f.getnframes()), dtype="<i2").reshape(-1, f.getnchannels())[:, 0]
+        rate = f.getframerate()
+    positions = np.arange(int(len(samples) * sample_rate / rate)) * rate / sample_rate
+    return np.interp(positions, np.arange(len(samples)), samples).astype("<i2")
+
+async def frames(pcm: bytes, frame_bytes: int):
+    for offset in range(0, len(pcm), frame_bytes):
+        yield (pcm[offset:offset + frame_bytes],)
+
+async def send_utterances(utterances: list[bytes], frame_bytes: int, encoder: WavStreamEncoder, codecs) -> tuple[int, int]:
+    """(wire bytes, messages)"""
+    buffer = bytearray()
+    wire = messages = 0
+    for pcm in utterances:
+        first = True
+        async for fields, parts in encode_utterance(frames(pcm, frame_bytes), encoder, codecs, pcm_continuation=True):
+            event = {"type": "event", "data": {"type": "say_aloud", "content": "你好。" if first else "", **fields}}
+            with encode_frame_into(buffer, event, parts) as frame:
+                wire += len(frame)
+            messages += 1
+            first = False
+    return wire, messages
+
+def main():
+    default_wav = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tts", "ref_audio", "paimeng.wav")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--wav", default=default_wav, help="speech to encode")
+    parser.add_argument("--rates", type=int, nargs="+", default=[24000, 32000], help="sample rates (Hz)")
+    parser.add_argument("--frame-ms", type=int, default=200, help="audio per say_aloud event (tts_frame_ms)")
+    parser.add_argument("--utterance-s", type=float, default=3, help="audio per sentence (s)")
+    parser.add_argument("--repeat", type=int, default=3, help="times the speech is sent")
+    args = parser.parse_args()
+
+    for sample_rate in args.rates:
+        speech = np.tile(load_speech(args.wav, sample_rate), args.repeat).tobytes()
+        utterance_bytes = int(args.utterance_s * sample_rate) * 2
+        utterances = [speech[offset:offset + utterance_bytes] for offset in range(0, len(speech), utterance_bytes)]
+        seconds = len(speech) / 2 / sample_rate
+        frame_bytes = sample_rate * args.frame_ms // 1000 * 2
+        encoder = WavStreamEncoder("pcm", sample_rate)
+
+        print(f"{sample_rate} Hz mono, {seconds:.1f} s of speech in {args.frame_ms} ms frames, {args.utterance_s:g} s sentences")
+        print(f"  {'codec':10} | {'wire KiB/s':>10} | {'vs wav':>6} | {'CPU ms/s':>8} | {'msgs/s':>6}")
+        wav_wire = None
+        for name in ALL_CODECS:
+            if name != WAV and name not in CODECS:
+                print(f"  {name:10} | unavailable (encoder library not installed)")
+                continue
+            codecs = [] if name == WAV else [CODECS[name]]
+            if name != WAV and not CODECS[name].supports(encoder.format):
+                print(f"  {name:10} | does not support {sample_rate} Hz (falls back to the next codec / wav)")
+                continue
+            start = time.process_time()
+            wire, messages = asyncio.run(send_utterances(utterances, frame_bytes, encoder, codecs))
+            cpu = time.process_time() - start
+            wav_wire = wav_wire or wire
+            print(f"  {name:10} | {wire / 1024 / seconds:10.1f} | {wire / wav_wire:6.0%} | {cpu * 1000 / seconds:8.2f} | {messages / seconds:6.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark: agent-side assembly of streamed `say_aloud` audio, per-chunk WAV vs WAV header per utterance
+
+Simulates DashScope realtime TTS (24 kHz 16-bit mono PCM deltas of `--chunk-ms`, `--utterance-s` per
+sentence) and measures, per second of audio, for every message the agent builds:
+    - CPU time (time.process_time)
+    - bytes allocated (sum of the tracemalloc peak of every message, i.e. the temporary objects
+      the message needed; the frame handed to websockets included)
+    - bytes on the wire (agent -> server)
+
+    "previous"  pcm2wav for every chunk (header + pcm -> new bytes), then encode_frame (join) /
+                base64 + json.dumps
+    "stream"    WavStreamEncoder (one header per utterance, raw PCM continuation frames), then
+                encode_frame_into a reused buffer / base64 + json.dumps
+
+websockets masks the payload into one more copy in both cases; that copy is not included.
+
+Usage:
+    python _benchmarks/audio_wire_bench.py [--chunk-ms 20 40 100] [--utterance-s 3] [--seconds 30]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import base64
+import json
+import time
+import tracemalloc
+
+from tts.pcm2wav import pcm2wav
+from tts.wav_stream import WavStreamEncoder
+from ws_protocol import encode_frame, encode_frame_into
+
+SAMPLE_RATE = 24000
+BYTES_PER_SAMPLE = 2
+
+def make_stream(seconds: float, utterance_s: float, chunk_ms: int) -> list[tuple[bytes, bool]]:
+    """(pcm chunk, first chunk of its utterance)"""
+    chunk = os.urandom(SAMPLE_RATE * BYTES_PER_SAMPLE * chunk_ms // 1000)
+    per_utterance = max(1, int(utterance_s * 1000 / chunk_ms))
+    return [(chunk, i % per_utterance == 0) for i in range(int(seconds * 1000 / chunk_ms))]
+
+def event(first: bool, audio_format: str) -> dict:
+    return {"type": "event", "data": {"type": "say_aloud", "content": "你好。" if first else "", "format": audio_format}}
+
+def previous_binary(chunk: bytes, first: bool, state) -> int:
+    frame = encode_frame(event(first, "wav"), pcm2wav(chunk, sample_rate=SAMPLE_RATE))
+    return len(frame)
+
+def previous_json(chunk: bytes, first: bool, state) -> int:
+    message = event(first, "wav")
+    message["data"]["media_data"] = base64.b64encode(pcm2wav(chunk, sample_rate=SAMPLE_RATE)).decode("utf-8")
+    return len(json.dumps(message).encode("utf-8"))
+
+def stream_binary(chunk: bytes, first: bool, state) -> int:
+    encoder, buffer = state
+    audio_format, parts = encoder.encode((chunk,), first, pcm_continuation=True)
+    with encode_frame_into(buffer, event(first, audio_format), parts) as frame:
+        return len(frame)
+
+def stream_json(chunk: bytes, first: bool, state) -> int:
+    encoder, _ = state
+    audio_format, parts = encoder.encode((chunk,), first, pcm_continuation=True)
+    message = event(first, audio_format)
+    payload = parts[0] if len(parts) == 1 else b"".join(parts)
+    message["data"]["media_data"] = base64.b64encode(payload).decode("utf-8")
+    return len(json.dumps(message).encode("utf-8"))
+
+def measure(func, stream: list[tuple[bytes, bool]]) -> tuple[float, int, int]:
+    state = (WavStreamEncoder("pcm", SAMPLE_RATE), bytearray())
+    for chunk, first in stream[:10]: # warm-up (grows the reused buffer)
+        func(chunk, first, state)
+
+    start = time.process_time()
+    wire = sum(func(chunk, first, state) for chunk, first in stream)
+    cpu = time.process_time() - start
+
+    allocated = 0
+    tracemalloc.start()
+    for chunk, first in stream:
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        func(chunk, first, state)
+        allocated += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return cpu, allocated, wire
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk-ms", type=int, nargs="+", default=[20, 40, 100], help="audio per TTS delta (ms)")
+    parser.add_argument("--utterance-s", type=float, default=3, help="audio per sentence (s)")
+    parser.add_argument("--seconds", type=float, default=30, help="seconds of audio to simulate")
+    args = parser.parse_args()
+
+    audio_kib = SAMPLE_RATE * BYTES_PER_SAMPLE / 1024
+    for chunk_ms in args.chunk_ms:
+        stream = make_stream(args.seconds, args.utterance_s, chunk_ms)
+        print(f"{chunk_ms} ms deltas, {args.utterance_s:g} s sentences ({len(stream) / args.seconds:.0f} messages/s, raw PCM {audio_kib:.1f} KiB/s)")
+        print(f"  {'':18} | {'CPU ms/s':>9} | {'allocated KiB/s':>16} | {'wire KiB/s':>11}")
+        for name, func in (("previous binary", previous_binary), ("stream binary", stream_binary),
+                           ("previous json", previous_json), ("stream json", stream_json)):
+            cpu, allocated, wire = measure(func, stream)
+            print(f"  {name:18} | {cpu * 1000 / args.seconds:9.3f} | {allocated / 1024 / args.seconds:16.1f} | {wire / 1024 / args.seconds:11.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark: base64-in-JSON vs binary frames for `say_aloud` audio
+
+Measures, per second of audio:
+    - bytes on the wire (agent -> server, server -> each frontend)
+    - CPU time spent by the agent encoding the messages
+    - CPU time spent by the server relaying the messages to N frontends
+
+Usage:
+    python _benchmarks/binary_frame_bench.py [--recipients 1] [--chunk-ms 100] [--seconds 10]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import base64
+import json
+import time
+from datetime import datetime
+
+from ws_protocol import encode_frame, peek_header
+
+SAMPLE_RATE = 24000 # DashScope realtime TTS
+BYTES_PER_SAMPLE = 2
+WAV_HEADER_SIZE = 44
+
+def make_chunks(seconds: float, chunk_ms: int) -> list[bytes]:
+    chunk_bytes = SAMPLE_RATE * BYTES_PER_SAMPLE * chunk_ms // 1000
+    wav = os.urandom(WAV_HEADER_SIZE + chunk_bytes) # content does not matter, only the size
+    return [wav for _ in range(int(seconds * 1000 / chunk_ms))]
+
+def legacy_agent(chunks: list[bytes]) -> list[str]:
+    return [
+        json.dumps({"type": "event", "data": {"type": "say_aloud", "content": "", "media_data": base64.b64encode(c).decode("utf-8"), "format": "wav"}})
+        for c in chunks
+    ]
+
+def legacy_relay(messages: list[str], recipients: int) -> int:
+    sent = 0
+    for message in messages:
+        message_data = json.loads(message)
+        event_data = message_data.get("data", "")
+        for _ in range(recipients):
+            sent += len(json.dumps({"time": datetime.now().isoformat(), "data": event_data}))
+    return sent
+
+def binary_agent(chunks: list[bytes]) -> list[bytes]:
+    return [encode_frame({"type": "event", "data": {"type": "say_aloud", "content": "", "format": "wav"}}, c) for c in chunks]
+
+def binary_relay(frames: list[bytes], recipients: int) -> int:
+    sent = 0
+    for frame in frames:
+        header = peek_header(frame)
+        assert header["type"] == "event"
+        for _ in range(recipients):
+            sent += len(frame)
+    return sent
+
+def timed(func, *args):
+    start = time.process_time()
+    result = func(*args)
+    return result, time.process_time() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipients", type=int, default=1, help="frontends per agent")
+    parser.add_argument("--chunk-ms", type=int, default=100, help="audio per say_aloud event (ms)")
+    parser.add_argument("--seconds", type=float, default=10, help="seconds of audio to simulate")
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.seconds, args.chunk_ms)
+    audio_bytes = sum(len(c) for c in chunks)
+
+    messages, legacy_encode_cpu = timed(legacy_agent, chunks)
+    legacy_out, legacy_relay_cpu = timed(legacy_relay, messages, args.recipients)
+    legacy_in = sum(len(m.encode("utf-8")) for m in messages)
+
+    frames, binary_encode_cpu = timed(binary_agent, chunks)
+    binary_out, binary_relay_cpu = timed(binary_relay, frames, args.recipients)
+    binary_in = sum(len(f) for f in frames)
+
+    per_sec = 1 / args.seconds
+    print(f"audio: {args.seconds}s, {len(chunks)} events of {args.chunk_ms}ms, {args.recipients} recipient(s), raw wav {audio_bytes * per_sec / 1024:.1f} KiB/s")
+    print(f"{'':>8} | {'agent->server KiB/s':>20} | {'server->frontends KiB/s':>24} | {'agent encode ms/s':>18} | {'relay CPU ms/s':>15}")
+    for name, wire_in, wire_out, enc, relay in (
+        ("json", legacy_in, legacy_out, legacy_encode_cpu, legacy_relay_cpu),
+        ("binary", binary_in, binary_out, binary_encode_cpu, binary_relay_cpu),
+    ):
+        print(f"{name:>8} | {wire_in * per_sec / 1024:>20.1f} | {wire_out * per_sec / 1024:>24.1f} | {enc * per_sec * 1000:>18.3f} | {relay * per_sec * 1000:>15.3f}")
+
+if __name__ == "__main__":
+    main()
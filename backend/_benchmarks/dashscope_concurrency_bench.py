@@ -0,0 +1,57 @@
+"""
+Benchmark: parallel sentences on one DashscopeTTS instance
+
+Synthesizes `--sentences` different sentences at the same time on a single `DashscopeTTS`, against
+the local stand-in realtime server, for several `max_concurrency` values. Checks that every request
+received the audio of its own text (the stand-in sends the text back as "audio") and reports the
+wall time and the realtime sessions opened.
+
+Usage:
+    python _benchmarks/dashscope_concurrency_bench.py [--sentences 16] [--concurrency 1 4 8]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import asyncio
+import time
+
+from tts.dashscope.dashscope_tts import DashscopeTTS
+from tts.dashscope.session_pool import SessionPool
+from realtime_tts_standin import StandinConfig
+from dashscope_session_bench import start_standin_thread
+
+async def run(args, url: str, concurrency: int) -> tuple[float, int]:
+    pool = SessionPool(url, max_idle_sessions=concurrency)
+    tts = DashscopeTTS(api_key="bench", voice="bench", url=url, pool=pool, max_concurrency=concurrency)
+    texts = [f"第{i}句话。" for i in range(args.sentences)]
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(tts.synthesize(text) for text in texts))
+    elapsed = time.perf_counter() - start
+
+    mismatched = sum(not audio.startswith(text.encode()) for text, audio in zip(texts, results))
+    pool.close()
+    return elapsed, mismatched
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sentences", type=int, default=16, help="sentences synthesized at the same time")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8], help="max_concurrency values")
+    parser.add_argument("--handshake-ms", type=float, default=150, help="simulated WebSocket handshake latency (ms)")
+    parser.add_argument("--first-audio-ms", type=float, default=80, help="simulated commit -> first audio latency (ms)")
+    args = parser.parse_args()
+
+    config = StandinConfig(args.handshake_ms, args.first_audio_ms)
+    url = f"ws://127.0.0.1:{start_standin_thread(config)}"
+
+    for concurrency in args.concurrency:
+        connections = config.connections
+        elapsed, mismatched = await run(args, url, concurrency)
+        print(f"max_concurrency {concurrency:2d} | {args.sentences} sentences in {elapsed:5.2f} s   "
+              f"sessions {config.connections - connections:2d}   wrong audio {mismatched}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+"""
+Benchmark: DashscopeTTS per-sentence time-to-first-audio, new session per sentence vs pooled sessions
+
+Runs against the local stand-in realtime server (`realtime_tts_standin.py`, in its own thread and event
+loop so it is not slowed down by the client's event loop). "new session" uses a
+`SessionPool(max_idle_sessions=0)`, i.e. connect + session.update for every sentence as before.
+
+Also reports the worst event loop lag seen by a probe task during the run (how long the client's
+event loop was blocked, e.g. by waiting for audio synchronously).
+
+Usage:
+    python _benchmarks/dashscope_session_bench.py [--sentences 20] [--handshake-ms 150]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+
+from tts.dashscope.dashscope_tts import DashscopeTTS
+from tts.dashscope.session_pool import SessionPool
+from realtime_tts_standin import StandinConfig, serve_standin
+
+def start_standin_thread(config: StandinConfig) -> int:
+    """Run the stand-in server in a daemon thread; returns its port"""
+    started = threading.Event()
+    port = []
+
+    async def serve():
+        server = await serve_standin(config)
+        port.append(server.sockets[0].getsockname()[1])
+        started.set()
+        await server.wait_closed()
+
+    threading.Thread(target=asyncio.run, args=(serve(),), daemon=True).start()
+    started.wait()
+    return port[0]
+
+class LagProbe:
+    """Sleeps 1 ms in a loop and records how late it wakes up"""
+
+    def __init__(self):
+        self.max_lag = 0.0
+        self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            self.max_lag = max(self.max_lag, time.perf_counter() - start - 0.001)
+
+async def run(args, url: str, pool: SessionPool) -> tuple[list[float], float]:
+    tts = DashscopeTTS(api_key="bench", voice="bench", url=url, pool=pool)
+    probe = LagProbe()
+    ttfa = []
+    for _ in range(args.sentences):
+        start = time.perf_counter()
+        first = None
+        async for _chunk in tts.synthesize_stream("你好，我是树莓娘。"):
+            if first is None:
+                first = time.perf_counter() - start
+        ttfa.append(first)
+        await asyncio.sleep(args.pause_ms / 1000)
+    pool.close()
+    probe.task.cancel()
+    return ttfa, probe.max_lag
+
+def describe(ttfa: list[float], max_lag: float, connections: int) -> str:
+    q = statistics.quantiles(ttfa, n=100)
+    return (f"TTFA mean {statistics.mean(ttfa) * 1000:6.1f} ms   p50 {q[49] * 1000:6.1f} ms   "
+            f"p99 {q[98] * 1000:6.1f} ms   max loop lag {max_lag * 1000:6.1f} ms   connections {connections}")
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sentences", type=int, default=20, help="sentences synthesized one after another")
+    parser.add_argument("--handshake-ms", type=float, default=150, help="simulated WebSocket handshake latency (ms)")
+    parser.add_argument("--first-audio-ms", type=float, default=80, help="simulated commit -> first audio latency (ms)")
+    parser.add_argument("--pause-ms", type=float, default=50, help="pause between sentences (ms)")
+    args = parser.parse_args()
+
+    config = StandinConfig(args.handshake_ms, args.first_audio_ms)
+    url = f"ws://127.0.0.1:{start_standin_thread(config)}"
+
+    for name, pool in (("new session", SessionPool(url, max_idle_sessions=0)), ("pooled", SessionPool(url))):
+        connections = config.connections
+        ttfa, max_lag = await run(args, url, pool)
+        print(f"{name:11s} | {describe(ttfa, max_lag, config.connections - connections)}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
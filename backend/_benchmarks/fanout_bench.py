@@ -0,0 +1,90 @@
+"""
+Benchmark: event fan-out latency from one agent to N frontends
+
+Every frontend is a fake WebSocket whose send takes `--send-ms`; one of them is a slow
+viewer whose send takes `--slow-ms`. Reports the delivery latency seen by the normal
+viewers, for the old sequential fan-out (await each send in turn) and for ConnectionManager
+(per-connection queue + writer task).
+
+Usage:
+    python _benchmarks/fanout_bench.py [--events 50] [--send-ms 1] [--slow-ms 200]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from server import ConnectionManager
+
+class FakeWebSocket:
+    def __init__(self, delay: float, latencies: list[float] | None):
+        self.delay = delay
+        self.latencies = latencies
+
+    async def accept(self):
+        pass
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        pass
+
+    async def send_text(self, message: str):
+        await asyncio.sleep(self.delay)
+        if self.latencies is not None and message.startswith("t="):
+            self.latencies.append(time.perf_counter() - float(message[2:]))
+
+    send_bytes = send_text
+
+async def sequential_fanout(sockets: list[FakeWebSocket], events: int, interval: float):
+    for _ in range(events):
+        message = f"t={time.perf_counter()}"
+        for ws in sockets:
+            await ws.send_text(message)
+        await asyncio.sleep(interval)
+
+async def manager_fanout(sockets: list[FakeWebSocket], events: int, interval: float):
+    manager = ConnectionManager("bench", max_queue_size=events * 2)
+    client_ids = [await manager.connect(ws, {"agent_name": "bench"}) for ws in sockets]
+    for _ in range(events):
+        message = f"t={time.perf_counter()}"
+        for client_id in manager.get_client_ids_by_agent_name("bench"):
+            await manager.send_personal_message(message, client_id)
+        await asyncio.sleep(interval)
+    # wait for the normal viewers to drain their queues
+    while any(len(manager.active_connections[c].queue) for c in client_ids[1:]):
+        await asyncio.sleep(0.001)
+    for client_id in client_ids:
+        await manager.disconnect(client_id)
+
+async def run(fanout, recipients: int, args) -> list[float]:
+    latencies: list[float] = []
+    sockets = [FakeWebSocket(args.slow_ms / 1000, None)]
+    sockets += [FakeWebSocket(args.send_ms / 1000, latencies) for _ in range(recipients - 1)]
+    await fanout(sockets, args.events, args.interval_ms / 1000)
+    return latencies
+
+def describe(latencies: list[float]) -> str:
+    if not latencies:
+        return "n/a"
+    q = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return f"p50 {q[49] * 1000:8.1f} ms   p99 {q[98] * 1000:8.1f} ms"
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=50, help="events sent by the agent")
+    parser.add_argument("--interval-ms", type=float, default=20, help="interval between events (ms)")
+    parser.add_argument("--send-ms", type=float, default=1, help="send time of a normal viewer (ms)")
+    parser.add_argument("--slow-ms", type=float, default=200, help="send time of the slow viewer (ms)")
+    parser.add_argument("--recipients", type=int, nargs="+", default=[2, 10, 100, 300], help="frontends per agent (incl. the slow one)")
+    args = parser.parse_args()
+
+    for recipients in args.recipients:
+        if recipients <= 20: # the sequential fan-out is too slow to run with many viewers
+            print(f"{recipients:>4} frontends | sequential | {describe(await run(sequential_fanout, recipients, args))}")
+        print(f"{recipients:>4} frontends | manager    | {describe(await run(manager_fanout, recipients, args))}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+"""
+Benchmark: Genie TTS real-time factor per inference profile on this machine
+
+Every scenario runs in a fresh process (ONNX sessions are created with the profile when the speaker
+is loaded). The real-time factor is synthesis time / audio duration (lower is faster, < 1 is faster
+than real time):
+    - "default", "latency": one worker, sentences one after another (RTF per sentence)
+    - "throughput":         `--workers` pinned process workers, all sentences at once (aggregate RTF)
+Each profile is run with the fp32 models and, if `<model-dir>/int8` exists (`tts/genie/quantize.py`),
+with the int8 models.
+
+Usage:
+    python _benchmarks/genie_profile_bench.py --model-dir tts/genie/pretrained/<model> \
+        --ref-audio tts/ref_audio/paimeng.wav --ref-text "蒙德有很多风车呢。" [--workers 2]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import time
+
+SENTENCES = [
+    "大家好，欢迎来到今天的直播间。",
+    "今天我们来聊一聊北京理工大学的网络开拓者协会。",
+    "有什么问题可以在弹幕里问我哦。",
+    "蒙德有很多风车呢，四季风吹不断。",
+]
+
+def duration(wav: bytes) -> float:
+    return (len(wav) - 44) / 2 / 32000 # 32 kHz mono 16-bit
+
+async def run_scenario(args) -> dict:
+    from tts.genie import GenieTTS
+
+    throughput = args.profile == "throughput"
+    tts = GenieTTS(args.model_dir, args.language, args.ref_audio, args.ref_text, args.ref_language,
+                   workers=args.workers if throughput else 1, worker_mode="process" if throughput else "thread",
+                   inference_profile=args.profile, model_variant=args.variant)
+    await tts.prewarm()
+    sentences = SENTENCES * args.repeat
+
+    if throughput:
+        start = time.perf_counter()
+        wavs = await asyncio.gather(*(tts.synthesize(text) for text in sentences))
+        elapsed = time.perf_counter() - start
+        tts.close()
+        return {"rtf": elapsed / sum(map(duration, wavs)), "sentences_per_s": len(sentences) / elapsed}
+
+    rtfs = []
+    start = time.perf_counter()
+    for text in sentences:
+        sentence_start = time.perf_counter()
+        wav = await tts.synthesize(text)
+        rtfs.append((time.perf_counter() - sentence_start) / duration(wav))
+    return {"rtf": statistics.mean(rtfs), "rtf_max": max(rtfs), "sentences_per_s": len(sentences) / (time.perf_counter() - start)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", required=True, help="Genie ONNX model directory")
+    parser.add_argument("--language", default="hybrid-zh-en")
+    parser.add_argument("--ref-audio", required=True, help="reference audio path")
+    parser.add_argument("--ref-text", required=True, help="reference audio transcript")
+    parser.add_argument("--ref-language", default="zh")
+    parser.add_argument("--workers", type=int, default=2, help="process workers of the throughput profile")
+    parser.add_argument("--repeat", type=int, default=2, help="times every test sentence is synthesized")
+    parser.add_argument("--profile", help=argparse.SUPPRESS) # run one scenario (in a child process)
+    parser.add_argument("--variant", default="fp32", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile:
+        print(json.dumps(asyncio.run(run_scenario(args))))
+        return
+
+    variants = ["fp32"] + (["int8"] if os.path.isdir(os.path.join(args.model_dir, "int8")) else [])
+    print(f"{os.cpu_count()} CPUs")
+    for variant in variants:
+        for profile in ("default", "latency", "throughput"):
+            child = subprocess.run([sys.executable, *sys.argv, "--profile", profile, "--variant", variant],
+                                   capture_output=True, text=True, check=True)
+            result = json.loads(child.stdout.strip().splitlines()[-1])
+            name = f"{profile} x{args.workers}" if profile == "throughput" else profile
+            detail = f"max {result['rtf_max']:5.3f}" if "rtf_max" in result else "aggregate"
+            print(f"{variant:4s} {name:13s} | RTF {result['rtf']:5.3f} ({detail})   {result['sentences_per_s']:5.2f} sentences/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark: Genie TTS agent cold start and first-sentence latency
+
+Every scenario runs in a fresh process (Genie keeps its models in process-global state):
+    - "no cache":      no reference cache, no warm-up (as the previous GenieTTS)
+    - "cache (cold)":  reference cache enabled but empty, warm-up synthesis
+    - "cache (warm)":  the cache written by the previous scenario, warm-up synthesis
+"start" is GenieTTS construction + `prewarm()` (model loading, reference features, warm-up), "first"
+the latency of the first sentence after that, "2nd agent" the start of a second GenieTTS with the
+same config in the same process (shares the loaded speaker).
+
+Usage:
+    python _benchmarks/genie_startup_bench.py --model-dir tts/genie/pretrained/<model> \
+        --ref-audio tts/ref_audio/paimeng.wav --ref-text "蒙德有很多风车呢。"
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import json
+import subprocess
+import tempfile
+import time
+
+SCENARIOS = {
+    "no cache": dict(reference_cache=False, warmup_text=None),
+    "cache (cold)": dict(reference_cache=True),
+    "cache (warm)": dict(reference_cache=True),
+}
+
+async def run_scenario(args) -> dict:
+    from tts.genie import GenieTTS
+
+    config = dict(onnx_model_dir=args.model_dir, language=args.language, ref_audio_path=args.ref_audio,
+                  ref_audio_text=args.ref_text, ref_audio_language=args.ref_language,
+                  reference_cache_dir=args.cache_dir, **SCENARIOS[args.scenario])
+
+    start = time.perf_counter()
+    tts = GenieTTS(**config)
+    await tts.prewarm()
+    started = time.perf_counter()
+    await tts.synthesize(args.sentence)
+    first = time.perf_counter()
+
+    second = GenieTTS(**config)
+    await second.prewarm()
+    return {"start": started - start, "first": first - started, "second_agent": time.perf_counter() - first}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", required=True, help="Genie ONNX model directory")
+    parser.add_argument("--language", default="hybrid-zh-en")
+    parser.add_argument("--ref-audio", required=True, help="reference audio path")
+    parser.add_argument("--ref-text", required=True, help="reference audio transcript")
+    parser.add_argument("--ref-language", default="zh")
+    parser.add_argument("--sentence", default="大家好，欢迎来到今天的直播间。")
+    parser.add_argument("--scenario", help=argparse.SUPPRESS) # run one scenario (in a child process)
+    parser.add_argument("--cache-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario:
+        print(json.dumps(asyncio.run(run_scenario(args))))
+        return
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for scenario in SCENARIOS:
+            child = subprocess.run([sys.executable, *sys.argv, "--scenario", scenario, "--cache-dir", cache_dir],
+                                   capture_output=True, text=True, check=True)
+            result = json.loads(child.stdout.strip().splitlines()[-1])
+            print(f"{scenario:12s} | start {result['start'] * 1000:8.1f} ms   first sentence {result['first'] * 1000:7.1f} ms   "
+                  f"2nd agent start {result['second_agent'] * 1000:6.1f} ms")
+
+if __name__ == "__main__":
+    main()
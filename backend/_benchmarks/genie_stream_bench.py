@@ -0,0 +1,61 @@
+"""
+Benchmark: Genie TTS time-to-first-audio, synthesize vs synthesize_stream
+
+Synthesizes long multi-clause sentences with a real Genie model on CPU and reports the time until the
+first audio is available (the whole WAV for `synthesize`, the first chunk for `synthesize_stream`)
+and the total time.
+
+Usage:
+    python _benchmarks/genie_stream_bench.py --model-dir tts/genie/pretrained/<model> \
+        --ref-audio tts/ref_audio/paimeng.wav --ref-text "蒙德有很多风车呢。" [--repeat 5]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from tts.genie import GenieTTS
+
+LONG_SENTENCES = [
+    "大家好，欢迎来到今天的直播间，今天我们来聊一聊北京理工大学的网络开拓者协会，有什么问题可以在弹幕里问我哦。",
+    "蒙德有很多风车呢，四季风吹不断，所以水源的供应也很稳定，你有没有去过那里，要不要听我讲讲那里的故事？",
+]
+
+async def measure(tts: GenieTTS, text: str, stream: bool) -> tuple[float, float]:
+    start = time.perf_counter()
+    if not stream:
+        await tts.synthesize(text)
+        elapsed = time.perf_counter() - start
+        return elapsed, elapsed
+    first = None
+    async for _ in tts.synthesize_stream(text):
+        if first is None:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", required=True, help="Genie ONNX model directory")
+    parser.add_argument("--language", default="hybrid-zh-en")
+    parser.add_argument("--ref-audio", required=True, help="reference audio path")
+    parser.add_argument("--ref-text", required=True, help="reference audio transcript")
+    parser.add_argument("--ref-language", default="zh")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per sentence")
+    args = parser.parse_args()
+
+    tts = GenieTTS(args.model_dir, args.language, args.ref_audio, args.ref_text, args.ref_language)
+    await tts.prewarm()
+    await tts.synthesize(LONG_SENTENCES[0]) # warm-up
+
+    for stream in (False, True):
+        results = [await measure(tts, text, stream) for text in LONG_SENTENCES for _ in range(args.repeat)]
+        ttfa, total = zip(*results)
+        print(f"{'synthesize_stream' if stream else 'synthesize':17s} | TTFA mean {statistics.mean(ttfa) * 1000:7.1f} ms   "
+              f"max {max(ttfa) * 1000:7.1f} ms   total mean {statistics.mean(total) * 1000:7.1f} ms")
+
+if __name__ == "__main__":
+    asyncio.run(main())
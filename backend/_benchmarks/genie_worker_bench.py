@@ -0,0 +1,88 @@
+"""
+Benchmark: Genie TTS event loop responsiveness and sentences/sec, on the event loop vs worker pool
+
+Synthesizes `--sentences` sentences (all requested at once) with a real Genie model on CPU:
+    - "on loop":       `get_tts_wav` awaited directly on the event loop (the previous GenieTTS)
+    - "thread":        `GenieTTS(worker_mode="thread")`
+    - "process xN":    `GenieTTS(worker_mode="process", workers=N)` for every N in `--workers`
+
+A probe task sleeps 1 ms in a loop and records how late it wakes up (how long the event loop was
+blocked). Worker start-up and model loading (`prewarm`) are not included in the timings.
+
+Usage:
+    python _benchmarks/genie_worker_bench.py --model-dir tts/genie/pretrained/<model> \
+        --ref-audio tts/ref_audio/paimeng.wav --ref-text "蒙德有很多风车呢。" [--workers 1 2 4]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from tts.genie import GenieTTS
+from tts.genie.functional_api import define_speaker, get_tts_wav
+from dashscope_session_bench import LagProbe
+
+SENTENCES = [
+    "大家好，欢迎来到今天的直播间。",
+    "今天我们来聊一聊北京理工大学的网络开拓者协会。",
+    "有什么问题可以在弹幕里问我哦。",
+    "蒙德有很多风车呢，四季风吹不断。",
+]
+
+async def run(synthesize, sentences: list[str]) -> tuple[float, float, list[float]]:
+    probe = LagProbe()
+    start = time.perf_counter()
+    latencies = []
+
+    async def one(text: str):
+        await synthesize(text)
+        latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(text) for text in sentences))
+    elapsed = time.perf_counter() - start
+    probe.task.cancel()
+    return elapsed, probe.max_lag, latencies
+
+def describe(name: str, sentences: int, elapsed: float, max_lag: float, latencies: list[float]) -> str:
+    return (f"{name:12s} | {sentences / elapsed:5.2f} sentences/s   first done {min(latencies):6.2f} s   "
+            f"mean done {statistics.mean(latencies):6.2f} s   max loop lag {max_lag * 1000:7.1f} ms")
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", required=True, help="Genie ONNX model directory")
+    parser.add_argument("--language", default="hybrid-zh-en")
+    parser.add_argument("--ref-audio", required=True, help="reference audio path")
+    parser.add_argument("--ref-text", required=True, help="reference audio transcript")
+    parser.add_argument("--ref-language", default="zh")
+    parser.add_argument("--sentences", type=int, default=8, help="sentences requested at the same time")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="process worker counts")
+    args = parser.parse_args()
+
+    speaker_config = dict(onnx_model_dir=args.model_dir, language=args.language, ref_audio_path=args.ref_audio,
+                          ref_audio_text=args.ref_text, ref_audio_language=args.ref_language)
+    sentences = [SENTENCES[i % len(SENTENCES)] for i in range(args.sentences)]
+
+    # the previous GenieTTS: inference awaited on the event loop, one sentence at a time
+    define_speaker("bench", **speaker_config)
+    lock = asyncio.Lock()
+    async def on_loop(text: str) -> bytes:
+        async with lock:
+            return await get_tts_wav(text, "bench")
+    await on_loop(sentences[0]) # warm-up
+    print(describe("on loop", args.sentences, *await run(on_loop, sentences)))
+
+    configs = [("thread", "thread", 1)] + [(f"process x{n}", "process", n) for n in args.workers]
+    for name, mode, workers in configs:
+        tts = GenieTTS(**speaker_config, workers=workers, worker_mode=mode)
+        await tts.prewarm()
+        await asyncio.gather(*(tts.synthesize(sentences[0]) for _ in range(workers))) # warm-up
+        print(describe(name, args.sentences, *await run(tts.synthesize, sentences)))
+        tts.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,143 @@
+"""
+Benchmark: LLM delta throughput and interrupt-to-silence latency of BasicChattingAgent
+
+A local mock of the GLM streaming API sends one token every `--token-ms`; TTS is mocked
+(`--tts-ms` per sentence). `emit` is replaced by a recorder, no relay server is needed. Reports:
+    - tokens/sec through the agent (first delta -> `done`)
+    - interrupt-to-silence latency (`interrupt()` due -> response task finished and no `say_aloud` emitted any more)
+
+for the old per-delta `asyncio.sleep(0.1)` check point and for the current cancellation-based interruption.
+
+Usage:
+    python _benchmarks/interrupt_bench.py [--tokens 200] [--token-ms 10] [--runs 5]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from agent.basic_chatting_agent import BasicChattingAgent
+from tts import AbstractTTS
+
+TOKENS = ["这是", "一个", "用于", "测试", "打断", "的", "句子", "。"]
+
+def start_mock_llm(args) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            try:
+                for i in range(args.tokens):
+                    time.sleep(args.token_ms / 1000)
+                    delta = {"choices": [{"delta": {"content": TOKENS[i % len(TOKENS)]}}]}
+                    self.wfile.write(f"data: {json.dumps(delta)}\n\n".encode())
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass # interrupted
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+class MockTTS(AbstractTTS):
+    def __init__(self, latency: float):
+        super().__init__(format="wav")
+        self.latency = latency
+
+    async def synthesize(self, text: str) -> bytes:
+        await asyncio.sleep(self.latency)
+        return b"\0" * 1024
+
+    async def synthesize_stream(self, text: str):
+        yield await self.synthesize(text)
+
+class Recorder:
+    def __init__(self):
+        self.events: list[tuple[float, str]] = []
+        self.done = asyncio.Event()
+
+    async def emit(self, event_data: dict, media_data: bytes = None):
+        self.events.append((time.perf_counter(), event_data["type"]))
+        if event_data["type"] == "end_of_response":
+            self.done.set()
+
+def create_agent(args, url: str, legacy: bool) -> tuple[BasicChattingAgent, Recorder]:
+    agent = BasicChattingAgent("ws://127.0.0.1:0", "bench", {"api_name": "glm", "token": "bench"},
+                               {"tts_method_name": "dashscope", "api_key": "bench", "voice": "bench"})
+    agent.llm.api_url = url
+    agent.tts = MockTTS(args.tts_ms / 1000)
+    agent.tts_pipeline.concurrent = True
+    recorder = Recorder()
+    agent.tts_pipeline.emit = recorder.emit
+
+    deltas: list[float] = []
+    @agent.llm.on("message_delta")
+    async def count_delta(data):
+        deltas.append(time.perf_counter())
+        if legacy:
+            await asyncio.sleep(0.1) # the old per-delta check point
+    agent.deltas = deltas
+    return agent, recorder
+
+async def user_input(agent: BasicChattingAgent):
+    agent.handle_message({"time": "", "data": {"type": "user_input", "content": "你好"}})
+    while agent._curr_task is None:
+        await asyncio.sleep(0)
+
+async def measure_throughput(args, url: str, legacy: bool) -> float:
+    agent, recorder = create_agent(args, url, legacy)
+    await user_input(agent)
+    await recorder.done.wait()
+    deltas = agent.deltas
+    return (len(deltas) - 1) / (deltas[-1] - deltas[0])
+
+async def measure_interrupt(args, url: str, legacy: bool) -> float:
+    agent, recorder = create_agent(args, url, legacy)
+    await user_input(agent)
+    task = agent._curr_task
+
+    due = time.perf_counter() + args.interrupt_after
+    await asyncio.sleep(args.interrupt_after)
+    agent.interrupt()
+    await asyncio.gather(task, return_exceptions=True)
+    await asyncio.sleep(args.tts_ms / 1000 * 2) # anything still emitted after this would be audible
+
+    silent_at = max([time.perf_counter() - args.tts_ms / 1000 * 2] +
+                    [t for t, event_type in recorder.events if event_type == "say_aloud" and t > due])
+    return silent_at - due
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=200, help="tokens in the mocked response")
+    parser.add_argument("--token-ms", type=float, default=10, help="mocked LLM time per token (ms)")
+    parser.add_argument("--tts-ms", type=float, default=200, help="mocked TTS latency per sentence (ms)")
+    parser.add_argument("--interrupt-after", type=float, default=1.0, help="interrupt this long after the user input (s)")
+    parser.add_argument("--runs", type=int, default=5, help="interrupt measurements")
+    args = parser.parse_args()
+
+    server = start_mock_llm(args)
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    for name, legacy in (("sleep(0.1) check point", True), ("cancellation", False)):
+        tokens_per_second = await measure_throughput(args, url, legacy)
+        latencies = [await measure_interrupt(args, url, legacy) for _ in range(args.runs)]
+        print(f"{name:22s} | {tokens_per_second:7.1f} tokens/s   interrupt-to-silence "
+              f"mean {statistics.mean(latencies) * 1000:6.1f} ms, max {max(latencies) * 1000:6.1f} ms")
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+"""
+Local stand-in for the DashScope Qwen TTS realtime WebSocket API (for benchmarks, no API key needed)
+
+Implements the subset used by `tts/dashscope`: session.update, input_text_buffer.append / commit
+(commit mode), server_commit mode with session.finish, and the response.audio.delta / response.done
+events. Latencies are simulated:
+    - `handshake_ms`: delay before the WebSocket handshake completes (TLS + auth of the real service)
+    - `first_audio_ms`: delay from commit to the first audio delta
+    - `chunk_ms` / `chunks`: audio deltas per response and the delay between them
+
+The "audio" of a response is its text (UTF-8, zero padded to `chunk_bytes`), so clients can check
+that they received the audio of their own request.
+
+Usage:
+    python _benchmarks/realtime_tts_standin.py [--port 8790]
+"""
+import argparse
+import asyncio
+import base64
+import json
+import uuid
+
+import websockets
+
+class StandinConfig:
+    def __init__(self, handshake_ms: float = 150, first_audio_ms: float = 80, chunk_ms: float = 20,
+                 chunks: int = 5, chunk_bytes: int = 4800):
+        self.handshake_ms = handshake_ms
+        self.first_audio_ms = first_audio_ms
+        self.chunk_ms = chunk_ms
+        self.chunks = chunks
+        self.chunk_bytes = chunk_bytes
+        self.connections = 0
+        self.responses = 0
+
+async def handle_session(ws, config: StandinConfig):
+    config.connections += 1
+    session_id = f"sess_{uuid.uuid4().hex}"
+    await ws.send(json.dumps({"type": "session.created", "session": {"id": session_id}}))
+    mode = "server_commit"
+    text = ""
+
+    async def respond(text: str):
+        audio = base64.b64encode(text.encode().ljust(config.chunk_bytes, b"\0")).decode()
+        config.responses += 1
+        response_id = f"resp_{uuid.uuid4().hex}"
+        await ws.send(json.dumps({"type": "response.created", "response": {"id": response_id}}))
+        await asyncio.sleep(config.first_audio_ms / 1000)
+        for i in range(config.chunks):
+            if i:
+                await asyncio.sleep(config.chunk_ms / 1000)
+            await ws.send(json.dumps({"type": "response.audio.delta", "response_id": response_id, "delta": audio}))
+        await ws.send(json.dumps({"type": "response.done", "response": {"id": response_id}}))
+
+    async for raw in ws:
+        event = json.loads(raw)
+        event_type = event.get("type")
+        if event_type == "session.update":
+            mode = event["session"].get("mode", mode)
+            await ws.send(json.dumps({"type": "session.updated", "session": {"id": session_id, **event["session"]}}))
+        elif event_type == "input_text_buffer.append":
+            text += event["text"]
+        elif event_type == "input_text_buffer.commit" or (event_type == "session.finish" and text):
+            await respond(text)
+            text = ""
+            if event_type == "session.finish":
+                await ws.send(json.dumps({"type": "session.finished"}))
+                await ws.close()
+        elif event_type == "session.finish":
+            await ws.send(json.dumps({"type": "session.finished"}))
+            await ws.close()
+
+async def serve_standin(config: StandinConfig, host: str = "127.0.0.1", port: int = 0):
+    """Start the stand-in server; returns the websockets server (`server.sockets[0].getsockname()[1]` is the port)"""
+    async def process_request(connection, request):
+        await asyncio.sleep(config.handshake_ms / 1000)
+
+    return await websockets.serve(lambda ws: handle_session(ws, config), host, port, process_request=process_request)
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--handshake-ms", type=float, default=150)
+    parser.add_argument("--first-audio-ms", type=float, default=80)
+    args = parser.parse_args()
+
+    config = StandinConfig(args.handshake_ms, args.first_audio_ms)
+    server = await serve_standin(config, args.host, args.port)
+    print(f"stand-in realtime TTS server on ws://{args.host}:{args.port}")
+    await server.wait_closed()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,96 @@
+"""
+Benchmark: messages/sec relayed from one agent to N frontends (JSON text messages)
+
+Compares the old relay path (full `json.loads` of every message + one `json.dumps` envelope
+per recipient) with the zero-parse path used by run_server (type peeked with a regex, the raw
+`data` text validated by a scan and embedded into one envelope shared by all recipients).
+
+The message mix is 80% small events (bracket_tag / start_of_response) and 20% `say_aloud`
+events carrying base64 audio (--audio-ms of 24 kHz 16 bit mono wav).
+
+Usage:
+    python _benchmarks/relay_json_bench.py [--messages 2000] [--audio-ms 100]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import base64
+import json
+import time
+from datetime import datetime
+
+from server import ConnectionManager
+from ws_protocol import peek_type, extract_event_data, make_event_envelope
+from ws_protocol.json_codec import CODEC_NAME, loads
+
+class NullWebSocket:
+    async def accept(self):
+        pass
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        pass
+
+    async def send_text(self, message: str):
+        pass
+
+    send_bytes = send_text
+
+def make_messages(count: int, audio_ms: int) -> list[str]:
+    audio = base64.b64encode(os.urandom(44 + 48 * audio_ms)).decode("utf-8")
+    say_aloud = json.dumps({"type": "event", "data": {"type": "say_aloud", "content": "你好呀", "media_data": audio, "format": "wav"}})
+    small = [
+        json.dumps({"type": "event", "data": {"type": "bracket_tag", "content": "点头"}}),
+        json.dumps({"type": "event", "data": {"type": "start_of_response"}}),
+    ]
+    return [say_aloud if i % 5 == 0 else small[i % 2] for i in range(count)]
+
+async def old_relay(manager: ConnectionManager, message: str):
+    message_data = json.loads(message)
+    event_data = message_data.get("data", "")
+    for client_id in manager.get_client_ids_by_agent_name("bench"):
+        await manager.send_personal_message(json.dumps({"time": datetime.now().isoformat(), "data": event_data}), client_id)
+
+async def zero_parse_relay(manager: ConnectionManager, message: str):
+    raw_data = extract_event_data(message)
+    if raw_data is None:
+        event_data = loads(message).get("data", "")
+        envelope = make_event_envelope(datetime.now().isoformat(), data_obj=event_data)
+        audio = isinstance(event_data, dict) and event_data.get("type") == "say_aloud"
+    else:
+        envelope = make_event_envelope(datetime.now().isoformat(), raw_data)
+        audio = peek_type(raw_data) == "say_aloud"
+    for client_id in manager.get_client_ids_by_agent_name("bench"):
+        await manager.send_personal_message(envelope, client_id, audio=audio)
+
+async def measure(relay, messages: list[str], recipients: int) -> float:
+    manager = ConnectionManager("bench", max_queue_size=len(messages) + 1)
+    client_ids = [await manager.connect(NullWebSocket(), {"agent_name": "bench"}) for _ in range(recipients)]
+    start = time.perf_counter()
+    for message in messages:
+        await relay(manager, message)
+    while any(manager.active_connections[c].queue for c in client_ids):
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    for client_id in client_ids:
+        await manager.disconnect(client_id)
+    return len(messages) / elapsed
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000, help="messages relayed per measurement")
+    parser.add_argument("--audio-ms", type=int, default=100, help="audio per say_aloud event (ms)")
+    parser.add_argument("--recipients", type=int, nargs="+", default=[1, 10, 100], help="frontends per agent")
+    args = parser.parse_args()
+
+    messages = make_messages(args.messages, args.audio_ms)
+    print(f"json codec: {CODEC_NAME}, {args.messages} messages, avg size {sum(map(len, messages)) // len(messages)} bytes")
+    for recipients in args.recipients:
+        old = await measure(old_relay, messages, recipients)
+        new = await measure(zero_parse_relay, messages, recipients)
+        print(f"{recipients:>4} recipients | old {old:>10.0f} msg/s | zero-parse {new:>10.0f} msg/s | x{new / old:.1f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
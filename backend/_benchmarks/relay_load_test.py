@@ -0,0 +1,264 @@
+"""
+Load test: N fake agents x M fake frontends per agent against run_server
+
+Starts `run_server.py` in a child process (or targets a running server with `--url`),
+connects N agents to `/ws/agent/{name}` and M frontends per agent to `/ws/frontend/{name}`,
+and replays a seeded mix of small events and large `say_aloud` audio events (binary frames).
+
+Reports, for the whole run:
+    - p50 / p95 / p99 relay latency (agent send -> frontend receive)
+    - events and bytes delivered per second, and the delivery ratio
+    - server RSS (peak and at the end of the run, summed over uvicorn workers)
+
+Exits with code 1 when `--max-p99-ms` or `--min-delivery` is violated, so it can be used
+as a regression gate in CI.
+
+Usage:
+    python _benchmarks/relay_load_test.py [--agents 4] [--frontends 10] [--duration 10]
+    python _benchmarks/relay_load_test.py --server-args="--workers 2 --backplane broker --start-broker"
+    python _benchmarks/relay_load_test.py --url ws://127.0.0.1:8000 --json result.json
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import json
+import random
+import shlex
+import statistics
+import subprocess
+import tempfile
+import time
+
+import psutil
+import websockets
+
+from ws_protocol import BINARY_FRAMES_CAPABILITY, encode_frame, peek_header
+from ws_protocol.json_codec import dumps, loads
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "run_server.py")
+
+SAMPLE_RATE = 24000 # DashScope realtime TTS
+BYTES_PER_SAMPLE = 2
+
+class Stats:
+    def __init__(self):
+        self.sent = 0
+        self.expected = 0 # sent events x frontends of the agent
+        self.received = 0
+        self.received_bytes = 0
+        self.latencies: list[float] = []
+
+def make_text(rng: random.Random) -> str:
+    return "".join(rng.choice("树莓娘你好今天天气很好我们一起聊天吧。") for _ in range(rng.randint(5, 60)))
+
+async def run_frontend(url: str, agent_name: str, legacy: bool, stats: Stats, ready: asyncio.Event, stop: asyncio.Event):
+    async with websockets.connect(f"{url}/ws/frontend/{agent_name}", max_size=None) as ws:
+        await ws.recv() # welcome
+        if not legacy:
+            await ws.send(dumps({"type": "hello", "capabilities": [BINARY_FRAMES_CAPABILITY]}))
+            await ws.recv()
+        ready.set()
+        while not stop.is_set():
+            try:
+                message = await asyncio.wait_for(ws.recv(), 0.5)
+            except asyncio.TimeoutError:
+                continue
+            now = time.perf_counter()
+            if isinstance(message, bytes):
+                data = peek_header(message).get("data", {})
+            else:
+                data = loads(message).get("data", {})
+            if not isinstance(data, dict) or "sent_at" not in data:
+                continue
+            stats.received += 1
+            stats.received_bytes += len(message)
+            stats.latencies.append(now - data["sent_at"])
+
+async def run_agent(url: str, agent_name: str, frontends: int, args, stats: Stats, start: asyncio.Event, stop: asyncio.Event):
+    rng = random.Random(f"{args.seed}-{agent_name}")
+    audio_bytes = SAMPLE_RATE * BYTES_PER_SAMPLE * args.audio_ms // 1000
+    audio = rng.randbytes(audio_bytes)
+    interval = 1 / args.rate
+
+    async with websockets.connect(f"{url}/ws/agent/{agent_name}", max_size=None) as ws:
+        await ws.recv() # welcome
+
+        async def drain_replies():
+            async for _ in ws:
+                pass
+        drain_task = asyncio.create_task(drain_replies())
+
+        await start.wait()
+        next_time = time.perf_counter()
+        seq = 0
+        while not stop.is_set():
+            if rng.random() < args.audio_ratio:
+                data = {"type": "say_aloud", "seq": seq, "sent_at": time.perf_counter()}
+                await ws.send(encode_frame({"type": "event", "data": data}, audio))
+            else:
+                data = {"type": "say", "seq": seq, "text": make_text(rng), "sent_at": time.perf_counter()}
+                await ws.send(dumps({"type": "event", "data": data}))
+            seq += 1
+            stats.sent += 1
+            stats.expected += frontends
+
+            next_time += interval * rng.expovariate(1.0) # Poisson arrivals
+            await asyncio.sleep(max(0.0, next_time - time.perf_counter()))
+
+        drain_task.cancel()
+
+def server_rss(pid: int) -> int:
+    """RSS of the server process and its children (uvicorn workers, broker), in bytes"""
+    try:
+        process = psutil.Process(pid)
+        processes = [process] + process.children(recursive=True)
+    except psutil.NoSuchProcess:
+        return 0
+    total = 0
+    for p in processes:
+        try:
+            total += p.memory_info().rss
+        except psutil.NoSuchProcess:
+            pass
+    return total
+
+async def sample_rss(pid: int, samples: list[int], stop: asyncio.Event):
+    while not stop.is_set():
+        samples.append(server_rss(pid))
+        await asyncio.sleep(0.2)
+
+def find_server_pid(port: int) -> int | None:
+    """PID of the process listening on the port (for servers started with --url)"""
+    try:
+        for conn in psutil.net_connections("tcp"):
+            if conn.status == psutil.CONN_LISTEN and conn.laddr.port == port and conn.pid:
+                return conn.pid
+    except psutil.AccessDenied:
+        pass
+    return None
+
+async def wait_for_server(url: str, timeout: float = 20.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            async with websockets.connect(f"{url}/ws/frontend/__load_test_probe__"):
+                return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+def percentile(q: list[float], p: int) -> float:
+    return q[p - 1] * 1000
+
+async def load_test(url: str, server_pid: int | None, args) -> dict:
+    stats = Stats()
+    start, stop = asyncio.Event(), asyncio.Event()
+    frontends_stop = asyncio.Event() # set after in-flight events are drained
+    rng = random.Random(args.seed)
+
+    frontend_tasks = []
+    for i in range(args.agents):
+        for _ in range(args.frontends):
+            ready = asyncio.Event()
+            legacy = rng.random() < args.legacy_ratio
+            frontend_tasks.append(asyncio.create_task(run_frontend(url, f"load-{i}", legacy, stats, ready, frontends_stop)))
+            await ready.wait()
+    agent_tasks = [
+        asyncio.create_task(run_agent(url, f"load-{i}", args.frontends, args, stats, start, stop))
+        for i in range(args.agents)
+    ]
+    await asyncio.sleep(0.5) # let the agents connect
+
+    rss_samples: list[int] = []
+    rss_task = asyncio.create_task(sample_rss(server_pid, rss_samples, stop)) if server_pid else None
+
+    start.set()
+    began = time.perf_counter()
+    await asyncio.sleep(args.duration)
+    stop.set()
+    elapsed = time.perf_counter() - began
+    await asyncio.gather(*agent_tasks)
+    await asyncio.sleep(args.drain) # in-flight events
+    frontends_stop.set()
+    await asyncio.gather(*frontend_tasks)
+    if rss_task:
+        await rss_task
+
+    q = statistics.quantiles(stats.latencies, n=100) if len(stats.latencies) > 1 else [0.0] * 99
+    return {
+        "agents": args.agents,
+        "frontends_per_agent": args.frontends,
+        "duration_s": round(elapsed, 2),
+        "events_sent": stats.sent,
+        "events_delivered": stats.received,
+        "delivery_ratio": round(stats.received / stats.expected, 4) if stats.expected else 0.0,
+        "delivered_per_s": round(stats.received / elapsed, 1),
+        "delivered_mib_per_s": round(stats.received_bytes / elapsed / 2 ** 20, 2),
+        "latency_p50_ms": round(percentile(q, 50), 2),
+        "latency_p95_ms": round(percentile(q, 95), 2),
+        "latency_p99_ms": round(percentile(q, 99), 2),
+        "server_rss_peak_mib": round(max(rss_samples) / 2 ** 20, 1) if rss_samples else None,
+        "server_rss_end_mib": round(rss_samples[-1] / 2 ** 20, 1) if rss_samples else None,
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", type=str, default=None, help="target a running server (e.g. ws://127.0.0.1:8000) instead of starting one")
+    parser.add_argument("--port", type=int, default=8790, help="port of the server started by the load test")
+    parser.add_argument("--server-args", type=str, default="", help="extra arguments passed to run_server.py")
+    parser.add_argument("--agents", type=int, default=4, help="number of fake agents")
+    parser.add_argument("--frontends", type=int, default=10, help="fake frontends per agent")
+    parser.add_argument("--legacy-ratio", type=float, default=0.0, help="fraction of frontends that do not negotiate binary frames")
+    parser.add_argument("--rate", type=float, default=20, help="events per second per agent (Poisson)")
+    parser.add_argument("--audio-ratio", type=float, default=0.2, help="fraction of events that are say_aloud audio")
+    parser.add_argument("--audio-ms", type=int, default=500, help="audio length of a say_aloud event (ms, 24 kHz 16 bit)")
+    parser.add_argument("--duration", type=float, default=10, help="test duration (s)")
+    parser.add_argument("--drain", type=float, default=1.0, help="time to wait for in-flight events after the test (s)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (the event mix is reproducible)")
+    parser.add_argument("--json", type=str, default=None, help="write the result to this JSON file")
+    parser.add_argument("--max-p99-ms", type=float, default=None, help="fail if the p99 latency exceeds this value")
+    parser.add_argument("--min-delivery", type=float, default=None, help="fail if the delivery ratio is below this value")
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        url = args.url.rstrip("/")
+        server_pid = find_server_pid(int(url.rsplit(":", 1)[-1]))
+    else:
+        url = f"ws://127.0.0.1:{args.port}"
+        log_dir = tempfile.mkdtemp(prefix="relay_load_test_") # run_server writes vtuber_server.log to its cwd
+        server = subprocess.Popen(
+            [sys.executable, SERVER_SCRIPT, "--port", str(args.port), *shlex.split(args.server_args)],
+            cwd=log_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        server_pid = server.pid
+
+    try:
+        await wait_for_server(url)
+        result = await load_test(url, server_pid, args)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    for key, value in result.items():
+        print(f"{key:>22}: {value}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+    failed = False
+    if args.max_p99_ms is not None and result["latency_p99_ms"] > args.max_p99_ms:
+        print(f"FAIL: p99 latency {result['latency_p99_ms']} ms > {args.max_p99_ms} ms")
+        failed = True
+    if args.min_delivery is not None and result["delivery_ratio"] < args.min_delivery:
+        print(f"FAIL: delivery ratio {result['delivery_ratio']} < {args.min_delivery}")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    asyncio.run(main())
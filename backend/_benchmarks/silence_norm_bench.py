@@ -0,0 +1,101 @@
+"""
+Benchmark: Genie silence normalization + WAV assembly, previous get_tts_wav post-processing vs tts/postprocess.py
+
+For long clips (seconds of 32 kHz speech with leading / trailing silence, delivered in `--chunks` chunks)
+compares the time and the peak memory allocated (tracemalloc, including NumPy buffers) of
+    - "previous":       the post-processing of the previous `get_tts_wav` (np.concatenate twice,
+                        np.where(np.abs(...)) over the whole clip, wave + BytesIO)
+    - "AudioBuffer":    append the chunks once, normalize in place, header written in front
+    - "Streaming":      `StreamingSilence` (one WAV per chunk, as `stream_tts_wav`)
+
+Usage:
+    python _benchmarks/silence_norm_bench.py [--seconds 5 30 120] [--chunks 8]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import io
+import time
+import tracemalloc
+import wave
+
+import numpy as np
+
+from tts.postprocess import AudioBuffer, StreamingSilence
+
+SAMPLE_RATE = 32000
+
+def previous(chunks: list[bytes]) -> bytes:
+    audio_chunks = [np.frombuffer(chunk, dtype=np.int16) for chunk in chunks]
+    combined_audio = np.concatenate(audio_chunks)
+    target_samples = int(SAMPLE_RATE * 200 / 1000)
+    combined_audio = np.concatenate(audio_chunks)
+    non_silent_indices = np.where(np.abs(combined_audio) > 10)[0]
+    audio_end = 0 if len(non_silent_indices) == 0 else non_silent_indices[-1] + 1
+    current_samples_after_end = len(combined_audio) - audio_end
+    if current_samples_after_end >= target_samples:
+        final_audio = combined_audio[:audio_end + target_samples]
+    else:
+        silence_to_add = np.zeros(target_samples - current_samples_after_end, dtype=np.int16)
+        final_audio = np.concatenate([combined_audio[:audio_end + current_samples_after_end], silence_to_add])
+    wav_bytesio = io.BytesIO()
+    with wave.open(wav_bytesio, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(SAMPLE_RATE)
+        wav_file.writeframes(final_audio.tobytes())
+    return wav_bytesio.getvalue()
+
+def audio_buffer(chunks: list[bytes]) -> bytearray:
+    audio = AudioBuffer(SAMPLE_RATE)
+    for chunk in chunks:
+        audio.append(chunk)
+    audio.normalize_silence()
+    return audio.to_wav()
+
+def streaming(chunks: list[bytes]) -> list[bytearray]:
+    silence = StreamingSilence(SAMPLE_RATE)
+    wavs = [wav for chunk in chunks if (wav := silence.push(chunk)) is not None]
+    wavs.append(silence.finish())
+    return wavs
+
+def make_clip(seconds: float, chunks: int) -> list[bytes]:
+    rng = np.random.default_rng(0)
+    samples = int(SAMPLE_RATE * seconds)
+    audio = (rng.standard_normal(samples) * 3000).astype(np.int16)
+    audio[:SAMPLE_RATE // 5] = 0 # 200 ms leading silence
+    audio[-SAMPLE_RATE // 2:] = 0 # 500 ms trailing silence
+    return [chunk.tobytes() for chunk in np.array_split(audio, chunks)]
+
+def measure(func, chunks: list[bytes], repeat: int) -> tuple[float, int]:
+    func(chunks) # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(chunks)
+    elapsed = (time.perf_counter() - start) / repeat
+
+    tracemalloc.start()
+    func(chunks)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, nargs="+", default=[5, 30, 120], help="clip lengths")
+    parser.add_argument("--chunks", type=int, default=8, help="chunks per clip")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    for seconds in args.seconds:
+        chunks = make_clip(seconds, args.chunks)
+        clip_mb = sum(map(len, chunks)) / 1e6
+        print(f"{seconds:g} s clip ({clip_mb:.1f} MB in {args.chunks} chunks)")
+        for name, func in (("previous", previous), ("AudioBuffer", audio_buffer), ("Streaming", streaming)):
+            elapsed, peak = measure(func, chunks, args.repeat)
+            print(f"  {name:12s} | {elapsed * 1000:8.3f} ms   peak allocated {peak / 1e6:7.2f} MB ({peak / 1e6 / clip_mb:4.1f}x clip)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark: CachedTTS miss / memory hit / disk hit latency
+
+Wraps a mocked TTS (`--tts-ms` per sentence, `--audio-kb` of audio in `--chunks` chunks) with
+`CachedTTS` and times `synthesize` and a full `synthesize_stream` iteration for repeated lines.
+The disk hits are measured with a second `CachedTTS` on the same directory (as after a restart).
+
+Usage:
+    python _benchmarks/tts_cache_bench.py [--lines 50] [--tts-ms 500]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+
+from tts import AbstractTTS
+from tts.cache import CachedTTS
+
+class MockTTS(AbstractTTS):
+    def __init__(self, args):
+        super().__init__(format="pcm")
+        self.args = args
+
+    def cache_identity(self) -> dict:
+        return {"tts": "mock", "voice": "bench"}
+
+    async def synthesize(self, text: str) -> bytes:
+        return b"".join([chunk async for chunk in self.synthesize_stream(text)])
+
+    async def synthesize_stream(self, text: str):
+        await asyncio.sleep(self.args.tts_ms / 1000)
+        for _ in range(self.args.chunks):
+            yield os.urandom(self.args.audio_kb * 1024 // self.args.chunks)
+
+async def time_lines(tts: CachedTTS, lines: list[str], stream: bool) -> list[float]:
+    times = []
+    for line in lines:
+        start = time.perf_counter()
+        if stream:
+            async for _ in tts.synthesize_stream(line):
+                pass
+        else:
+            await tts.synthesize(line)
+        times.append(time.perf_counter() - start)
+    return times
+
+def describe(times: list[float]) -> str:
+    return f"mean {statistics.mean(times) * 1e6:10.1f} us   max {max(times) * 1e6:10.1f} us"
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=50, help="distinct lines")
+    parser.add_argument("--tts-ms", type=float, default=500, help="mocked synthesis latency (ms)")
+    parser.add_argument("--audio-kb", type=int, default=96, help="audio per line (KiB, ~2 s of 24 kHz PCM)")
+    parser.add_argument("--chunks", type=int, default=8, help="chunks per streamed line")
+    args = parser.parse_args()
+
+    # full-width / extra spaces normalize to the same key as the first call
+    lines = [f"欢迎来到直播间！这是第{i}句台词。" for i in range(args.lines)]
+    variants = [f"  {line.replace('！', '!')}  " for line in lines]
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for stream in (False, True):
+            tts = CachedTTS(MockTTS(args), os.path.join(cache_dir, str(stream)))
+            print(f"{'synthesize_stream' if stream else 'synthesize'}")
+            print(f"  miss        | {describe(await time_lines(tts, lines, stream))}")
+            print(f"  memory hit  | {describe(await time_lines(tts, variants, stream))}")
+            restarted = CachedTTS(MockTTS(args), os.path.join(cache_dir, str(stream)))
+            print(f"  disk hit    | {describe(await time_lines(restarted, lines, stream))}")
+            print(f"  stats       | {tts.stats()}")
+            print(f"                {restarted.stats()}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
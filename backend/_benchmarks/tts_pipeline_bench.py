@@ -0,0 +1,107 @@
+"""
+Benchmark: inline TTS vs pipelined TTS (look-ahead) in the LLM -> sentence -> TTS -> emit graph
+
+Mocked LLM (one token every `--token-ms`) and mocked TTS (`--tts-base-ms` + `--tts-char-ms` per
+character, audio lasting `--audio-char-ms` per character). Emitted audio is "played" back to back
+as in the frontend. Reports:
+    - time to first audio (LLM request -> first `say_aloud` emitted)
+    - gaps between sentences (silence while the player waits for the next sentence's audio)
+    - total time until the last audio has been played
+
+Usage:
+    python _benchmarks/tts_pipeline_bench.py [--sentences 6] [--look-ahead 3]
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from stream_node import SentenceSepNode, LambdaNode
+from agent.tts_pipeline import TTSPipeline
+
+SENTENCE = "这是一个用于测试语音合成流水线的句子。"
+
+class Player:
+    """Plays emitted audio back to back and records the silence between sentences"""
+
+    def __init__(self, start: float, audio_char_ms: float):
+        self.start = start
+        self.audio_char_ms = audio_char_ms
+        self.first_audio: float = None
+        self.play_end: float = None
+        self.gaps: list[float] = []
+
+    async def emit(self, event_data: dict, media_data: bytes = None):
+        if event_data.get("type") != "say_aloud":
+            return
+        now = time.perf_counter()
+        if self.first_audio is None:
+            self.first_audio = now - self.start
+            self.play_end = now
+        elif now > self.play_end:
+            self.gaps.append(now - self.play_end)
+            self.play_end = now
+        self.play_end += len(media_data) * self.audio_char_ms / 1000
+
+def mock_synthesize(args):
+    async def synthesize(text: str):
+        await asyncio.sleep((args.tts_base_ms + len(text) * args.tts_char_ms) / 1000)
+        yield {"format": "wav"}, b"\0" * len(text)
+    return synthesize
+
+async def mock_llm(args, on_delta):
+    for sentence in [SENTENCE] * args.sentences:
+        for char in sentence:
+            await asyncio.sleep(args.token_ms / 1000)
+            await on_delta(char)
+
+async def run(args, pipelined: bool) -> Player:
+    player = Player(time.perf_counter(), args.audio_char_ms)
+    synthesize = mock_synthesize(args)
+    sentence_sep = SentenceSepNode(seps="'.:;?!。：；？！\n")
+
+    if pipelined:
+        pipeline = TTSPipeline(synthesize, player.emit, look_ahead=args.look_ahead, concurrent=not args.serial_tts)
+        async def speak_pipelined(_, sentence):
+            await pipeline.speak(sentence)
+        sentence_sep.connect_to(LambdaNode(speak_pipelined))
+    else:
+        async def speak_inline(_, sentence):
+            async for fields, audio in synthesize(sentence):
+                await player.emit({"type": "say_aloud", "content": sentence, **fields}, audio)
+        sentence_sep.connect_to(LambdaNode(speak_inline))
+
+    await mock_llm(args, sentence_sep.handle)
+    if pipelined:
+        await pipeline.join()
+
+    await asyncio.sleep(max(0, player.play_end - time.perf_counter()))
+    player.total = time.perf_counter() - player.start
+    return player
+
+def describe(player: Player) -> str:
+    gaps = player.gaps or [0.0]
+    return (f"TTFA {player.first_audio * 1000:7.1f} ms   gaps {len(player.gaps):2d} "
+            f"(mean {statistics.mean(gaps) * 1000:6.1f} ms, max {max(gaps) * 1000:6.1f} ms)   "
+            f"total {player.total:6.2f} s")
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sentences", type=int, default=6, help="sentences in the response")
+    parser.add_argument("--token-ms", type=float, default=30, help="LLM time per token (ms)")
+    parser.add_argument("--tts-base-ms", type=float, default=300, help="TTS latency per sentence (ms)")
+    parser.add_argument("--tts-char-ms", type=float, default=40, help="TTS latency per character (ms)")
+    parser.add_argument("--audio-char-ms", type=float, default=60, help="audio duration per character (ms)")
+    parser.add_argument("--look-ahead", type=int, default=3, help="pipeline look-ahead")
+    parser.add_argument("--serial-tts", action="store_true", help="TTS engine without concurrency support")
+    args = parser.parse_args()
+
+    print(f"inline    | {describe(await run(args, pipelined=False))}")
+    print(f"pipelined | {describe(await run(args, pipelined=True))}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
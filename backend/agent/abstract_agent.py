@@ -2,22 +2,50 @@
 AI VTuber Agent (behavior controller)
 """
 
-from typing import Literal, Union, Callable, Any
+from typing import Literal, NamedTuple, Union, Callable, Any
+from collections import deque
+from datetime import datetime
+from functools import partial
 
 import asyncio
+import base64
 import json
+import logging
+import random
+import time
 import websockets
 
 import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from ws_protocol import BINARY_FRAMES_CAPABILITY, encode_frame_into
+from metrics import serve_metrics
+from . import agent_metrics
+from .scheduler import PeriodicScheduler, PeriodicJob, OverrunPolicy
+from .handler_executor import HandlerExecutor, QueueMode
+
+logger = logging.getLogger(__name__)
+
 BotConfig = dict[Union[Literal["api_name"], str], str]
 TimeStampISO = str
 EventData = dict
+# raw media payload: one bytes-like object, or parts sent back to back (e.g. a WAV header and the PCM behind it)
+MediaData = Union[bytes, bytearray, memoryview, tuple[Union[bytes, bytearray, memoryview], ...]]
+
+# Connection state machine:
+#   idle -> connecting -> connected -> reconnecting -> connecting -> ... -> closed
+ConnectionState = Literal["idle", "connecting", "connected", "reconnecting", "closed"]
+
+class PendingEvent(NamedTuple):
+    """An event emitted while the agent was not connected"""
+    event_data: dict
+    media_data: MediaData | None
+    emit_time: float
 
 class Agent:
-    def __init__(self, server_url: str, agent_name: str):
+    def __init__(self, server_url: str, agent_name: str, binary_frames: bool = True, metrics_port: int = None,
+                 auto_reconnect: bool = True, outbound_buffer_size: int = 256, audio_max_age: float = 1.0):
 
         # ensure the server_url is a valid websocket url
         if not (server_url.startswith("ws://") or server_url.startswith("wss://")):
@@ -36,18 +64,56 @@ class Agent:
         self._event_handlers: dict[str, list[Callable[['Agent', TimeStampISO, EventData], None]]] = {}
         self.ws = None
 
-        self._loop_funcs: list[Callable[['Agent'], None]] = []
+        # (loop function, scheduling options)
+        self._loop_funcs: list[tuple[Callable[['Agent'], Any], dict]] = []
+        self.loop_interval = 0.1 # default period of loop functions (s)
+        self.scheduler = PeriodicScheduler()
+        # coroutine event handlers run here (per event type queue + concurrency limit)
+        self.handler_executor = HandlerExecutor(agent_name)
+
+        # binary frames are used only if allowed here AND advertised by the server
+        self.allow_binary_frames = binary_frames
+        self.binary_frames = False
+
+        # audio formats each frontend of this agent can decode (frontend id -> formats), reported by the server
+        self.frontend_audio_formats: dict[str, list[str]] = {}
+
+        # Prometheus metrics are served on this port while the agent runs (None: not exported)
+        self.metrics_port = metrics_port
+        self._emit_latency = agent_metrics.EMIT_LATENCY.labels(agent_name, "false")
+        self._emit_media_latency = agent_metrics.EMIT_LATENCY.labels(agent_name, "true")
+
+        # connection state & reconnection (exponential backoff with full jitter)
+        self.state: ConnectionState = "idle"
+        self._state_handlers: list[Callable[['Agent', ConnectionState], Any]] = []
+        self.auto_reconnect = auto_reconnect
+        self.reconnect_initial_delay = 0.5
+        self.reconnect_max_delay = 30.0
+        self._stopping = False
+
+        # events emitted while disconnected are replayed after reconnecting;
+        # audio older than audio_max_age seconds is stale by then and dropped
+        self._outbound: deque[PendingEvent] = deque(maxlen=outbound_buffer_size)
+        self.audio_max_age = audio_max_age
+
+        # binary frames are assembled in these reused buffers (one per send in progress)
+        self._frame_buffers: list[bytearray] = []
     
-    def on(self, event_type: str):
+    def on(self, event_type: str, concurrency: int = None, max_queue: int = None,
+           mode: QueueMode = None, deadline: float = None):
         """
         Register a handler function for a specific event type.
-        Or register a loop function that will be called every time the agent receives a message. (when event_type is "loop")
+        Or register a loop function that will be called periodically. (when event_type is "loop")
         
         Args:
             event_type (str): The type of event to handle.
+            concurrency (int, optional): Max coroutine handler runs of this event type at the same time (default 8).
+            max_queue (int, optional): Max runs waiting for a free slot; the oldest is dropped beyond it (default 100).
+            mode (QueueMode, optional): "queue" (default) runs every event, "latest" keeps only the newest waiting event.
+            deadline (float, optional): Drop events that waited longer than this many seconds (default: no deadline).
         
         Reserved event types:
-            "loop": The function will be called every 0.1 seconds.
+            "loop": The function will be called every `self.loop_interval` (0.1) seconds.
 
         Usage:
             ```
@@ -60,6 +126,8 @@ class Agent:
                 ...
             ```
         """
+        self.handler_executor.configure(event_type, concurrency=concurrency, max_queue=max_queue, mode=mode, deadline=deadline)
+
         def decorator(func: Callable[['Agent', TimeStampISO, EventData], None]):
             if event_type not in self._event_handlers:
                 self._event_handlers[event_type] = []
@@ -67,100 +135,266 @@ class Agent:
             return func
         return decorator
     
-    def loop(self, func: Callable[['Agent'], Any]):
+    def loop(self, func: Callable[['Agent'], Any] = None, *, interval: float = None,
+             jitter: float = 0.0, overrun: OverrunPolicy = "skip"):
         """
-        Register a loop function that will be called every time the agent receives a message.
-        
+        Register a loop function that will be called periodically (every `self.loop_interval` seconds by default).
+
+        Ticks are drift-free: the period does not grow with the runtime of the function.
+
         Args:
             func (Callable[['Agent'], Any]): The loop function to register.
+            interval (float, optional): Period in seconds.
+            jitter (float): Random delay in [0, jitter) seconds added to each tick.
+            overrun (OverrunPolicy): "skip" (default) drops ticks missed by a slow run, "catch_up" runs them back to back.
+
+        Usage:
+            ```
+            @agent.loop
+            async def every_100ms(self): ...
+
+            @agent.loop(interval=5.0, jitter=0.5)
+            async def every_5s(self): ...
+            ```
         """
-        self._loop_funcs.append(func)
+        def decorator(func: Callable[['Agent'], Any]):
+            self._loop_funcs.append((func, {"interval": interval, "jitter": jitter, "overrun": overrun}))
+            return func
+        if func is None:
+            return decorator
+        return decorator(func)
+
+    def on_connection_state(self, func: Callable[['Agent', ConnectionState], Any]):
+        """
+        Register a function called with (agent, state) whenever the connection state changes.
+        Coroutine functions run on `self.handler_executor` (event type "connection_state").
+
+        States: "idle", "connecting", "connected", "reconnecting", "closed".
+        """
+        self._state_handlers.append(func)
         return func
 
-    async def emit(self, event_data: dict):
+    def _set_state(self, state: ConnectionState):
+        if state == self.state:
+            return
+        logger.info(f"智能体 {self.agent_name} 连接状态: {self.state} -> {state}")
+        self.state = state
+        for func in self._state_handlers:
+            if asyncio.iscoroutinefunction(func):
+                self.handler_executor.submit("connection_state", partial(func, self, state))
+            else:
+                func(self, state)
+
+    async def emit(self, event_data: dict, media_data: MediaData = None):
         """
         Emit an event to the server.
+
+        While the agent is not connected, the event is kept in a bounded buffer and sent after reconnecting
+        (the oldest events are dropped when the buffer is full; stale audio is dropped on replay).
         
         Args:
             event_data (dict): The event data to emit.
+            media_data (bytes-like or tuple of bytes-like, optional): Raw media payload (e.g. wav audio) attached to the event.
+                Sent as a binary frame if the server supports it, otherwise base64 encoded into `event_data["media_data"]`.
+                The payload is not copied before it is sent: it must not be modified after `emit`.
         """
-        if self.ws:
+        if self.state != "connected":
+            self._buffer_event(PendingEvent(event_data, media_data, time.monotonic()))
+            return
+
+        try:
+            await self._send_event(event_data, media_data)
+        except websockets.ConnectionClosed:
+            self._buffer_event(PendingEvent(event_data, media_data, time.monotonic()))
+
+    def _buffer_event(self, event: PendingEvent):
+        if self.state == "closed":
+            return
+        if len(self._outbound) == self._outbound.maxlen:
+            agent_metrics.OUTBOUND_DROPPED.labels(self.agent_name, "buffer_full").inc()
+        self._outbound.append(event)
+
+    async def _flush_outbound(self):
+        """Replay the events buffered while disconnected (in order)"""
+        while self._outbound:
+            event = self._outbound[0]
+            if event.media_data is not None and time.monotonic() - event.emit_time > self.audio_max_age:
+                agent_metrics.OUTBOUND_DROPPED.labels(self.agent_name, "stale_audio").inc()
+            else:
+                await self._send_event(event.event_data, event.media_data)
+            self._outbound.popleft()
+
+    async def _send_event(self, event_data: dict, media_data: MediaData = None):
+        start = time.perf_counter()
+        if media_data is None:
             await self.ws.send(json.dumps({"type": "event", "data": event_data}))
+            self._emit_latency.observe(time.perf_counter() - start)
+            return
+
+        parts = media_data if isinstance(media_data, tuple) else (media_data,)
+        if self.binary_frames:
+            # the frame is written into a reused buffer; websockets copies it (masking) before send returns
+            buffer = self._frame_buffers.pop() if self._frame_buffers else bytearray()
+            try:
+                with encode_frame_into(buffer, {"type": "event", "data": event_data}, parts) as frame:
+                    await self.ws.send(frame)
+            finally:
+                self._frame_buffers.append(buffer)
+        else:
+            payload = parts[0] if len(parts) == 1 else b"".join(parts)
+            event_data = {**event_data, "media_data": base64.b64encode(payload).decode("utf-8")}
+            await self.ws.send(json.dumps({"type": "event", "data": event_data}))
+        self._emit_media_latency.observe(time.perf_counter() - start)
+
+    def handle_system_message(self, message: dict):
+        """
+        Handle a system message from the server (e.g. the welcome message sent on connection,
+        or the audio formats of frontends that connected, said hello or disconnected).
+        """
+        if "capabilities" in message: # welcome: a new connection, the frontends report again
+            self.binary_frames = self.allow_binary_frames and BINARY_FRAMES_CAPABILITY in message["capabilities"]
+            self.frontend_audio_formats.clear()
+
+        for frontend_id, formats in message.get("frontend_audio_formats", {}).items():
+            if formats is None:
+                self.frontend_audio_formats.pop(frontend_id, None)
+            else:
+                self.frontend_audio_formats[frontend_id] = formats
+
+    def parse_message(self, raw: Union[str, bytes]) -> dict | None:
+        """
+        Decode a message from the server. Returns None for messages that are not JSON objects.
+        """
+        try:
+            message = json.loads(raw)
+        except json.JSONDecodeError:
+            return None
+        return message if isinstance(message, dict) else None
 
     async def check_message(self):
         """
-        Handle an event message.
+        Wait for the next message from the server.
         """
         if not self.ws:
             return
 
-        try:
-            message = await asyncio.wait_for(self.ws.recv(), timeout=0.1)
-            message = json.loads(message)
-            return message
-        except (json.JSONDecodeError, asyncio.TimeoutError):
-            return None
+        return self.parse_message(await self.ws.recv())
+
+    def handle_message(self, message: dict):
+        """
+        Dispatch a message from the server to the registered event handlers.
+        """
+        logger.debug("智能体 %s 接收事件: %s", self.agent_name, message)
+
+        if message.get("type") == "system":
+            self.handle_system_message(message)
+            return
+
+        time_iso: str = message.get("time", "")
+        event_data: dict = message.get("data", {})
+        event_type: str = event_data.get("type", "")
+
+        # event handlers
+        if event_type != "loop" and event_type in self._event_handlers:
+            for handler in self._event_handlers[event_type]:
+                if asyncio.iscoroutinefunction(handler):
+                    self.handler_executor.submit(event_type, partial(handler, self, time_iso, event_data))
+                else:
+                    handler(self, time_iso, event_data)
 
     async def main_loop(self):
-        while True:
-            try:
-                # print("main loop alive")
-
-                # print("[main loop] receiving message...") # DEBUG
-                message = await self.check_message()
-                if not message:
-                    continue
-                print(f"智能体 {self.agent_name} 接收事件: {message}") # DEBUG
-
-                if type(message) is not dict:
-                    continue
-
-                time_iso: str = message.get("time", "")
-                event_data: dict = message.get("data", {})
-                event_type: str = event_data.get("type", "")
-
-                print(self._event_handlers.get(event_type, None)) # DEBUG
-
-                # event handlers
-                if event_type != "loop" and event_type in self._event_handlers:
-                    for handler in self._event_handlers[event_type]:
-                        if asyncio.iscoroutinefunction(handler):
-                            asyncio.create_task(handler(self, time_iso, event_data))
-                        else:
-                            handler(self, time_iso, event_data)
-
-                # 例如：await self.handle_event(message)
-            except websockets.ConnectionClosed:
-                # 连接断开，退出循环
-                break
-    
-    async def event_loop(self):
-        while True:
-            await asyncio.sleep(0.1)
+        """
+        Receive loop. Wakes up only when a message arrives (no polling); returns when the connection is closed.
+        """
+        try:
+            async for raw in self.ws:
+                message = self.parse_message(raw)
+                if message is not None:
+                    self.handle_message(message)
+        except websockets.ConnectionClosed:
+            # 连接断开，退出循环
+            pass
+
+    def _handle_loop_overrun(self, job: PeriodicJob):
+        agent_metrics.LOOP_OVERRUNS.labels(self.agent_name, job.name).inc()
+        logger.debug("智能体 %s 的循环函数 %s 超时 (耗时 %.3fs, 周期 %.3fs)",
+                     self.agent_name, job.name, job.stats.last_duration, job.interval)
+
+    def _call_loop_handler(self, handler: Callable[['Agent', TimeStampISO, EventData], Any]):
+        return handler(self, datetime.now().isoformat(), {"type": "loop"})
+
+    def start_loop_hooks(self):
+        """
+        Start the loop hooks (`@agent.loop` functions and `@agent.on("loop")` handlers) on `self.scheduler`,
+        each in its own task, independently of the receive loop. Stats: `self.scheduler.stats()`.
+        """
+        if not self.scheduler.jobs:
+            for func, options in self._loop_funcs:
+                self.scheduler.add(
+                    getattr(func, "__name__", repr(func)), partial(func, self),
+                    interval=options["interval"] or self.loop_interval,
+                    jitter=options["jitter"], overrun=options["overrun"],
+                    on_overrun=self._handle_loop_overrun,
+                )
+            for handler in self._event_handlers.get("loop", []):
+                self.scheduler.add(
+                    getattr(handler, "__name__", repr(handler)),
+                    partial(self._call_loop_handler, handler),
+                    interval=self.loop_interval, on_overrun=self._handle_loop_overrun,
+                )
+        self.scheduler.start()
 
     async def run(self):
         """
         Agent main loop
+
+        Reconnects with exponential backoff (and full jitter) when the connection is lost, until `stop` is called
+        (or after the first disconnection if `auto_reconnect` is False).
         """
         uri = f"{self.server_url}/ws/agent/{self.agent_name}"
 
-        async with websockets.connect(uri) as ws:
-            self.ws = ws
+        if self.metrics_port is not None:
+            await serve_metrics(self.metrics_port)
+            logger.info(f"智能体 {self.agent_name} 指标: http://0.0.0.0:{self.metrics_port}/metrics")
 
-            tasks = []
-            tasks.append(asyncio.create_task(self.main_loop()))
+        self._stopping = False
+        self.start_loop_hooks()
+        delay = self.reconnect_initial_delay
+        try:
+            while not self._stopping:
+                self._set_state("connecting")
+                try:
+                    async with websockets.connect(uri) as ws:
+                        self.ws = ws
+                        await self._on_connected(ws)
+                        delay = self.reconnect_initial_delay
+                        await self.main_loop()
+                except (OSError, asyncio.TimeoutError, websockets.WebSocketException) as e:
+                    logger.warning(f"智能体 {self.agent_name} 连接失败: {e!r}")
+                finally:
+                    self.ws = None
 
-            for func in self._loop_funcs:
-                async def loop_func(agent):
-                    while True:
-                        if asyncio.iscoroutinefunction(func):
-                            await func(agent)
-                        else:
-                            func(agent)
-                        await asyncio.sleep(0.1)
-                tasks.append(asyncio.create_task(loop_func(self)))
+                if self._stopping or not self.auto_reconnect:
+                    break
+                self._set_state("reconnecting")
+                agent_metrics.RECONNECTS.labels(self.agent_name).inc()
+                await asyncio.sleep(random.uniform(0, delay))
+                delay = min(delay * 2, self.reconnect_max_delay)
+        finally:
+            self._set_state("closed")
+            await self.scheduler.stop()
+            await self.handler_executor.shutdown()
 
-            for task in tasks:
-                await task
+    async def _on_connected(self, ws):
+        """Read the welcome message, replay buffered events, then mark the agent as connected"""
+        message = self.parse_message(await asyncio.wait_for(ws.recv(), timeout=10))
+        if message is not None:
+            self.handle_message(message)
+        await self._flush_outbound()
+        self._set_state("connected")
 
-                
+    async def stop(self):
+        """Close the connection and stop reconnecting (`run` returns)"""
+        self._stopping = True
+        if self.ws is not None:
+            await self.ws.close()
@@ -0,0 +1,25 @@
+"""
+Prometheus metrics of agents
+
+Always recorded; exported only when the agent is created with `metrics_port` (see `Agent.run`).
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import Counter, Histogram
+
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "vtuber_agent_llm_time_to_first_token_seconds", "Time from sending the context to the LLM to its first message delta", ["agent_name"])
+TTS_TIME_TO_FIRST_AUDIO = Histogram(
+    "vtuber_agent_tts_time_to_first_audio_seconds", "Time from starting TTS of a sentence to its first audio chunk", ["agent_name"])
+EMIT_LATENCY = Histogram(
+    "vtuber_agent_emit_latency_seconds", "Time spent in Agent.emit (encoding + WebSocket send)", ["agent_name", "media"])
+LOOP_OVERRUNS = Counter(
+    "vtuber_agent_loop_overruns_total", "Loop function runs that took longer than their interval", ["agent_name", "loop"])
+HANDLER_EVENTS = Counter(
+    "vtuber_agent_handler_events_total", "Event handler jobs by outcome (completed, failed, dropped, expired, ...)", ["agent_name", "event_type", "outcome"])
+RECONNECTS = Counter(
+    "vtuber_agent_reconnects_total", "Lost or failed connections to the server followed by a reconnection attempt", ["agent_name"])
+OUTBOUND_DROPPED = Counter(
+    "vtuber_agent_outbound_dropped_total", "Events emitted while disconnected that were never sent", ["agent_name", "reason"])
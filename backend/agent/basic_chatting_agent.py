@@ -1,10 +1,13 @@
 """
 Basic chatting agent
 """
+from typing import Optional
 from .abstract_agent import Agent, EventData
 
 import base64
 import asyncio
+import logging
+import time
 import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
@@ -12,21 +15,43 @@ sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 from stream_node import SentenceSepNode, BracketsParsorNode, LambdaNode
 from llm_api import create_bot
 from tts import create_tts
+from tts.wav_stream import WavStreamEncoder
 from tts.pcm2wav import pcm2wav
+from tts.coalesce import coalesce
+from tts.codecs import CODECS, WAV, encode_utterance, negotiate, negotiate_pcm
 
 from config_types import LLM_Config, TTS_Config
+from .agent_metrics import LLM_TIME_TO_FIRST_TOKEN, TTS_TIME_TO_FIRST_AUDIO
+from .tts_pipeline import TTSPipeline
+
+logger = logging.getLogger(__name__)
 
 def is_empty(content: str) -> bool:
     return not content.strip()
 
 class BasicChattingAgent(Agent):
-    def __init__(self, server_url: str, agent_name: str, llm_api_config: LLM_Config, tts_config: TTS_Config, tts_stream: bool = False):
-        super().__init__(server_url, agent_name)
+    def __init__(self, server_url: str, agent_name: str, llm_api_config: LLM_Config, tts_config: TTS_Config, tts_stream: bool = False, binary_frames: bool = True, metrics_port: int = None, auto_reconnect: bool = True, tts_look_ahead: int = 3, tts_frame_ms: Optional[int] = 200, audio_codecs: Optional[list[str]] = None):
+        super().__init__(server_url, agent_name, binary_frames=binary_frames, metrics_port=metrics_port, auto_reconnect=auto_reconnect)
 
         self.llm = create_bot(**llm_api_config)
         self.tts = create_tts(**tts_config)
 
         self.tts_stream = tts_stream
+        # streamed audio chunks are sent in say_aloud frames of up to tts_frame_ms (None: one event per chunk)
+        self.tts_frame_ms = tts_frame_ms
+
+        # one WAV header per sentence, its following chunks as raw PCM or as WAV (None for formats other than pcm / wav: sent as is)
+        self.audio_encoder = WavStreamEncoder.for_tts(self.tts)
+
+        # preferred say_aloud codecs (see tts/codecs.py): each sentence uses the first one every connected frontend decodes, else wav
+        self.audio_codecs = audio_codecs or []
+        for name in self.audio_codecs:
+            if name != WAV and name not in CODECS:
+                logger.warning(f"音频编码 {name} 不可用 (未知或缺少编码库), 将被忽略")
+
+        # sentences are synthesized ahead (up to tts_look_ahead) while earlier audio is emitted, in order
+        self.tts_pipeline = TTSPipeline(self.synthesize_audio, self.emit, look_ahead=tts_look_ahead,
+                                        concurrent=self.tts.supports_concurrency)
 
         # streaming workflow: sentence_sep -> brackets_parsor -> event_emitter
         # self.sentence_sep_node = SentenceSepNode(seps = "',.:;?!，。：；？！\n")
@@ -49,6 +74,11 @@ class BasicChattingAgent(Agent):
 
         self._curr_task: asyncio.Task = None
 
+        # time the current LLM request was sent (None once its first token arrived)
+        self._llm_request_time: float = None
+        self._llm_ttft = LLM_TIME_TO_FIRST_TOKEN.labels(agent_name)
+        self._tts_ttfa = TTS_TIME_TO_FIRST_AUDIO.labels(agent_name)
+
         @self.on("user_input")
         async def handle_user_input(_, timestamp: str, event_data: EventData):
             """
@@ -73,6 +103,7 @@ class BasicChattingAgent(Agent):
 
                 # 调用 LLM API 处理用户输入
                 self.llm.append_context(content, "user")
+                self._llm_request_time = time.perf_counter()
                 res = await self.llm.respond_to_context()
                 # print(f"LLM 回复: {res}") # DEBUG
 
@@ -85,18 +116,20 @@ class BasicChattingAgent(Agent):
 
         @self.llm.on("start_of_response")
         async def handle_start_of_response(data):
-            await self.emit({"type": "start_of_response"})
+            self.tts_pipeline.pass_event({"type": "start_of_response"})
 
         @self.llm.on("message_delta")
         async def handle_message_delta(data):
-            await asyncio.sleep(0.1) # check point (to check if the conversation is interrupted)
+            if self._llm_request_time is not None:
+                self._llm_ttft.observe(time.perf_counter() - self._llm_request_time)
+                self._llm_request_time = None
             await self.sentence_sep_node.handle(data["content"])
         
         @self.llm.on("done")
         async def handle_done(data):
             self.llm.messages.append({"role": "assistant", "content": data["content"]})
             await self.sentence_sep_node.handle(" ")
-            await self.emit({"type": "end_of_response", "response": data["content"]})
+            self.tts_pipeline.pass_event({"type": "end_of_response", "response": data["content"]})
     
     def interrupt(self):
         """
@@ -111,6 +144,7 @@ class BasicChattingAgent(Agent):
                 self.llm.messages.insert(-1, {"role": "assistant", "content": f"{self._curr_agent_response}"})
                 should_interrupt = True
             self.sentence_sep_node.reset()
+        self.tts_pipeline.cancel()
 
         return should_interrupt
     
@@ -129,6 +163,54 @@ class BasicChattingAgent(Agent):
     #         print(f"Error encoding wav to base64: {e}")
     #         return ""
         
+    async def synthesize(self, content: str):
+        """
+        Synthesize a sentence, yielding its audio (one chunk, or several if `tts_stream`)
+
+        Chunks are yielded as the TTS produced them (`synthesize_audio` groups and encodes them for the wire).
+        """
+        tts_start = time.perf_counter()
+        if self.tts_stream:
+            chunks = self.tts.synthesize_stream(content)
+        else:
+            chunks = self._synthesize_whole(content)
+
+        first_pack = True
+        async for media_data in chunks:
+            if not media_data: # e.g. a sentence of punctuation only
+                continue
+            if first_pack:
+                first_pack = False
+                self._tts_ttfa.observe(time.perf_counter() - tts_start)
+            yield media_data
+
+    async def synthesize_audio(self, content: str):
+        """
+        Synthesize a sentence, yielding its audio encoded for the wire: (say_aloud fields, media)
+
+        Chunks are coalesced into frames, then encoded with the negotiated codec (or as WAV + PCM when every
+        frontend decodes raw PCM, otherwise as one WAV per frame). A sentence without audio still yields one
+        message (an empty WAV), so that its text reaches the frontends.
+        """
+        chunks = self.synthesize(content)
+        if self.audio_encoder is None: # other formats (e.g. mp3): every chunk is sent on its own
+            messages = (({"format": self.tts.format}, chunk) async for chunk in chunks)
+        else:
+            frames = coalesce(chunks, self.tts_frame_ms, self.audio_encoder.chunk_byte_rate)
+            codecs = negotiate(self.audio_codecs, self.frontend_audio_formats.values())
+            pcm_continuation = negotiate_pcm(self.frontend_audio_formats.values())
+            messages = encode_utterance(frames, self.audio_encoder, codecs, pcm_continuation)
+
+        silent = True
+        async for message in messages:
+            silent = False
+            yield message
+        if silent:
+            yield {"format": WAV}, (pcm2wav(b""),)
+
+    async def _synthesize_whole(self, content: str):
+        yield await self.tts.synthesize(content)
+
     async def handle_event(self, data: dict):
         """
         Handle event
@@ -136,32 +218,9 @@ class BasicChattingAgent(Agent):
         data_type = data.get("type", "")
         content = data.get("content", "")
 
-        await asyncio.sleep(0) # check point (to check if the conversation is interrupted)
-
         if data_type == "text":
             self._curr_agent_response += content
-
-            # TTS
-            if self.tts_stream:
-                first_pack = True
-                async for media_data in self.tts.synthesize_stream(content):
-                    if self.tts.format == "pcm":
-                        media_data = pcm2wav(media_data, sample_rate=self.tts.sample_rate, channels=self.tts.channels, bits_per_sample=self.tts.bits_per_sample)
-                    base64_data = base64.b64encode(media_data).decode("utf-8")
-
-                    if first_pack:
-                        first_pack = False
-                        display_text = content
-                    else:
-                        display_text = ""
-
-                    await self.emit({"type": "say_aloud", "content": display_text, "media_data": base64_data, "format": "wav"})
-            else:
-                media_data = await self.tts.synthesize(content)
-                if self.tts.format == "pcm":
-                    media_data = pcm2wav(media_data, sample_rate=self.tts.sample_rate, channels=self.tts.channels, bits_per_sample=self.tts.bits_per_sample)
-                base64_data = base64.b64encode(media_data).decode("utf-8")
-                await self.emit({"type": "say_aloud", "content": content, "media_data": base64_data, "format": "wav"})
+            await self.tts_pipeline.speak(content) # TTS (waits only if the look-ahead queue is full)
         elif data_type == "tag":
             self._curr_agent_response += f"[{content}]"
-            await self.emit({"type": "bracket_tag", "content": content})
\ No newline at end of file
+            self.tts_pipeline.pass_event({"type": "bracket_tag", "content": content})
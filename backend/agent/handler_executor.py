@@ -0,0 +1,129 @@
+"""
+Bounded, tracked execution of coroutine event handlers
+"""
+from typing import Any, Awaitable, Callable, Literal, Optional
+from collections import deque
+
+import asyncio
+import logging
+import time
+
+from .agent_metrics import HANDLER_EVENTS
+
+logger = logging.getLogger(__name__)
+
+# How queued jobs of one event type are handled:
+#   - "queue": run every job, in order
+#   - "latest": a new job replaces the ones still waiting (only the latest event matters, e.g. a state update)
+QueueMode = Literal["queue", "latest"]
+
+Job = Callable[[], Awaitable[Any]]
+
+class _Lane:
+    """Queue + concurrency limit of one event type"""
+
+    def __init__(self, event_type: str, concurrency: int, max_queue: int, mode: QueueMode, deadline: Optional[float]):
+        self.event_type = event_type
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.mode = mode
+        self.deadline = deadline
+
+        self.queue: deque[tuple[float, Job]] = deque()
+        self.running = 0
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "cancelled": 0,
+                      "dropped": 0, "coalesced": 0, "expired": 0}
+
+class HandlerExecutor:
+    """
+    Runs coroutine handlers with a queue and a concurrency limit per event type.
+
+    - jobs beyond `concurrency` wait in the event type's queue (at most `max_queue`, the oldest is dropped)
+    - jobs that waited longer than `deadline` seconds are dropped instead of started
+    - every task is tracked until it finishes; exceptions are logged and counted
+    """
+
+    def __init__(self, name: str = "", concurrency: int = 8, max_queue: int = 100,
+                 mode: QueueMode = "queue", deadline: Optional[float] = None):
+        self.name = name
+        self.defaults = {"concurrency": concurrency, "max_queue": max_queue, "mode": mode, "deadline": deadline}
+        self.lanes: dict[str, _Lane] = {}
+        self.tasks: set[asyncio.Task] = set()
+
+    def configure(self, event_type: str, concurrency: int = None, max_queue: int = None,
+                  mode: QueueMode = None, deadline: float = None):
+        """Override the defaults for one event type (None keeps the current value)"""
+        lane = self._lane(event_type)
+        if concurrency is not None:
+            lane.concurrency = concurrency
+        if max_queue is not None:
+            lane.max_queue = max_queue
+        if mode is not None:
+            lane.mode = mode
+        if deadline is not None:
+            lane.deadline = deadline
+
+    def _lane(self, event_type: str) -> _Lane:
+        lane = self.lanes.get(event_type)
+        if lane is None:
+            lane = self.lanes[event_type] = _Lane(event_type, **self.defaults)
+        return lane
+
+    def _count(self, lane: _Lane, outcome: str, amount: int = 1):
+        lane.stats[outcome] += amount
+        HANDLER_EVENTS.labels(self.name, lane.event_type, outcome).inc(amount)
+
+    def submit(self, event_type: str, job: Job):
+        """Queue a job (a coroutine function without arguments) for an event type"""
+        lane = self._lane(event_type)
+        self._count(lane, "submitted")
+
+        if lane.mode == "latest" and lane.queue:
+            self._count(lane, "coalesced", len(lane.queue))
+            lane.queue.clear()
+        elif len(lane.queue) >= lane.max_queue:
+            lane.queue.popleft()
+            self._count(lane, "dropped")
+            logger.warning(f"[{self.name}] {event_type} 处理队列已满, 丢弃最早的事件")
+
+        lane.queue.append((time.monotonic(), job))
+        self._pump(lane)
+
+    def _pump(self, lane: _Lane):
+        while lane.running < lane.concurrency and lane.queue:
+            enqueue_time, job = lane.queue.popleft()
+            if lane.deadline is not None and time.monotonic() - enqueue_time > lane.deadline:
+                self._count(lane, "expired")
+                continue
+            lane.running += 1
+            task = asyncio.create_task(job())
+            self.tasks.add(task)
+            task.add_done_callback(lambda task, lane=lane: self._on_done(lane, task))
+
+    def _on_done(self, lane: _Lane, task: asyncio.Task):
+        self.tasks.discard(task)
+        lane.running -= 1
+        if task.cancelled():
+            self._count(lane, "cancelled")
+        elif task.exception() is not None:
+            self._count(lane, "failed")
+            logger.error(f"[{self.name}] {lane.event_type} 处理函数异常", exc_info=task.exception())
+        else:
+            self._count(lane, "completed")
+        self._pump(lane)
+
+    def stats(self) -> dict[str, dict]:
+        """Counters, running and queued jobs of every event type"""
+        return {
+            event_type: {**lane.stats, "running": lane.running, "queued": len(lane.queue)}
+            for event_type, lane in self.lanes.items()
+        }
+
+    async def shutdown(self):
+        """Drop queued jobs, cancel running ones and wait until they have finished"""
+        for lane in self.lanes.values():
+            lane.queue.clear()
+        tasks = list(self.tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
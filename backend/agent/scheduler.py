@@ -0,0 +1,145 @@
+"""
+Drift-free periodic scheduler for agent loop functions
+"""
+from typing import Any, Callable, Literal, Optional
+
+import asyncio
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+# What to do when a run takes longer than its interval:
+#   - "skip": drop the missed ticks and wait for the next tick on the original grid
+#   - "catch_up": run again immediately for every missed tick (bursts until back on schedule)
+OverrunPolicy = Literal["skip", "catch_up"]
+
+class LoopStats:
+    """Counters of one periodic job"""
+
+    def __init__(self):
+        self.runs = 0
+        self.overruns = 0 # runs that ended after the next tick was due
+        self.skipped_ticks = 0
+        self.errors = 0
+        self.last_duration = 0.0
+        self.max_duration = 0.0
+        self.max_lateness = 0.0 # worst delay between a tick and the start of its run
+
+    def as_dict(self) -> dict:
+        return dict(vars(self))
+
+class PeriodicJob:
+    def __init__(self, name: str, func: Callable[[], Any], interval: float,
+                 jitter: float = 0.0, overrun: OverrunPolicy = "skip",
+                 on_overrun: Optional[Callable[['PeriodicJob'], None]] = None):
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.overrun = overrun
+        self.on_overrun = on_overrun
+        self.stats = LoopStats()
+        self.task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        # ticks lie on a fixed grid (start + k * interval), so the body's runtime does not shift later ticks
+        next_tick = time.monotonic()
+        while True:
+            delay = next_tick - time.monotonic()
+            if self.jitter:
+                delay += random.uniform(0, self.jitter)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            start = time.monotonic()
+            self.stats.max_lateness = max(self.stats.max_lateness, start - next_tick)
+            try:
+                result = self.func()
+                if asyncio.iscoroutine(result):
+                    await result
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.stats.errors += 1
+                logger.exception(f"loop function {self.name} raised an exception")
+            end = time.monotonic()
+
+            stats = self.stats
+            stats.runs += 1
+            stats.last_duration = end - start
+            stats.max_duration = max(stats.max_duration, stats.last_duration)
+
+            next_tick += self.interval
+            if end > next_tick:
+                stats.overruns += 1
+                if self.on_overrun is not None:
+                    self.on_overrun(self)
+                if self.overrun == "skip":
+                    missed = int((end - next_tick) // self.interval) + 1
+                    stats.skipped_ticks += missed
+                    next_tick += missed * self.interval
+
+class PeriodicScheduler:
+    """
+    Runs each registered function in its own task on a fixed tick grid.
+
+    Usage:
+        ```
+        scheduler = PeriodicScheduler()
+        scheduler.add("heartbeat", send_heartbeat, interval=1.0, jitter=0.05)
+        scheduler.start()
+        ...
+        await scheduler.stop()
+        print(scheduler.stats())
+        ```
+    """
+
+    def __init__(self):
+        self.jobs: list[PeriodicJob] = []
+
+    def add(self, name: str, func: Callable[[], Any], interval: float,
+            jitter: float = 0.0, overrun: OverrunPolicy = "skip",
+            on_overrun: Optional[Callable[[PeriodicJob], None]] = None) -> PeriodicJob:
+        """
+        Register a function called every `interval` seconds (started immediately if the scheduler is running).
+
+        Args:
+            name (str): Name used in stats and logs.
+            func (Callable): Sync function or coroutine function without arguments.
+            interval (float): Period in seconds.
+            jitter (float): Each tick is delayed by a random amount in [0, jitter) seconds (not accumulated).
+            overrun (OverrunPolicy): What to do when a run takes longer than `interval`.
+            on_overrun (Callable, optional): Called with the job after each overrun.
+        """
+        job = PeriodicJob(name, func, interval, jitter, overrun, on_overrun)
+        self.jobs.append(job)
+        if self.running:
+            job.task = asyncio.create_task(job._run())
+        return job
+
+    @property
+    def running(self) -> bool:
+        return any(job.task is not None for job in self.jobs)
+
+    def start(self):
+        """Start all jobs"""
+        for job in self.jobs:
+            if job.task is None:
+                job.task = asyncio.create_task(job._run())
+
+    async def stop(self):
+        """Cancel all jobs and wait until they have finished"""
+        tasks = [job.task for job in self.jobs if job.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for job in self.jobs:
+            job.task = None
+
+    def stats(self) -> dict[str, dict]:
+        """Stats of every job, by name"""
+        return {job.name: job.stats.as_dict() for job in self.jobs}
@@ -0,0 +1,139 @@
+"""
+Pipelined TTS stage: synthesizes upcoming sentences while earlier ones are emitted
+"""
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# yields (say_aloud fields besides type / content, e.g. {"format": "wav"}; media: bytes / payload parts)
+Synthesize = Callable[[str], AsyncIterator[tuple[dict, Any]]]
+Emit = Callable[[dict, Any], Awaitable[Any]] # (event, media: bytes / payload parts / None)
+
+_END = object() # end of a segment's audio
+
+class _Segment:
+    """A sentence to speak (text) or an event passed through in order (event)"""
+
+    def __init__(self, text: Optional[str] = None, event: Optional[dict] = None):
+        self.text = text
+        self.event = event
+        self.chunks: asyncio.Queue = asyncio.Queue()
+        self.task: Optional[asyncio.Task] = None
+        self.slots: Optional[asyncio.Semaphore] = None # the look-ahead semaphore a sentence holds a permit of
+
+class TTSPipeline:
+    """
+    Look-ahead TTS stage between the sentence splitter and `emit`.
+
+    - `speak(text)` starts synthesizing the sentence right away (at most `look_ahead` sentences are
+      synthesized or waiting to be emitted; `speak` waits for a free slot, which slows down the producer)
+    - `pass_event(event)` emits a non-audio event after everything queued before it
+    - audio is emitted strictly in the order the sentences were queued, chunk by chunk as it is synthesized
+    - `cancel()` drops everything queued and stops the running syntheses (interruption)
+
+    If `concurrent` is False, syntheses run one at a time (in order) for TTS engines that cannot
+    synthesize concurrently; the pipeline still decouples synthesis from the producer and from `emit`.
+
+    `synthesize` yields the audio of a sentence already encoded for the wire, as (event fields, media)
+    pairs (e.g. a WAV, then raw PCM continuation frames, see `tts.codecs.encode_utterance`); the
+    sentence's text goes with its first `say_aloud` event.
+    """
+
+    def __init__(self, synthesize: Synthesize, emit: Emit, look_ahead: int = 3, concurrent: bool = True):
+        if look_ahead < 1:
+            raise ValueError("look_ahead must be at least 1")
+        self.synthesize = synthesize
+        self.emit = emit
+        self.look_ahead = look_ahead
+        self.concurrent = concurrent
+
+        self._segments: asyncio.Queue[_Segment] = asyncio.Queue()
+        self._slots = asyncio.Semaphore(look_ahead)
+        self._synthesis_lock = asyncio.Lock()
+        self._emitter: Optional[asyncio.Task] = None
+        self._pending: set[_Segment] = set()
+
+    async def speak(self, text: str):
+        """Queue a sentence; its audio is emitted as `say_aloud` events once all earlier segments are emitted"""
+        slots = self._slots # `cancel` replaces the semaphore: the permit goes back to the one it came from
+        await slots.acquire()
+        segment = _Segment(text=text)
+        segment.slots = slots
+        segment.task = asyncio.create_task(self._synthesize(segment))
+        self._enqueue(segment)
+
+    def pass_event(self, event: dict):
+        """Queue an event without audio (emitted in order with the sentences)"""
+        self._enqueue(_Segment(event=event))
+
+    def _enqueue(self, segment: _Segment):
+        self._pending.add(segment)
+        self._segments.put_nowait(segment)
+        if self._emitter is None or self._emitter.done():
+            self._emitter = asyncio.create_task(self._emit_loop())
+
+    async def _synthesize(self, segment: _Segment):
+        try:
+            if self.concurrent:
+                await self._feed(segment)
+            else:
+                async with self._synthesis_lock:
+                    await self._feed(segment)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception(f"TTS 合成失败: {segment.text}")
+        finally:
+            segment.chunks.put_nowait(_END)
+
+    async def _feed(self, segment: _Segment):
+        async for message in self.synthesize(segment.text):
+            segment.chunks.put_nowait(message)
+
+    async def _emit_loop(self):
+        while not self._segments.empty():
+            segment = self._segments.get_nowait()
+            try:
+                if segment.text is None:
+                    await self.emit(segment.event, None)
+                    continue
+
+                first = True
+                while (message := await segment.chunks.get()) is not _END:
+                    fields, media = message
+                    await self.emit({"type": "say_aloud", "content": segment.text if first else "", **fields}, media)
+                    first = False
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("TTS 流水线发送事件失败")
+            finally:
+                self._pending.discard(segment)
+                if segment.slots is not None:
+                    segment.slots.release()
+
+    async def join(self):
+        """Wait until everything queued so far has been emitted"""
+        while self._emitter is not None and not self._emitter.done():
+            await asyncio.shield(self._emitter)
+
+    def cancel(self):
+        """Drop all queued segments and cancel running syntheses"""
+        if self._emitter is not None:
+            self._emitter.cancel()
+            self._emitter = None
+        for segment in self._pending:
+            if segment.task is not None:
+                segment.task.cancel()
+        self._pending.clear()
+        self._segments = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.look_ahead)
+        self._synthesis_lock = asyncio.Lock()
+
+    @property
+    def pending(self) -> int:
+        """Number of segments not yet fully emitted"""
+        return len(self._pending)
@@ -1,6 +1,6 @@
 # config classes
 from pydantic import BaseModel, ConfigDict
-from typing import Iterator, Tuple, Any, Union
+from typing import Iterator, Tuple, Any, Union, Optional, Literal
 
 class CompatibaleModel(BaseModel):
     """support dict-like access & extra fields"""
@@ -46,6 +46,17 @@ class Genie_TTS_Config(CompatibaleModel):
     ref_audio_path: str
     ref_audio_text: str
     ref_audio_language: str
+    workers: int = 1 # inference workers (processes in "process" mode; "thread" mode always uses one thread)
+    worker_mode: Literal["thread", "process"] = "thread" # where inference runs (see tts/genie/worker_pool.py)
+    lead_silence_ms: int = 50 # leading silence of every sentence is cut or padded to this length
+    trail_silence_ms: int = 200 # trailing silence of every sentence is cut or padded to this length
+    warmup_text: Optional[str] = "你好。" # synthesized once by every worker at startup (None: no warm-up)
+    reference_cache: bool = True # cache reference audio features on disk (keyed by model dir + reference audio hash)
+    reference_cache_dir: Optional[str] = None # default: tts/genie/pretrained/reference_cache
+    inference_profile: Literal["default", "latency", "throughput"] = "default" # ONNX Runtime CPU tuning (see tts/genie/tuning.py)
+    intra_op_threads: Optional[int] = None # override the profile's ONNX Runtime intra-op threads per worker
+    model_variant: Literal["fp32", "int8"] = "fp32" # "int8": <onnx_model_dir>/int8, created by tts/genie/quantize.py
+    cache_dir: Optional[str] = None # cache synthesized audio in memory and in this directory (see tts/cache.py)
 
 class Dashscope_TTS_Config(CompatibaleModel):
     """
@@ -55,6 +66,8 @@ class Dashscope_TTS_Config(CompatibaleModel):
     api_key: str
     model: str
     voice: str
+    max_concurrency: int = 4 # sentences synthesized in parallel (one realtime session each)
+    cache_dir: Optional[str] = None # cache synthesized audio in memory and in this directory (see tts/cache.py)
 
 TTS_Config = Union[Genie_TTS_Config, Dashscope_TTS_Config]
 
@@ -66,3 +79,9 @@ class AgentConfig(CompatibaleModel):
     agent_name: str
     llm_api_config: LLM_Config
     tts_stream: bool = False
+    binary_frames: bool = True # send audio as binary websocket frames (if the server supports it)
+    metrics_port: Optional[int] = None # serve Prometheus metrics (LLM / TTS / emit latency) on this port
+    auto_reconnect: bool = True # reconnect (with exponential backoff) when the connection to the server is lost
+    tts_look_ahead: int = 3 # max sentences being synthesized or waiting to be emitted
+    tts_frame_ms: Optional[int] = 200 # tts_stream: audio chunks are coalesced into say_aloud events of up to this many ms (the first chunk is sent at once), None: one event per chunk
+    audio_codecs: list[str] = [] # preferred say_aloud codecs, e.g. ["opus", "mp3", "ima_adpcm", "mulaw"] (see tts/codecs.py): the first one every frontend decodes is used, else wav
@@ -3,14 +3,29 @@ from sseclient import SSEClient
 from .abstract_bot import AbstractBot
 
 import json
+import logging
 import requests
 import asyncio
-import traceback
+from functools import partial
+
+logger = logging.getLogger(__name__)
+
+API_URL = "https://open.bigmodel.cn/api/paas/v4/chat/completions"
+
+def _close_response(post: asyncio.Future):
+    if not post.cancelled() and post.exception() is None:
+        post.result().close()
 
 class GlmBot(AbstractBot):
     """
     A delegate used to communicate with GLM-4 api
+
+    The HTTP request and the SSE stream are read in worker threads, so the event loop stays free while
+    waiting for tokens, and cancelling the task running `respond_to_context` stops the response at once.
     """
+    api_url = API_URL
+    # (connect, read) timeouts of the HTTP request: a worker thread never waits on a stalled stream forever
+    timeout = (10, 60)
     
     def __init__(self, token: str, model_name: Optional[str] = None, system_prompt: Optional[str] = None, max_context_length: int = 11):
         super().__init__()
@@ -42,9 +57,7 @@ class GlmBot(AbstractBot):
         if not messages:
             messages = self.messages
 
-        from pprint import pprint # DEBUG
-        print("context:") # DEBUG
-        pprint(messages) # DEBUG
+        logger.debug("context: %s", messages)
 
         # 保留max_context_length条历史
         filtered_messages = messages[-self.max_context_length:] if len(messages) > self.max_context_length else messages.copy()
@@ -55,7 +68,6 @@ class GlmBot(AbstractBot):
                 'content': self.system_prompt,
             })
 
-        url = "https://open.bigmodel.cn/api/paas/v4/chat/completions"
         headers = {
             'Content-Type': 'application/json',
             'Authorization': f'Bearer {self.token}',  # 认证令牌
@@ -69,14 +81,22 @@ class GlmBot(AbstractBot):
 
         self.response = ''
 
+        response = None
         try:
-            response = requests.post(url, headers=headers, json=data, stream=True)
+            post = asyncio.get_running_loop().run_in_executor(
+                None, partial(requests.post, self.api_url, headers=headers, json=data, stream=True, timeout=self.timeout))
+            try:
+                response = await asyncio.shield(post)
+            except asyncio.CancelledError:
+                # the request keeps running in its worker thread: close the response once it arrives
+                post.add_done_callback(_close_response)
+                raise
             response.raise_for_status()
 
-            # 使用SSE客户端处理服务器发送事件
-            client = SSEClient(response)
-            
-            for event in client.events():
+            # 使用SSE客户端处理服务器发送事件 (阻塞读取放在线程中, 等待期间不阻塞事件循环)
+            events = SSEClient(response).events()
+
+            while (event := await asyncio.to_thread(next, events, None)) is not None:
                 if event.data == '[DONE]':
                     await self._dispatch_event('done', {'content': self.response})
                     return self.response
@@ -93,14 +113,17 @@ class GlmBot(AbstractBot):
                         await self._dispatch_event('message_delta', {'content': delta_text})
                         
                     except json.JSONDecodeError as e:
-                        print(f'[GlmBot] An error occurred when parsing event data: {e}')
+                        logger.warning(f'[GlmBot] An error occurred when parsing event data: {e}')
                         continue
 
         except requests.exceptions.RequestException as error:
-            print(f'[GlmBot] Error sending message: {error}')
+            logger.error(f'[GlmBot] Error sending message: {error}')
         except Exception as error:
-            traceback.print_exc()
-            print(f'[GlmBot] Unexpected error: {error}')
+            logger.exception(f'[GlmBot] Unexpected error: {error}')
+        finally:
+            if response is not None:
+                # closed in a worker thread: after a cancellation, a worker may still be blocked reading the stream
+                asyncio.get_running_loop().run_in_executor(None, response.close)
 
         await self._dispatch_event('done', {'content': self.response})
         return self.response
@@ -0,0 +1,11 @@
+"""
+Logging pipeline: background writer, per-subsystem levels, rate limiting and payload redaction
+"""
+from .pipeline import (
+    setup_logging,
+    shutdown_logging,
+    parse_levels,
+    RedactingFilter,
+    RateLimitFilter,
+    DEFAULT_FORMAT,
+)
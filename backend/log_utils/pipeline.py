@@ -0,0 +1,177 @@
+"""
+Non-blocking logging pipeline
+
+`setup_logging` replaces the handlers of the root logger with a single `QueueHandler`. Records are
+redacted and rate limited in the calling thread (cheap, in memory), then handed to a `QueueListener`
+whose background thread does the formatting and the blocking console / file I/O. Logging from a
+coroutine therefore never blocks the event loop on disk writes.
+
+Levels are configured per subsystem (logger name prefix) with a spec such as
+`"INFO,server=DEBUG,websockets=WARNING"` (see `parse_levels`).
+
+Redaction keeps debug logging usable under load: long base64 runs (e.g. audio in `say_aloud`
+events) are replaced by `<base64 N chars>`, and messages are truncated to `max_message_length`.
+"""
+from typing import Optional
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import re
+import threading
+import time
+
+DEFAULT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_BASE64_RUN = re.compile(r"[A-Za-z0-9+/]{256,}={0,2}")
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_lock = threading.Lock()
+
+def parse_levels(spec: str) -> dict[str, int]:
+    """
+    Parse a level spec like `"INFO,server=DEBUG,agent=WARNING"`.
+
+    A bare level sets the root level (key ""); `name=LEVEL` sets the level of the logger `name`
+    and its children.
+    """
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, level = item.rpartition("=")
+        level_value = logging.getLevelName(level.strip().upper())
+        if not isinstance(level_value, int):
+            raise ValueError(f"Unknown log level: {level}")
+        levels[name.strip()] = level_value
+    return levels
+
+class RedactingFilter(logging.Filter):
+    """
+    Replace long base64 runs and truncate long messages.
+
+    The message is rendered once here (`record.getMessage()`) and stored back with no args,
+    so the background writer does not keep references to large payload objects.
+    """
+
+    def __init__(self, max_message_length: int = 2000):
+        super().__init__()
+        self.max_message_length = max_message_length
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        message = record.getMessage()
+        if len(message) > 256:
+            message = _BASE64_RUN.sub(lambda m: f"<base64 {len(m.group())} chars>", message)
+        if len(message) > self.max_message_length:
+            message = f"{message[:self.max_message_length]}... <{len(message) - self.max_message_length} chars truncated>"
+        record.msg = message
+        record.args = None
+        return True
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token-bucket rate limit per call site (logger name + message template).
+
+    Only records at or below `max_level` (DEBUG by default) are limited. The number of suppressed
+    records is appended to the next record of the same call site that gets through.
+    """
+
+    def __init__(self, rate: float = 10.0, burst: int = 20, max_level: int = logging.DEBUG):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.max_level = max_level
+        # (logger name, template) -> [tokens, last update, suppressed]
+        self._buckets: dict[tuple[str, object], list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+
+        now = time.monotonic()
+        key = (record.name, record.msg if isinstance(record.msg, str) else record.pathname + str(record.lineno))
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [float(self.burst), now, 0]
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+
+        if bucket[0] < 1:
+            bucket[2] += 1
+            return False
+
+        bucket[0] -= 1
+        if bucket[2]:
+            record.msg = f"{record.getMessage()} ({bucket[2]} similar messages suppressed)"
+            record.args = None
+            bucket[2] = 0
+        return True
+
+def setup_logging(log_file: Optional[str] = None,
+                  levels: "str | dict[str, int]" = "INFO",
+                  fmt: str = DEFAULT_FORMAT,
+                  max_message_length: int = 2000,
+                  debug_rate: float = 10.0,
+                  debug_burst: int = 20):
+    """
+    Configure the root logger to log through a background writer thread.
+
+    Can be called again to reconfigure (the previous listener is stopped first).
+
+    Args:
+        log_file (str, optional): Also write the log to this file.
+        levels (str | dict): Level spec (see `parse_levels`) or parsed levels.
+        fmt (str): Log record format.
+        max_message_length (int): Messages longer than this are truncated.
+        debug_rate (float): Max DEBUG records per second per call site (0 disables the limit).
+        debug_burst (int): Burst size of the DEBUG rate limit.
+    """
+    global _listener
+
+    if isinstance(levels, str):
+        levels = parse_levels(levels)
+
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+
+        formatter = logging.Formatter(fmt)
+        handlers: list[logging.Handler] = [logging.StreamHandler()]
+        if log_file:
+            handlers.append(logging.FileHandler(log_file, encoding="utf-8"))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        if debug_rate > 0:
+            queue_handler.addFilter(RateLimitFilter(debug_rate, debug_burst))
+        queue_handler.addFilter(RedactingFilter(max_message_length))
+
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+            if not isinstance(handler, logging.handlers.QueueHandler):
+                handler.close()
+        root.addHandler(queue_handler)
+        root.setLevel(levels.get("", logging.INFO))
+        for name, level in levels.items():
+            if name:
+                logging.getLogger(name).setLevel(level)
+
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+
+def shutdown_logging():
+    """Flush pending records and stop the background writer (registered with atexit)"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+            _listener = None
+
+atexit.register(shutdown_logging)
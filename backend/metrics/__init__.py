@@ -0,0 +1,13 @@
+"""
+Minimal Prometheus metrics shared by the relay server and agents
+"""
+from .prometheus import (
+    Counter,
+    Gauge,
+    Histogram,
+    Registry,
+    REGISTRY,
+    CONTENT_TYPE,
+    LATENCY_BUCKETS,
+    serve_metrics,
+)
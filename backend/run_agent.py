@@ -9,6 +9,9 @@ from config_types import LLM_Config, Genie_TTS_Config, Dashscope_TTS_Config, Age
 from agent import create_agent
 from tokens import get_token
 from prompts import get_prompt
+from log_utils import setup_logging
+
+setup_logging(levels = "INFO") # 例如 "INFO,agent=DEBUG,llm_api=DEBUG" 可查看收到的事件和发给大模型的上下文
 
 server_url = "localhost:8000"
 agent_name = "shumeiniang"
@@ -43,6 +46,7 @@ agent_config = AgentConfig(
     tts_stream = True,
 )
 
-agent = create_agent(agent_type = 'basic_chatting_agent', **agent_config.model_dump())
+if __name__ == "__main__": # Genie worker_mode="process" workers (spawn) re-import this script
+    agent = create_agent(agent_type = 'basic_chatting_agent', **agent_config.model_dump())
 
-asyncio.run(agent.run())
+    asyncio.run(agent.run())
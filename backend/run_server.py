@@ -4,30 +4,62 @@ A server for communication between frontend and agents (or between agents)
 提供以下接口：
     - /ws/agent: 智能体连接此端口
     - /ws/frontend: 前端连接此端口
+    - /metrics: Prometheus 指标
 """
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
+from contextlib import asynccontextmanager
 from datetime import datetime
+from functools import partial
 
-import json
 import uvicorn
 import logging
-import uuid
 import argparse
+import multiprocessing
+import os
 
-# 配置logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('vtuber_server.log') # record log to file
-    ]
-)
-logger = logging.getLogger(__name__)
+from ws_protocol import BINARY_FRAMES_CAPABILITY, peek_header, frame_to_json_message
+from ws_protocol import peek_type, extract_event_data, make_event_envelope
+from ws_protocol.json_codec import dumps, loads
+from server import ConnectionManager, Backplane, create_backplane, frontend_channel, agent_channel
+from server.broker import run_broker
+from server import relay_metrics
+from metrics import REGISTRY, CONTENT_TYPE
+from log_utils import setup_logging
+
+logger = logging.getLogger("server") # 与 server 包共用一个子系统名, 便于用 --log-level server=DEBUG 统一调整
+
+# 服务器配置通过环境变量传给 uvicorn 的 worker 进程 (多 worker 时每个 worker 会重新导入本模块)
+SETTINGS_ENV = "BITNP_VTUBER_SERVER_SETTINGS"
+
+# 创建连接管理器实例 (只管理本 worker 上的连接)
+agent_manager = ConnectionManager('agent')
+frontend_manager = ConnectionManager('frontend')
 
-app = FastAPI(title="BITNP AI VTuber Backend")
+# 发布-订阅背板 (跨 worker / 主机转发事件, 并在集群范围内保证智能体名称唯一)
+backplane: Backplane = create_backplane()
+
+def apply_settings(settings: dict):
+    """应用服务器配置 (见 __main__ 中的命令行参数)"""
+    global backplane
+    # 配置logging (后台线程写控制台和文件, 不阻塞事件循环)
+    setup_logging('vtuber_server.log', settings.get("log_level", "INFO"))
+    frontend_manager.max_queue_size = settings.get("max_queue_size", frontend_manager.max_queue_size)
+    frontend_manager.slow_consumer_policy = settings.get("slow_consumer_policy", frontend_manager.slow_consumer_policy)
+    frontend_manager.max_lag = settings.get("max_lag", frontend_manager.max_lag)
+    backplane = create_backplane(settings.get("backplane", "inprocess"), settings.get("broker"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 在启动时 (而不是导入时) 应用配置: 导入本模块不会创建日志文件; 每个 worker 从环境变量读取配置
+    apply_settings(loads(os.environ.get(SETTINGS_ENV, "{}")))
+    await backplane.start()
+    yield
+    await backplane.close()
+
+app = FastAPI(title="BITNP AI VTuber Backend", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -37,107 +69,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 连接管理器 - 智能体和前端分别使用
-class ConnectionManager:
-    def __init__(self, name: str = "default"):
-        # 存储活跃连接：client_id -> WebSocket
-        self.active_connections: dict[str, WebSocket] = {}
-        # 存储用户信息：client_id -> user_info
-        self.users: dict[str, dict] = {}
-        self.name = name
-    
-    def log(self, message: str):
-        """记录日志"""
-        logger.info(f"[{self.name} manager] {message}")
-
-    async def connect(self, websocket: WebSocket, user_data: dict):
-        """接受WebSocket连接并存储用户信息"""
-        await websocket.accept()
-        
-        # 生成唯一客户端ID
-        client_id = str(uuid.uuid4())
-        
-        # 存储连接和用户信息
-        self.active_connections[client_id] = websocket
-        self.users[client_id] = {
-            "client_id": client_id,
-            "agent_name": user_data.get("agent_name", ""),
-            "join_time": datetime.now().isoformat(),
-            **user_data  # 包含其他用户数据
-        }
-        
-        self.log(f"Connected! agent_name: {user_data.get('agent_name')}, client_id: {client_id}")
-        
-        # 发送连接成功消息
-        welcome_msg = {
-            "type": "system",
-            "message": "successfully connected",
-            "client_id": client_id,
-            "timestamp": datetime.now().isoformat()
-        }
-        await self.send_personal_message(json.dumps(welcome_msg), client_id)
-        return client_id
-
-    async def disconnect(self, client_id: str):
-        """处理连接断开"""
-        if client_id in self.active_connections:
-            # 移除连接
-            del self.active_connections[client_id]
-            del self.users[client_id]
-
-    async def send_personal_message(self, message: str, client_id: str):
-        """向特定客户端发送消息"""
-        if client_id in self.active_connections:
-            try:
-                await self.active_connections[client_id].send_text(message)
-            except Exception as e:
-                logging.info(f"发送消息到客户端 {client_id} 失败: {e}")
-                await self.disconnect(client_id)
-
-    async def broadcast(self, message: str, exclude_client_id: str = None):
-        """广播消息给所有客户端"""
-        disconnected_clients = []
-        
-        for client_id, connection in self.active_connections.items():
-            if client_id != exclude_client_id:
-                try:
-                    await connection.send_text(message)
-                except Exception as e:
-                    logging.info(f"广播消息到客户端 {client_id} 失败: {e}")
-                    disconnected_clients.append(client_id)
-        
-        # 清理断开连接的客户端
-        for client_id in disconnected_clients:
-            await self.disconnect(client_id)
-    
-    def get_client_ids_by_agent_name(self, agent_name: str) -> list[str]:
-        """根据智能体名称获取所有连接的客户端ID"""
-        return [
-            client_id for client_id, user_info in self.users.items()
-            if user_info.get("agent_name") == agent_name
-        ]
-
-    def get_online_users(self):
-        """获取在线用户列表"""
-        return [
-            {
-                "agent_name": user_info.get("agent_name", ""),
-                "client_id": user_info.get("client_id", ""),
-                "join_time": user_info.get("join_time", "")
-            }
-            for user_info in self.users.values()
-        ]
-
-# 创建连接管理器实例
-agent_manager = ConnectionManager('agent')
-frontend_manager = ConnectionManager('frontend')
-
-# 存储已连接的智能体
-connected_agents: set[str] = set()
-
 async def handle_agent_message(client_id: str, message_data: dict) -> dict | None:
     """处理智能体发送的消息"""
-    # logging.info(f"智能体 {client_id} 发送消息: {message_data}") # DEBUG
+    logger.debug("智能体 %s 发送消息: %s", client_id, message_data)
 
     message_type = message_data.get("type", "")
 
@@ -145,20 +79,91 @@ async def handle_agent_message(client_id: str, message_data: dict) -> dict | Non
         return {"type": "error", "message": "empty message type"}
 
     elif message_type == "disconnect":
-        await agent_manager.disconnect(client_id)
+        await agent_manager.disconnect(client_id, cause="requested")
         return None
 
     elif message_type == "event":
         # 向前端发送事件
-        event_data = message_data.get("data", "")
-        agent_name = agent_manager.users.get(client_id, {}).get("agent_name", "")
-        for client_id in frontend_manager.get_client_ids_by_agent_name(agent_name):
-            await frontend_manager.send_personal_message(json.dumps({"time": datetime.now().isoformat(), "data": event_data}), client_id)
-        return {"type": "success", "message": "event sent"}
+        return await relay_agent_event(client_id, event_data=message_data.get("data", ""))
+
+async def handle_agent_text(client_id: str, data: str) -> dict | None:
+    """处理智能体发送的文本消息 (event 消息走免解析转发路径, 其他消息完整解析)"""
+    raw_data = extract_event_data(data)
+    if raw_data is not None:
+        return await relay_agent_event(client_id, raw_data=raw_data)
+    return await handle_agent_message(client_id, loads(data))
+
+async def relay_agent_event(client_id: str, event_data=None, raw_data: str = None) -> dict:
+    """
+    向前端转发智能体的事件 (经背板发布到该智能体的前端频道)
+
+    信封每个事件只序列化一次, 所有前端共享同一份消息。
+    给出 raw_data (事件数据的原始 JSON 文本, 已由 extract_event_data 校验) 时直接嵌入信封, 不重新序列化。
+    """
+    agent_name = agent_manager.users.get(client_id, {}).get("agent_name", "")
+    if raw_data is not None:
+        audio = peek_type(raw_data) == "say_aloud"
+    else:
+        audio = isinstance(event_data, dict) and event_data.get("type") == "say_aloud"
+    message = make_event_envelope(datetime.now().isoformat(), raw_data, event_data)
+    logger.debug("向智能体 %s 的前端转发事件: %s", agent_name, message)
+    await backplane.publish(frontend_channel(agent_name), message, audio=audio)
+    return {"type": "success", "message": "event sent"}
+
+async def handle_agent_frame(client_id: str, frame: bytes) -> dict | None:
+    """处理智能体发送的二进制帧 (仅支持 event, 经背板原样转发)"""
+    try:
+        header = peek_header(frame)
+    except ValueError as e:
+        return {"type": "error", "message": f"invalid binary frame: {e}"}
+
+    if header.get("type") != "event":
+        return {"type": "error", "message": "only event messages can be sent as binary frames"}
+
+    agent_name = agent_manager.users.get(client_id, {}).get("agent_name", "")
+    await backplane.publish(frontend_channel(agent_name), frame, audio=True)
+    return {"type": "success", "message": "event sent"}
+
+async def deliver_to_frontends(agent_name: str, message: str | bytes, audio: bool):
+    """
+    把背板上的消息投递给本 worker 上连接到该智能体的前端
+
+    二进制帧原样发给支持二进制帧的前端, 旧版前端收到 base64 编码的 JSON 消息 (按需生成且只生成一次)。
+    """
+    if isinstance(message, str):
+        for frontend_id in frontend_manager.get_client_ids_by_agent_name(agent_name):
+            await frontend_manager.send_personal_message(message, frontend_id, audio=audio)
+        return
+
+    legacy_message = None
+    for frontend_id in frontend_manager.get_client_ids_by_agent_name(agent_name):
+        if frontend_manager.has_capability(frontend_id, BINARY_FRAMES_CAPABILITY):
+            await frontend_manager.send_personal_message(message, frontend_id, audio=audio)
+        else:
+            if legacy_message is None:
+                event_data = frame_to_json_message(message).get("data", {})
+                legacy_message = make_event_envelope(datetime.now().isoformat(), data_obj=event_data)
+            await frontend_manager.send_personal_message(legacy_message, frontend_id, audio=audio)
+
+async def deliver_to_agent(agent_name: str, message: str | bytes, audio: bool):
+    """把背板上的消息投递给本 worker 上的智能体"""
+    for agent_id in agent_manager.get_client_ids_by_agent_name(agent_name):
+        await agent_manager.send_personal_message(message, agent_id, audio=audio)
+
+async def publish_audio_formats(agent_name: str, frontend_id: str, formats: list[str] | None):
+    """
+    告知智能体某个前端能解码的音频格式 (say_aloud 的 format), 智能体据此选择音频编码
+
+    wav 总是支持的; formats 为 None 表示该前端已断开。
+    """
+    if formats is not None:
+        formats = ["wav", *(f for f in formats if isinstance(f, str) and f != "wav")]
+    message = dumps({"type": "system", "frontend_audio_formats": {frontend_id: formats}})
+    await backplane.publish(agent_channel(agent_name), message)
 
 async def handle_frontend_message(client_id: str, message_data: dict) -> dict | None:
     """处理前端发送的消息"""
-    # logging.info(f"前端 {client_id} 发送消息: {message_data}") # DEBUG
+    logger.debug("前端 %s 发送消息: %s", client_id, message_data)
 
     message_type = message_data.get("type", "")
 
@@ -166,37 +171,63 @@ async def handle_frontend_message(client_id: str, message_data: dict) -> dict |
         return {"type": "error", "message": "empty message type"}
     
     elif message_type == "disconnect":
-        await frontend_manager.disconnect(client_id)
+        await frontend_manager.disconnect(client_id, cause="requested")
         return None
 
+    elif message_type == "hello":
+        # 协商连接能力 (例如二进制帧), 并把前端能解码的音频格式告知智能体
+        capabilities = frontend_manager.set_capabilities(client_id, message_data.get("capabilities", []))
+        agent_name = frontend_manager.users.get(client_id, {}).get("agent_name", "")
+        await publish_audio_formats(agent_name, client_id, message_data.get("audio_formats", []))
+        return {"type": "hello", "capabilities": capabilities}
+
     elif message_type == "is_agent_online":
         # 查询agent是否在线
         agent_name = frontend_manager.users.get(client_id, {}).get("agent_name", "")
-        if agent_name in connected_agents:
-            return {"type": "success", "message": True}
-        else:
-            return {"type": "success", "message": False}
+        try:
+            return {"type": "success", "message": await backplane.is_agent_online(agent_name)}
+        except ConnectionError as e:
+            return {"type": "error", "message": str(e)}
 
     elif message_type == "event":
         # 向智能体发送事件
         event_data = message_data.get("data", {})
         agent_name = frontend_manager.users.get(client_id, {}).get("agent_name", "")
-        for client_id in agent_manager.get_client_ids_by_agent_name(agent_name):
-            # logging.info(f"向智能体 {agent_name} 发送事件: {event_data}") # DEBUG
-            await agent_manager.send_personal_message(json.dumps({"time": datetime.now().isoformat(), "data": event_data}), client_id)
+        message = make_event_envelope(datetime.now().isoformat(), data_obj=event_data)
+        logger.debug("向智能体 %s 发送事件: %s", agent_name, event_data)
+        await backplane.publish(agent_channel(agent_name), message)
         return {"type": "success", "message": "event sent"}
 
+async def receive_message(websocket: WebSocket) -> str | bytes:
+    """接收一条文本消息 (str) 或二进制消息 (bytes)"""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    if message.get("bytes") is not None:
+        return message["bytes"]
+    return message.get("text", "")
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 指标 (本 worker)"""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
 # 智能体 WebSocket 端点
 @app.websocket("/ws/agent/{agent_name}")
 async def ws_agent(websocket: WebSocket, agent_name: str):
     """智能体 WebSocket 端点"""
 
-    if agent_name in connected_agents:
-        logging.error(f"Agent {agent_name} is already connected, but trying to connect again")
+    try:
+        claimed = await backplane.claim_agent(agent_name)
+    except ConnectionError as e:
+        # 背板 (消息代理) 暂不可用, 让智能体稍后重连
+        logger.error(f"无法占用智能体名称 {agent_name}: {e}")
+        await websocket.close(code=1013, reason="Backplane unavailable")
+        return
+    if not claimed:
+        logger.error(f"Agent {agent_name} is already connected, but trying to connect again")
         await websocket.close(code=4001, reason="Agent name already connected")
         return
-    
-    connected_agents.add(agent_name)
 
     user_data = {
         "agent_name": agent_name,
@@ -204,25 +235,36 @@ async def ws_agent(websocket: WebSocket, agent_name: str):
     }
     
     client_id = await agent_manager.connect(websocket, user_data)
+    await backplane.subscribe(agent_channel(agent_name), partial(deliver_to_agent, agent_name))
+    # 已连接的前端 (可能在其他 worker 上) 重新发送 hello, 让新连接的智能体得知它们能解码的音频格式
+    await backplane.publish(frontend_channel(agent_name), dumps({"type": "system", "request": "hello"}))
+
+    messages_received = relay_metrics.MESSAGES_RECEIVED.labels("agent", agent_name)
+    bytes_received = relay_metrics.BYTES_RECEIVED.labels("agent", agent_name)
     
     try:
         while True:
             # 接收客户端消息
-            data = await websocket.receive_text()
-            message_data = json.loads(data)
-            
+            data = await receive_message(websocket)
+            messages_received.inc()
+            bytes_received.inc(len(data))
+
             # 处理不同类型的消息
-            res = await handle_agent_message(client_id, message_data)
+            if isinstance(data, bytes):
+                res = await handle_agent_frame(client_id, data)
+            else:
+                res = await handle_agent_text(client_id, data)
             if res:
-                await agent_manager.send_personal_message(json.dumps(res), client_id)
+                await agent_manager.send_personal_message(dumps(res), client_id)
             
     except WebSocketDisconnect:
-        connected_agents.remove(agent_name)
-        await agent_manager.disconnect(client_id)
+        await agent_manager.disconnect(client_id, cause="client_closed")
     except Exception as e:
-        logging.error(f"WebSocket error encountered: {e}")
-        connected_agents.remove(agent_name)
-        await agent_manager.disconnect(client_id)
+        logger.error(f"WebSocket error encountered: {e}")
+        await agent_manager.disconnect(client_id, cause="error")
+    finally:
+        await backplane.unsubscribe(agent_channel(agent_name))
+        await backplane.release_agent(agent_name)
 
 # 前端 WebSocket 端点
 @app.websocket("/ws/frontend/{agent_name}")
@@ -235,30 +277,68 @@ async def ws_frontend(websocket: WebSocket, agent_name: str):
     }
     
     client_id = await frontend_manager.connect(websocket, user_data)
+    await backplane.subscribe(frontend_channel(agent_name), partial(deliver_to_frontends, agent_name))
+    await publish_audio_formats(agent_name, client_id, []) # 旧版前端不发送 audio_formats, 只能解码 wav
+
+    messages_received = relay_metrics.MESSAGES_RECEIVED.labels("frontend", agent_name)
+    bytes_received = relay_metrics.BYTES_RECEIVED.labels("frontend", agent_name)
     
     try:
         while True:
             # 接收客户端消息
             data = await websocket.receive_text()
-            message_data = json.loads(data)
+            messages_received.inc()
+            bytes_received.inc(len(data))
+            message_data = loads(data)
             
             # 处理不同类型的消息
             res = await handle_frontend_message(client_id, message_data)
             if res:
-                await frontend_manager.send_personal_message(json.dumps(res), client_id)
+                await frontend_manager.send_personal_message(dumps(res), client_id)
             
     except WebSocketDisconnect:
-        await frontend_manager.disconnect(client_id)
+        await frontend_manager.disconnect(client_id, cause="client_closed")
     except Exception as e:
-        logging.error(f"WebSocket error encountered: {e}")
-        await frontend_manager.disconnect(client_id)
+        logger.error(f"WebSocket error encountered: {e}")
+        await frontend_manager.disconnect(client_id, cause="error")
+    finally:
+        await backplane.unsubscribe(frontend_channel(agent_name))
+        await publish_audio_formats(agent_name, client_id, None)
 
 if __name__ == "__main__":
     # 解析命令行参数
     parser = argparse.ArgumentParser(description="BITNP AI VTuber backend")
     parser.add_argument("--port", type=int, default=8000, help="server port, defaults to 8000")
+    parser.add_argument("--max-queue-size", type=int, default=256, help="max queued outbound messages per frontend, defaults to 256")
+    parser.add_argument("--slow-consumer-policy", choices=["drop_oldest", "disconnect"], default="drop_oldest", help="how to handle frontends that can not keep up, defaults to drop_oldest")
+    parser.add_argument("--max-lag", type=float, default=5.0, help="max seconds a message may wait in a frontend queue (disconnect policy only), defaults to 5.0")
+    parser.add_argument("--log-level", type=str, default="INFO", help='log levels, e.g. "INFO,server=DEBUG,uvicorn=WARNING", defaults to INFO')
+    parser.add_argument("--workers", type=int, default=1, help="number of uvicorn worker processes (requires --backplane broker if > 1), defaults to 1")
+    parser.add_argument("--backplane", choices=["inprocess", "broker"], default="inprocess", help="pub/sub backplane between workers / hosts, defaults to inprocess")
+    parser.add_argument("--broker", type=str, default="127.0.0.1:8765", help="broker address host:port (broker backplane only), defaults to 127.0.0.1:8765")
+    parser.add_argument("--start-broker", action="store_true", help="start a local broker at --broker in a child process")
     args = parser.parse_args()
 
+    if args.workers > 1 and args.backplane != "broker":
+        parser.error("--workers > 1 requires --backplane broker")
+
+    settings = {
+        "max_queue_size": args.max_queue_size,
+        "slow_consumer_policy": args.slow_consumer_policy,
+        "max_lag": args.max_lag,
+        "backplane": args.backplane,
+        "broker": args.broker,
+        "log_level": args.log_level,
+    }
+    os.environ[SETTINGS_ENV] = dumps(settings) # 由 lifespan 在 (每个 worker) 启动时应用
+
+    if args.start_broker:
+        broker_host, _, broker_port = args.broker.rpartition(":")
+        multiprocessing.Process(target=run_broker, args=(broker_host, int(broker_port)), daemon=True).start()
+
     port = args.port
 
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    if args.workers > 1:
+        uvicorn.run("run_server:app", host="0.0.0.0", port=port, workers=args.workers, app_dir=os.path.dirname(os.path.abspath(__file__)))
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=port)
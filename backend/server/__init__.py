@@ -0,0 +1,12 @@
+"""
+Relay server components
+"""
+from .connection_manager import ConnectionManager, ClientConnection, SERVER_CAPABILITIES, SlowConsumerPolicy
+from .backplane import (
+    Backplane,
+    InProcessBackplane,
+    BrokerBackplane,
+    create_backplane,
+    frontend_channel,
+    agent_channel,
+)
@@ -0,0 +1,382 @@
+"""
+发布-订阅背板 (backplane)
+
+让连接在不同 worker 进程 / 不同主机上的智能体和前端互相收到事件:
+    - 每个 worker 订阅其本地连接关心的频道 (见 `frontend_channel` / `agent_channel`)
+    - 转发事件时发布到频道, 背板负责把消息送到所有订阅了该频道的 worker
+    - 智能体名称的唯一性由背板在整个集群范围内保证 (`claim_agent`)
+
+提供两种实现:
+    - InProcessBackplane: 单进程 (默认), 不依赖任何外部服务
+    - BrokerBackplane: 连接到本地消息代理 (`python -m server.broker`), 支持多 worker / 多主机
+"""
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Union
+
+import asyncio
+import itertools
+import logging
+import struct
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ws_protocol import encode_frame, decode_frame
+
+logger = logging.getLogger(__name__)
+
+Message = Union[str, bytes]
+
+# 频道消息处理函数: handler(message, audio)
+MessageHandler = Callable[[Message, bool], Awaitable[None]]
+
+DEFAULT_BROKER_HOST = "127.0.0.1"
+DEFAULT_BROKER_PORT = 8765
+
+def frontend_channel(agent_name: str) -> str:
+    """发往某智能体的所有前端的消息频道"""
+    return f"frontend/{agent_name}"
+
+def agent_channel(agent_name: str) -> str:
+    """发往某智能体的消息频道"""
+    return f"agent/{agent_name}"
+
+class Backplane(ABC):
+    """
+    发布-订阅背板抽象基类
+
+    子类需要实现 `_publish_remote` (把消息发给其他 worker) 以及 `claim_agent` / `release_agent` / `is_agent_online`。
+    发布的消息总是先直接投递给本 worker 的订阅者, 不经过远端。
+    """
+
+    def __init__(self):
+        # 本地订阅: channel -> 处理函数
+        self.handlers: dict[str, MessageHandler] = {}
+        # 本地订阅引用计数: channel -> 订阅次数 (同一频道的多个本地连接只订阅一次)
+        self.subscriptions: dict[str, int] = {}
+
+    async def start(self):
+        """启动背板 (建立到远端的连接等)"""
+        pass
+
+    async def close(self):
+        """关闭背板"""
+        pass
+
+    async def subscribe(self, channel: str, handler: MessageHandler):
+        """订阅频道 (同一频道重复订阅只增加引用计数, 沿用第一次注册的处理函数)"""
+        count = self.subscriptions.get(channel, 0)
+        self.subscriptions[channel] = count + 1
+        if count == 0:
+            self.handlers[channel] = handler
+            await self._subscribe_remote(channel)
+
+    async def unsubscribe(self, channel: str):
+        """取消订阅频道 (引用计数归零时真正取消)"""
+        count = self.subscriptions.get(channel, 0) - 1
+        if count > 0:
+            self.subscriptions[channel] = count
+            return
+        self.subscriptions.pop(channel, None)
+        if self.handlers.pop(channel, None) is not None:
+            await self._unsubscribe_remote(channel)
+
+    async def publish(self, channel: str, message: Message, audio: bool = False):
+        """向频道发布消息 (本地订阅者 + 其他 worker 的订阅者)"""
+        await self._deliver_local(channel, message, audio)
+        await self._publish_remote(channel, message, audio)
+
+    async def _deliver_local(self, channel: str, message: Message, audio: bool):
+        handler = self.handlers.get(channel)
+        if handler is not None:
+            await handler(message, audio)
+
+    async def _subscribe_remote(self, channel: str):
+        pass
+
+    async def _unsubscribe_remote(self, channel: str):
+        pass
+
+    @abstractmethod
+    async def _publish_remote(self, channel: str, message: Message, audio: bool):
+        pass
+
+    @abstractmethod
+    async def claim_agent(self, agent_name: str) -> bool:
+        """
+        在整个集群范围内占用智能体名称
+
+        Returns:
+            bool: False 表示该名称已被 (任意 worker 上的) 智能体占用
+        """
+        pass
+
+    @abstractmethod
+    async def release_agent(self, agent_name: str):
+        """释放智能体名称"""
+        pass
+
+    @abstractmethod
+    async def is_agent_online(self, agent_name: str) -> bool:
+        """智能体是否在线 (任意 worker 上)"""
+        pass
+
+class InProcessBackplane(Backplane):
+    """单进程背板: 所有连接都在本进程中, 只做本地投递"""
+
+    def __init__(self):
+        super().__init__()
+        self.connected_agents: set[str] = set()
+
+    async def _publish_remote(self, channel: str, message: Message, audio: bool):
+        pass
+
+    async def claim_agent(self, agent_name: str) -> bool:
+        if agent_name in self.connected_agents:
+            return False
+        self.connected_agents.add(agent_name)
+        return True
+
+    async def release_agent(self, agent_name: str):
+        self.connected_agents.discard(agent_name)
+
+    async def is_agent_online(self, agent_name: str) -> bool:
+        return agent_name in self.connected_agents
+
+# ---- 代理 (broker) 线路协议 ----
+# 每条消息: [长度 (uint32, 大端)][二进制帧 (见 ws_protocol.binary_frame)]
+# 帧 header 中的 "op" 字段表示操作:
+#   - sub / unsub {channel}: 订阅 / 取消订阅
+#   - pub {channel, audio, binary} + payload: 发布消息 (binary 为 False 时 payload 为 utf-8 文本)
+#   - claim / release / online {id, agent_name}: 智能体名称操作, 代理以 reply {id, ok} 回复 (release 除外)
+
+_WIRE_LEN = struct.Struct(">I")
+
+def wire_message(frame: bytes) -> bytes:
+    """为已编码的帧加上长度前缀"""
+    return _WIRE_LEN.pack(len(frame)) + frame
+
+def encode_wire(header: dict, payload: bytes = b"") -> bytes:
+    return wire_message(encode_frame(header, payload))
+
+async def read_wire(reader: asyncio.StreamReader) -> bytes:
+    """读取一条消息, 返回其中的二进制帧 (连接关闭时抛出 asyncio.IncompleteReadError)"""
+    (length,) = _WIRE_LEN.unpack(await reader.readexactly(_WIRE_LEN.size))
+    return await reader.readexactly(length)
+
+class BrokerBackplane(Backplane):
+    """
+    基于本地消息代理的背板
+
+    每个 worker 与代理保持一条 TCP 连接。连接断开后会自动重连,
+    并重新订阅频道、重新占用本 worker 上的智能体名称。
+
+    转发路径从不等待代理: 未连接时发往代理的消息直接丢弃 (频道订阅和智能体名称在重连后会重新同步),
+    写缓冲在 `send_timeout` 内排不空时断开连接重连; 名称操作 (claim / online) 最多等待 `request_timeout`,
+    超时抛出 ConnectionError。
+    """
+
+    def __init__(self, host: str = DEFAULT_BROKER_HOST, port: int = DEFAULT_BROKER_PORT, reconnect_interval: float = 1.0,
+                 connect_timeout: float = 10.0, send_timeout: float = 5.0, request_timeout: float = 5.0):
+        """
+        Args:
+            reconnect_interval (float): 重连间隔 (秒), 也是启动时重试间隔的上限
+            connect_timeout (float): 启动时等待代理就绪的最长时间 (秒), 超时后在后台继续重连
+            send_timeout (float): 等待写缓冲排空的最长时间 (秒)
+            request_timeout (float): 名称操作等待连接和代理回复的最长时间 (秒)
+        """
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.reconnect_interval = reconnect_interval
+        self.connect_timeout = connect_timeout
+        self.send_timeout = send_timeout
+        self.request_timeout = request_timeout
+
+        # 本 worker 占用的智能体名称
+        self.local_agents: set[str] = set()
+        # 正在向代理请求占用的智能体名称
+        self._claiming: set[str] = set()
+        # 未连接代理时丢弃的消息数
+        self.dropped_messages = 0
+
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._connected = asyncio.Event()
+        self._request_ids = itertools.count()
+        self._pending: dict[int, asyncio.Future] = {}
+        self._reader_task: asyncio.Task | None = None
+
+    async def start(self):
+        # 代理可能与 worker 同时启动 (--start-broker), 以指数退避重试首次连接
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.connect_timeout
+        delay = min(0.05, self.reconnect_interval)
+        while True:
+            try:
+                await self._connect()
+                break
+            except OSError as e:
+                if loop.time() + delay > deadline:
+                    logger.error(f"无法连接到消息代理 {self.host}:{self.port}: {e}, 将在后台继续重连")
+                    break
+                logger.info(f"连接消息代理失败: {e}, {delay:.2f} 秒后重试")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.reconnect_interval)
+        self._reader_task = asyncio.create_task(self._read_loop())
+
+    async def close(self):
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+        self._connected.clear()
+
+    async def _connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        for channel in self.handlers:
+            self._writer.write(encode_wire({"op": "sub", "channel": channel}))
+        self._connected.set()
+        logger.info(f"已连接到消息代理 {self.host}:{self.port}")
+
+        if self.local_agents:
+            # 回复由 _read_loop 接收, 因此不能在这里等待
+            asyncio.create_task(self._reclaim_agents(list(self.local_agents)))
+
+    async def _reclaim_agents(self, agent_names: list[str]):
+        """重新占用本 worker 上的智能体名称 (例如代理重启后)"""
+        for agent_name in agent_names:
+            try:
+                if not await self._request("claim", agent_name):
+                    logger.error(f"重连后无法重新占用智能体名称 {agent_name} (已被其他 worker 占用)")
+            except ConnectionError:
+                return
+
+    async def _read_loop(self):
+        while True:
+            if self._connected.is_set():
+                try:
+                    while True:
+                        frame = await read_wire(self._reader)
+                        header, payload = decode_frame(frame)
+                        op = header.get("op")
+                        if op == "pub":
+                            message = bytes(payload) if header.get("binary") else str(payload, "utf-8")
+                            await self._deliver_local(header["channel"], message, header.get("audio", False))
+                        elif op == "reply":
+                            future = self._pending.pop(header.get("id"), None)
+                            if future is not None and not future.done():
+                                future.set_result(header.get("ok", False))
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"与消息代理的连接断开: {e}")
+
+                self._connected.clear()
+                self._writer.close()
+                for future in self._pending.values():
+                    if not future.done():
+                        future.set_exception(ConnectionError("broker connection lost"))
+                self._pending.clear()
+
+            while True:
+                await asyncio.sleep(self.reconnect_interval)
+                try:
+                    await self._connect()
+                    break
+                except OSError as e:
+                    logger.info(f"重连消息代理失败: {e}")
+
+    async def _send(self, header: dict, payload: bytes = b""):
+        if not self._connected.is_set():
+            # 不等待代理: 转发路径不能因代理不可用而阻塞
+            self.dropped_messages += 1
+            logger.debug(f"未连接到消息代理, 丢弃消息: {header.get('op')} {header.get('channel', '')}")
+            return
+        writer = self._writer
+        writer.write(encode_wire(header, payload))
+        try:
+            await asyncio.wait_for(writer.drain(), self.send_timeout)
+        except asyncio.TimeoutError:
+            # 代理消费过慢: 断开连接, 由 _read_loop 重连
+            logger.error(f"消息代理 {self.send_timeout} 秒内未读取数据, 断开连接")
+            writer.close()
+        except ConnectionError:
+            pass  # 由 _read_loop 处理重连
+
+    async def _request(self, op: str, agent_name: str) -> bool:
+        request_id = next(self._request_ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            self._writer.write(encode_wire({"op": op, "id": request_id, "agent_name": agent_name}))
+            return await asyncio.wait_for(future, self.request_timeout)
+        except asyncio.TimeoutError:
+            raise ConnectionError(f"broker did not reply to {op} in {self.request_timeout}s") from None
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def _wait_connected(self):
+        try:
+            await asyncio.wait_for(self._connected.wait(), self.request_timeout)
+        except asyncio.TimeoutError:
+            raise ConnectionError(f"broker {self.host}:{self.port} unavailable") from None
+
+    async def _subscribe_remote(self, channel: str):
+        await self._send({"op": "sub", "channel": channel})
+
+    async def _unsubscribe_remote(self, channel: str):
+        await self._send({"op": "unsub", "channel": channel})
+
+    async def _publish_remote(self, channel: str, message: Message, audio: bool):
+        binary = isinstance(message, bytes)
+        payload = message if binary else message.encode("utf-8")
+        await self._send({"op": "pub", "channel": channel, "audio": audio, "binary": binary}, payload)
+
+    async def claim_agent(self, agent_name: str) -> bool:
+        # 代理只区分 worker: 同一 worker 上的重复占用必须在本地拒绝
+        if agent_name in self.local_agents or agent_name in self._claiming:
+            return False
+        self._claiming.add(agent_name)
+        try:
+            await self._wait_connected()
+            if not await self._request("claim", agent_name):
+                return False
+        finally:
+            self._claiming.discard(agent_name)
+        self.local_agents.add(agent_name)
+        return True
+
+    async def release_agent(self, agent_name: str):
+        self.local_agents.discard(agent_name)
+        await self._send({"op": "release", "agent_name": agent_name})
+
+    async def is_agent_online(self, agent_name: str) -> bool:
+        await self._wait_connected()
+        return await self._request("online", agent_name)
+
+BACKPLANES = {
+    "inprocess": InProcessBackplane,
+    "broker": BrokerBackplane,
+}
+
+def parse_broker_address(address: str) -> tuple[str, int]:
+    """解析 "host:port" 形式的代理地址"""
+    host, _, port = address.rpartition(":")
+    return host or DEFAULT_BROKER_HOST, int(port) if port else DEFAULT_BROKER_PORT
+
+def create_backplane(kind: str = "inprocess", broker: str = None) -> Backplane:
+    """
+    创建背板实例
+
+    Args:
+        kind (str): "inprocess" 或 "broker"
+        broker (str, optional): 代理地址 "host:port" (仅 broker 背板)
+    """
+    if kind not in BACKPLANES:
+        raise ValueError(f"Unknown backplane: {kind}")
+    if kind == "broker":
+        host, port = parse_broker_address(broker or f"{DEFAULT_BROKER_HOST}:{DEFAULT_BROKER_PORT}")
+        return BrokerBackplane(host, port)
+    return BACKPLANES[kind]()
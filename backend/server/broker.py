@@ -0,0 +1,155 @@
+"""
+本地消息代理 (broker)
+
+为 BrokerBackplane 提供频道转发和集群范围的智能体名称登记, 不依赖任何外部服务。
+线路协议见 `server/backplane.py`。
+
+用法:
+    python -m server.broker [--host 127.0.0.1] [--port 8765]
+"""
+import asyncio
+import argparse
+import itertools
+import logging
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ws_protocol import peek_header
+from log_utils import setup_logging
+from server.backplane import encode_wire, read_wire, wire_message, DEFAULT_BROKER_HOST, DEFAULT_BROKER_PORT
+
+logger = logging.getLogger(__name__)
+
+class Peer:
+    """一个连接到代理的 worker"""
+
+    def __init__(self, peer_id: int, writer: asyncio.StreamWriter):
+        self.peer_id = peer_id
+        self.writer = writer
+        self.channels: set[str] = set()
+        self.agents: set[str] = set()
+
+class Broker:
+    """
+    消息代理
+
+    发布的消息原样 (不重新编码) 转发给订阅了该频道的其他 worker。
+    某个 worker 的写缓冲超过 max_buffer_size 字节时断开该 worker, 避免拖累其他 worker。
+    """
+
+    def __init__(self, max_buffer_size: int = 64 * 1024 * 1024):
+        self.max_buffer_size = max_buffer_size
+
+        self.peers: dict[int, Peer] = {}
+        # channel -> 订阅该频道的 worker
+        self.subscribers: dict[str, set[Peer]] = {}
+        # agent_name -> 占用该名称的 worker
+        self.agents: dict[str, Peer] = {}
+        self._peer_ids = itertools.count()
+
+    async def handle_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peer = Peer(next(self._peer_ids), writer)
+        self.peers[peer.peer_id] = peer
+        logger.info(f"worker {peer.peer_id} 已连接: {writer.get_extra_info('peername')}")
+        try:
+            while True:
+                frame = await read_wire(reader)
+                self.handle_frame(peer, frame)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.error(f"worker {peer.peer_id} 发送了无效消息: {e}")
+        finally:
+            self.remove_peer(peer)
+            writer.close()
+
+    def handle_frame(self, peer: Peer, frame: bytes):
+        header = peek_header(frame)
+        op = header.get("op")
+
+        if op == "pub":
+            subscribers = self.subscribers.get(header.get("channel"), ())
+            if subscribers:
+                data = wire_message(frame)
+                for subscriber in list(subscribers):
+                    if subscriber is not peer:
+                        self.send(subscriber, data)
+
+        elif op == "sub":
+            channel = header.get("channel")
+            peer.channels.add(channel)
+            self.subscribers.setdefault(channel, set()).add(peer)
+
+        elif op == "unsub":
+            channel = header.get("channel")
+            peer.channels.discard(channel)
+            self._discard_subscriber(channel, peer)
+
+        elif op == "claim":
+            agent_name = header.get("agent_name")
+            owner = self.agents.get(agent_name)
+            ok = owner is None or owner is peer
+            if ok:
+                self.agents[agent_name] = peer
+                peer.agents.add(agent_name)
+            self.send(peer, encode_wire({"op": "reply", "id": header.get("id"), "ok": ok}))
+
+        elif op == "release":
+            agent_name = header.get("agent_name")
+            if self.agents.get(agent_name) is peer:
+                del self.agents[agent_name]
+            peer.agents.discard(agent_name)
+
+        elif op == "online":
+            ok = header.get("agent_name") in self.agents
+            self.send(peer, encode_wire({"op": "reply", "id": header.get("id"), "ok": ok}))
+
+    def send(self, peer: Peer, data: bytes):
+        if peer.peer_id not in self.peers:
+            return
+        if peer.writer.transport.get_write_buffer_size() > self.max_buffer_size:
+            logger.error(f"worker {peer.peer_id} 消费过慢, 断开连接")
+            self.remove_peer(peer)
+            peer.writer.close()
+            return
+        peer.writer.write(data)
+
+    def _discard_subscriber(self, channel: str, peer: Peer):
+        subscribers = self.subscribers.get(channel)
+        if subscribers is not None:
+            subscribers.discard(peer)
+            if not subscribers:
+                del self.subscribers[channel]
+
+    def remove_peer(self, peer: Peer):
+        """移除 worker, 并释放其订阅和占用的智能体名称"""
+        if self.peers.pop(peer.peer_id, None) is None:
+            return
+        for channel in peer.channels:
+            self._discard_subscriber(channel, peer)
+        for agent_name in peer.agents:
+            if self.agents.get(agent_name) is peer:
+                del self.agents[agent_name]
+        logger.info(f"worker {peer.peer_id} 已断开, 释放智能体名称: {sorted(peer.agents)}")
+
+async def serve(host: str = DEFAULT_BROKER_HOST, port: int = DEFAULT_BROKER_PORT):
+    broker = Broker()
+    server = await asyncio.start_server(broker.handle_peer, host, port)
+    logger.info(f"消息代理已启动: {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+def run_broker(host: str = DEFAULT_BROKER_HOST, port: int = DEFAULT_BROKER_PORT):
+    """运行消息代理 (阻塞)"""
+    setup_logging(levels="INFO")
+    asyncio.run(serve(host, port))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="BITNP AI VTuber relay broker")
+    parser.add_argument("--host", type=str, default=DEFAULT_BROKER_HOST, help=f"listen address, defaults to {DEFAULT_BROKER_HOST}")
+    parser.add_argument("--port", type=int, default=DEFAULT_BROKER_PORT, help=f"listen port, defaults to {DEFAULT_BROKER_PORT}")
+    args = parser.parse_args()
+
+    run_broker(args.host, args.port)
@@ -0,0 +1,257 @@
+"""
+WebSocket 连接管理器
+
+每个连接拥有一个有界的发送队列和独立的发送任务 (writer task)，
+向多个客户端扇出 (fan-out) 消息时只需入队，不会因为某个慢速客户端阻塞其他客户端。
+"""
+from typing import Literal, NamedTuple, Union
+from collections import deque
+from datetime import datetime
+from fastapi import WebSocket
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ws_protocol import BINARY_FRAMES_CAPABILITY
+from . import relay_metrics
+
+logger = logging.getLogger(__name__)
+
+# 服务器支持的连接能力
+SERVER_CAPABILITIES = [BINARY_FRAMES_CAPABILITY]
+
+# 慢速客户端处理策略:
+#   - "drop_oldest": 队列满时丢弃最早的非音频消息 (若队列中全是音频, 则丢弃最早的音频)
+#   - "disconnect": 队列满或最早的消息等待超过 max_lag 秒时断开连接
+SlowConsumerPolicy = Literal["drop_oldest", "disconnect"]
+
+# 因消费过慢被断开时使用的关闭码
+SLOW_CONSUMER_CLOSE_CODE = 4002
+
+Message = Union[str, bytes]
+
+class OutboundMessage(NamedTuple):
+    message: Message
+    audio: bool
+    enqueue_time: float
+
+class ClientConnection:
+    """单个客户端连接: 有界发送队列 + 独立的发送任务"""
+
+    def __init__(self, client_id: str, websocket: WebSocket, manager: 'ConnectionManager', agent_name: str = ""):
+        self.client_id = client_id
+        self.websocket = websocket
+        self.manager = manager
+
+        # 指标 (按 manager / agent_name 预先取出, 发送时只做加法)
+        self._messages_sent = relay_metrics.MESSAGES_SENT.labels(manager.name, agent_name)
+        self._bytes_sent = relay_metrics.BYTES_SENT.labels(manager.name, agent_name)
+        self._messages_dropped = relay_metrics.MESSAGES_DROPPED.labels(manager.name, agent_name)
+        self._send_latency = manager.send_latency
+
+        self.queue: deque[OutboundMessage] = deque()
+        self.dropped = 0
+        self._wakeup = asyncio.Event()
+        self.writer_task = asyncio.create_task(self._writer())
+
+    def lag(self) -> float:
+        """队首消息已等待的时间 (秒)"""
+        if not self.queue:
+            return 0.0
+        return time.monotonic() - self.queue[0].enqueue_time
+
+    def enqueue(self, message: Message, audio: bool = False) -> bool:
+        """
+        放入发送队列 (不阻塞)
+
+        Returns:
+            bool: False 表示该客户端消费过慢, 应当断开连接
+        """
+        manager = self.manager
+        if manager.slow_consumer_policy == "disconnect":
+            if len(self.queue) >= manager.max_queue_size or self.lag() > manager.max_lag:
+                return False
+        elif len(self.queue) >= manager.max_queue_size:
+            self._drop_oldest()
+
+        self.queue.append(OutboundMessage(message, audio, time.monotonic()))
+        self._wakeup.set()
+        return True
+
+    def _drop_oldest(self):
+        """丢弃最早的非音频消息, 若没有则丢弃最早的消息"""
+        for i, item in enumerate(self.queue):
+            if not item.audio:
+                del self.queue[i]
+                break
+        else:
+            self.queue.popleft()
+        self.dropped += 1
+        self._messages_dropped.inc()
+
+    async def _writer(self):
+        try:
+            while True:
+                while not self.queue:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+
+                item = self.queue.popleft()
+                if isinstance(item.message, bytes):
+                    await self.websocket.send_bytes(item.message)
+                else:
+                    await self.websocket.send_text(item.message)
+                self._send_latency.observe(time.monotonic() - item.enqueue_time)
+                self._messages_sent.inc()
+                self._bytes_sent.inc(len(item.message))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info(f"发送消息到客户端 {self.client_id} 失败: {e}")
+            relay_metrics.SEND_FAILURES.labels(self.manager.name).inc()
+            await self.manager.disconnect(self.client_id, cause="send_failed")
+
+    def close(self):
+        """停止发送任务 (不关闭 WebSocket)"""
+        if self.writer_task is not asyncio.current_task():
+            self.writer_task.cancel()
+
+# 连接管理器 - 智能体和前端分别使用
+class ConnectionManager:
+    def __init__(self, name: str = "default",
+                 max_queue_size: int = 256,
+                 slow_consumer_policy: SlowConsumerPolicy = "drop_oldest",
+                 max_lag: float = 5.0):
+        # 存储活跃连接：client_id -> ClientConnection
+        self.active_connections: dict[str, ClientConnection] = {}
+        # 存储用户信息：client_id -> user_info
+        self.users: dict[str, dict] = {}
+        # 索引：agent_name -> client_id 集合
+        self.clients_by_agent: dict[str, set[str]] = {}
+        self.name = name
+
+        self.max_queue_size = max_queue_size
+        self.slow_consumer_policy = slow_consumer_policy
+        self.max_lag = max_lag
+
+        self.send_latency = relay_metrics.SEND_LATENCY.labels(name)
+        relay_metrics.CONNECTIONS.labels(name).set_function(lambda: len(self.active_connections))
+        relay_metrics.QUEUED_MESSAGES.labels(name).set_function(
+            lambda: sum(len(c.queue) for c in self.active_connections.values()))
+        relay_metrics.MAX_QUEUE_DEPTH.labels(name).set_function(
+            lambda: max((len(c.queue) for c in self.active_connections.values()), default=0))
+
+    def log(self, message: str):
+        """记录日志"""
+        logger.info(f"[{self.name} manager] {message}")
+
+    async def connect(self, websocket: WebSocket, user_data: dict):
+        """接受WebSocket连接并存储用户信息"""
+        await websocket.accept()
+
+        # 生成唯一客户端ID
+        client_id = str(uuid.uuid4())
+        agent_name = user_data.get("agent_name", "")
+
+        # 存储连接和用户信息
+        self.active_connections[client_id] = ClientConnection(client_id, websocket, self, agent_name)
+        self.users[client_id] = {
+            "client_id": client_id,
+            "agent_name": agent_name,
+            "join_time": datetime.now().isoformat(),
+            **user_data  # 包含其他用户数据
+        }
+        self.clients_by_agent.setdefault(agent_name, set()).add(client_id)
+
+        self.log(f"Connected! agent_name: {agent_name}, client_id: {client_id}")
+
+        # 发送连接成功消息
+        welcome_msg = {
+            "type": "system",
+            "message": "successfully connected",
+            "client_id": client_id,
+            "capabilities": SERVER_CAPABILITIES,
+            "timestamp": datetime.now().isoformat()
+        }
+        await self.send_personal_message(json.dumps(welcome_msg), client_id)
+        return client_id
+
+    async def disconnect(self, client_id: str, close_code: int = None, reason: str = "", cause: str = "closed"):
+        """
+        处理连接断开 (指定 close_code 时主动关闭 WebSocket)
+
+        cause 为断开原因 (如 "client_closed", "slow_consumer", "send_failed"), 记录在指标中。
+        """
+        connection = self.active_connections.pop(client_id, None)
+        if connection is None:
+            return
+        relay_metrics.DISCONNECTS.labels(self.name, cause).inc()
+
+        # 移除连接
+        user_info = self.users.pop(client_id, {})
+        agent_clients = self.clients_by_agent.get(user_info.get("agent_name", ""))
+        if agent_clients is not None:
+            agent_clients.discard(client_id)
+            if not agent_clients:
+                del self.clients_by_agent[user_info.get("agent_name", "")]
+
+        connection.close()
+        if close_code is not None:
+            try:
+                await connection.websocket.close(code=close_code, reason=reason)
+            except Exception:
+                pass # 连接可能已经断开
+
+    async def send_personal_message(self, message: Message, client_id: str, audio: bool = False):
+        """
+        向特定客户端发送消息 (bytes 以二进制帧发送)
+
+        消息只是放入该客户端的发送队列, 不等待实际发送完成。
+        audio 标记的消息在 "drop_oldest" 策略下优先保留。
+        """
+        connection = self.active_connections.get(client_id)
+        if connection is None:
+            return
+
+        if not connection.enqueue(message, audio):
+            self.log(f"客户端 {client_id} 消费过慢 (队列长度 {len(connection.queue)}, 延迟 {connection.lag():.2f}s), 断开连接")
+            await self.disconnect(client_id, close_code=SLOW_CONSUMER_CLOSE_CODE, reason="slow consumer", cause="slow_consumer")
+
+    async def broadcast(self, message: Message, exclude_client_id: str = None):
+        """广播消息给所有客户端"""
+        for client_id in list(self.active_connections):
+            if client_id != exclude_client_id:
+                await self.send_personal_message(message, client_id)
+
+    def set_capabilities(self, client_id: str, capabilities: list[str]) -> list[str]:
+        """记录客户端声明的连接能力, 返回服务器同样支持的部分"""
+        accepted = [c for c in capabilities if c in SERVER_CAPABILITIES]
+        if client_id in self.users:
+            self.users[client_id]["capabilities"] = accepted
+        return accepted
+
+    def has_capability(self, client_id: str, capability: str) -> bool:
+        """客户端是否协商了某项连接能力"""
+        return capability in self.users.get(client_id, {}).get("capabilities", [])
+
+    def get_client_ids_by_agent_name(self, agent_name: str) -> list[str]:
+        """根据智能体名称获取所有连接的客户端ID"""
+        return list(self.clients_by_agent.get(agent_name, ()))
+
+    def get_online_users(self):
+        """获取在线用户列表"""
+        return [
+            {
+                "agent_name": user_info.get("agent_name", ""),
+                "client_id": user_info.get("client_id", ""),
+                "join_time": user_info.get("join_time", "")
+            }
+            for user_info in self.users.values()
+        ]
@@ -0,0 +1,36 @@
+"""
+中继服务器的 Prometheus 指标
+
+由 run_server.py 的 `/metrics` 接口导出。多 worker 部署时每个 worker 各自统计, 只导出本 worker 的连接。
+"""
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import Counter, Gauge, Histogram
+
+CONNECTIONS = Gauge(
+    "vtuber_connections", "Open WebSocket connections", ["manager"])
+QUEUED_MESSAGES = Gauge(
+    "vtuber_queued_messages", "Messages waiting in outbound queues", ["manager"])
+MAX_QUEUE_DEPTH = Gauge(
+    "vtuber_max_queue_depth", "Longest outbound queue of a single connection", ["manager"])
+
+MESSAGES_RECEIVED = Counter(
+    "vtuber_messages_received_total", "Messages received from clients", ["manager", "agent_name"])
+BYTES_RECEIVED = Counter(
+    "vtuber_received_bytes_total", "Bytes received from clients (characters for text messages)", ["manager", "agent_name"])
+MESSAGES_SENT = Counter(
+    "vtuber_messages_sent_total", "Messages sent to clients", ["manager", "agent_name"])
+BYTES_SENT = Counter(
+    "vtuber_sent_bytes_total", "Bytes sent to clients (characters for text messages)", ["manager", "agent_name"])
+MESSAGES_DROPPED = Counter(
+    "vtuber_messages_dropped_total", "Messages dropped by the drop_oldest slow consumer policy", ["manager", "agent_name"])
+SEND_FAILURES = Counter(
+    "vtuber_send_failures_total", "Failed WebSocket sends", ["manager"])
+
+SEND_LATENCY = Histogram(
+    "vtuber_send_latency_seconds", "Time from enqueueing a message to the end of its WebSocket send", ["manager"])
+
+DISCONNECTS = Counter(
+    "vtuber_disconnects_total", "Closed connections by reason", ["manager", "reason"])
@@ -0,0 +1,49 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+
+from server.backplane import BrokerBackplane, InProcessBackplane
+from server.broker import Broker
+
+async def with_broker(test):
+    broker = Broker()
+    server = await asyncio.start_server(broker.handle_peer, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    backplanes = [BrokerBackplane("127.0.0.1", port), BrokerBackplane("127.0.0.1", port)]
+    for backplane in backplanes:
+        await backplane.start()
+    try:
+        await test(*backplanes)
+    finally:
+        for backplane in backplanes:
+            await backplane.close()
+        server.close()
+
+async def check_single_name(worker, other_worker):
+    assert await worker.claim_agent("paimon")
+    assert not await worker.claim_agent("paimon") # same worker
+    assert not await other_worker.claim_agent("paimon")
+
+    # the rejected duplicate is closed without a release: the first agent keeps the name
+    assert await worker.is_agent_online("paimon")
+    assert await other_worker.is_agent_online("paimon")
+
+    await worker.release_agent("paimon")
+    await asyncio.sleep(0.05) # release is not acknowledged
+    assert not await other_worker.is_agent_online("paimon")
+    assert await other_worker.claim_agent("paimon")
+
+def test_in_process_single_name():
+    backplane = InProcessBackplane()
+    asyncio.run(check_single_name(backplane, backplane))
+
+def test_broker_single_name():
+    asyncio.run(with_broker(check_single_name))
+
+def test_broker_concurrent_duplicate_claims():
+    async def test(worker, _):
+        results = await asyncio.gather(worker.claim_agent("paimon"), worker.claim_agent("paimon"))
+        assert sorted(results) == [False, True]
+    asyncio.run(with_broker(test))
@@ -0,0 +1,66 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+
+from agent.basic_chatting_agent import BasicChattingAgent
+from agent.tts_pipeline import TTSPipeline
+from tts.abstract_tts import AbstractTTS
+from tts.coalesce import coalesce
+from tts.pcm2wav import pcm2wav
+from tts.wav_stream import WavStreamEncoder
+
+async def stream(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+def collect(agen) -> list:
+    async def run():
+        return [item async for item in agen]
+    return asyncio.run(run())
+
+class WavTTS(AbstractTTS):
+    """Genie-like: one WAV per clause, b"" for a sentence of punctuation"""
+
+    def __init__(self):
+        super().__init__(format="wav")
+
+    async def synthesize(self, text: str) -> bytes:
+        return b"" if text == "。" else pcm2wav(b"\1\0" * 3200, sample_rate=32000)
+
+    async def synthesize_stream(self, text: str):
+        if text != "。":
+            yield await self.synthesize(text)
+
+def create_agent(tts_stream: bool) -> BasicChattingAgent:
+    agent = BasicChattingAgent("ws://127.0.0.1:0", "test", {"api_name": "glm", "token": "test"},
+                               {"tts_method_name": "dashscope", "api_key": "test", "voice": "test"}, tts_stream=tts_stream)
+    agent.tts = WavTTS()
+    agent.audio_encoder = WavStreamEncoder.for_tts(agent.tts)
+    return agent
+
+def test_empty_chunks_are_skipped():
+    encoder = WavStreamEncoder("wav")
+    wav = pcm2wav(b"\1\0" * 3200, sample_rate=32000)
+    assert collect(coalesce(stream(b"", wav, b"", wav), 200, encoder.chunk_byte_rate)) == [(wav,), (wav,)]
+    assert collect(coalesce(stream(b""), 200, encoder.chunk_byte_rate)) == []
+    assert collect(coalesce(stream(b""), None, encoder.chunk_byte_rate)) == []
+
+def test_sentence_without_audio_keeps_its_subtitle():
+    for tts_stream in (True, False):
+        agent = create_agent(tts_stream)
+        events = []
+        async def emit(event, media):
+            events.append((event, b"".join(bytes(part) for part in media)))
+        pipeline = TTSPipeline(agent.synthesize_audio, emit)
+
+        async def speak():
+            await pipeline.speak("你好")
+            await pipeline.speak("。")
+            await pipeline.join()
+        asyncio.run(speak())
+
+        assert [event["content"] for event, _ in events] == ["你好", "。"]
+        event, media = events[1]
+        assert event["format"] == "wav" and media == pcm2wav(b"")
@@ -0,0 +1,34 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+
+from ws_protocol import extract_event_data, make_event_envelope, peek_type
+
+def test_peek_type():
+    assert peek_type('{"type": "event", "data": {}}') == "event"
+    assert peek_type('{"data": {}, "type": "event"}') is None
+
+def test_extract_event_data():
+    assert extract_event_data('{"type": "event", "data": {"type": "say_aloud", "content": "}"}}') == '{"type": "say_aloud", "content": "}"}'
+    assert extract_event_data(' {"type":"event","data":[1, {"a": "\\"}"}]} \n') == '[1, {"a": "\\"}"}]'
+    assert extract_event_data('{"type": "event", "data": "text"}') == '"text"'
+
+def test_keys_after_data_fall_back():
+    message = '{"type":"event","data":{},"time":"x"}'
+    assert extract_event_data(message) is None
+    assert extract_event_data('{"type":"event","data":{"a": 1}, "data": {"b": 2}}') is None
+
+def test_malformed_json_falls_back():
+    for message in ('{"type":"event","data":{"a": }}',
+                    '{"type":"event","data":{"a": 1}',
+                    '{"type":"event","data":{"a": 1}}}',
+                    '{"type":"event","data":{"a": "unterminated}}',
+                    '{"type":"event","data":}'):
+        assert extract_event_data(message) is None, message
+
+def test_envelope_is_valid_json():
+    data = extract_event_data('{"type": "event", "data": {"type": "bracket_tag", "content": "微笑"}}')
+    envelope = json.loads(make_event_envelope("2026-01-01T00:00:00", data))
+    assert envelope == {"time": "2026-01-01T00:00:00", "data": {"type": "bracket_tag", "content": "微笑"}}
@@ -0,0 +1,72 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+
+from tts.genie import reference_cache
+from tts.genie.reference_cache import FEATURES, ReferenceCache
+
+class StubReferenceAudio:
+    """Mimics Genie's ReferenceAudio: instances cached by audio path, features computed in __init__"""
+    _prompt_cache = {}
+
+    def __init__(self, text: str):
+        self.text = text
+        for name in FEATURES:
+            setattr(self, name, np.arange(4, dtype=np.float32))
+        self._initialized = True
+
+class LegacyReferenceAudio:
+    """A Genie-TTS version without the private instance cache"""
+
+@pytest.fixture
+def stub_genie(monkeypatch):
+    StubReferenceAudio._prompt_cache = {}
+    monkeypatch.setattr(reference_cache, "ReferenceAudio", StubReferenceAudio)
+    monkeypatch.setattr(reference_cache, "GENIE_VERSION", "1.0.0")
+
+def test_save_then_load_restores_features(stub_genie, tmp_path):
+    cache = ReferenceCache(str(tmp_path))
+    StubReferenceAudio._prompt_cache["ref.wav"] = StubReferenceAudio("你好")
+    assert cache.save("key", "ref.wav")
+
+    StubReferenceAudio._prompt_cache.clear()
+    assert cache.load("key", "ref.wav", "你好")
+    reference = StubReferenceAudio._prompt_cache["ref.wav"]
+    assert reference._initialized and reference.text == "你好"
+    for name in FEATURES:
+        assert np.array_equal(getattr(reference, name), np.arange(4, dtype=np.float32))
+
+def test_missing_entry_is_not_loaded(stub_genie, tmp_path):
+    assert not ReferenceCache(str(tmp_path)).load("key", "ref.wav", "你好")
+    assert StubReferenceAudio._prompt_cache == {}
+
+def test_missing_prompt_cache_falls_back(monkeypatch, tmp_path, caplog):
+    monkeypatch.setattr(reference_cache, "ReferenceAudio", LegacyReferenceAudio)
+    monkeypatch.setattr(reference_cache, "GENIE_VERSION", "2.0.0")
+    cache = ReferenceCache(str(tmp_path))
+    assert not cache.load("key", "ref.wav", "你好")
+    assert not cache.save("key", "ref.wav")
+    assert "_prompt_cache missing" in caplog.text
+    assert not hasattr(LegacyReferenceAudio, "_prompt_cache")
+
+def test_unknown_genie_version_falls_back(stub_genie, monkeypatch, tmp_path):
+    cache = ReferenceCache(str(tmp_path))
+    StubReferenceAudio._prompt_cache["ref.wav"] = StubReferenceAudio("你好")
+    assert cache.save("key", "ref.wav")
+
+    monkeypatch.setattr(reference_cache, "GENIE_VERSION", None)
+    StubReferenceAudio._prompt_cache.clear()
+    assert not cache.load("key", "ref.wav", "你好")
+    assert StubReferenceAudio._prompt_cache == {}
+
+def test_key_depends_on_genie_version(monkeypatch, tmp_path):
+    ref_audio = tmp_path / "ref.wav"
+    ref_audio.write_bytes(b"RIFF")
+    args = (str(tmp_path), str(ref_audio), "你好", "zh", "zh")
+    monkeypatch.setattr(reference_cache, "GENIE_VERSION", "1.0.0")
+    key = reference_cache.reference_key(*args)
+    monkeypatch.setattr(reference_cache, "GENIE_VERSION", "1.1.0")
+    assert reference_cache.reference_key(*args) != key
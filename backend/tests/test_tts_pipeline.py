@@ -0,0 +1,49 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+
+from agent.tts_pipeline import TTSPipeline
+
+class SlowTTS:
+    """Yields a few chunks per sentence and records how many syntheses run at once"""
+
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+
+    async def synthesize(self, text: str):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            for _ in range(3):
+                await asyncio.sleep(0.01)
+                yield {"format": "wav"}, b"\0\0"
+        finally:
+            self.running -= 1
+
+async def speak_all(pipeline: TTSPipeline, count: int):
+    for i in range(count):
+        await pipeline.speak(f"sentence {i}")
+
+def test_look_ahead_holds_after_interruptions():
+    async def run():
+        tts = SlowTTS()
+        async def emit(event, media):
+            await asyncio.sleep(0.02) # playback is slower than synthesis
+        pipeline = TTSPipeline(tts.synthesize, emit, look_ahead=2)
+
+        for _ in range(3):
+            producer = asyncio.create_task(speak_all(pipeline, 6))
+            await asyncio.sleep(0.05) # interrupt mid-sentence
+            producer.cancel()
+            pipeline.cancel()
+            await asyncio.sleep(0.05)
+
+        tts.max_running = 0
+        await speak_all(pipeline, 6)
+        await pipeline.join()
+        assert tts.max_running <= 2
+        assert pipeline._slots._value == 2
+    asyncio.run(run())
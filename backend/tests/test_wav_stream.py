@@ -0,0 +1,40 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+
+from tts.codecs import encode_utterance, negotiate_pcm
+from tts.pcm2wav import pcm2wav
+from tts.wav_stream import WavStreamEncoder
+
+PCM = bytes(range(256)) * 8
+
+async def frames(*chunks):
+    for chunk in chunks:
+        yield (chunk,)
+
+def encode(encoder: WavStreamEncoder, *chunks, pcm_continuation: bool) -> list[tuple[str, bytes]]:
+    async def collect():
+        return [(fields["format"], b"".join(bytes(part) for part in parts))
+                async for fields, parts in encode_utterance(frames(*chunks), encoder, pcm_continuation=pcm_continuation)]
+    return asyncio.run(collect())
+
+def test_negotiate_pcm():
+    assert negotiate_pcm([["wav", "pcm"], ["wav", "pcm", "mulaw"]])
+    assert not negotiate_pcm([["wav", "pcm"], ["wav"]]) # a legacy frontend
+    assert not negotiate_pcm([]) # formats not known yet
+
+def test_pcm_source_continuation_frames():
+    encoder = WavStreamEncoder("pcm", 24000)
+    assert encode(encoder, PCM, PCM, pcm_continuation=True) == [("wav", pcm2wav(PCM)), ("pcm", PCM)]
+
+def test_pcm_source_complete_wavs_for_legacy_frontends():
+    encoder = WavStreamEncoder("pcm", 24000)
+    assert encode(encoder, PCM, PCM, pcm_continuation=False) == [("wav", pcm2wav(PCM)), ("wav", pcm2wav(PCM))]
+
+def test_wav_source():
+    encoder = WavStreamEncoder("wav")
+    wav = pcm2wav(PCM, sample_rate=32000)
+    assert encode(encoder, wav, wav, pcm_continuation=True) == [("wav", wav), ("pcm", PCM)]
+    assert encode(encoder, wav, wav, pcm_continuation=False) == [("wav", wav), ("wav", wav)]
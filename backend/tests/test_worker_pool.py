@@ -0,0 +1,39 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import asyncio
+import multiprocessing
+
+import pytest
+
+from tts.genie import worker_pool
+
+def stream_then_exit(sink, crash: bool):
+    sink(b"chunk 1")
+    sink(b"chunk 2")
+    if crash:
+        os._exit(1) # a native crash / OOM kill: no None is sent
+    sink(None)
+
+def receive(crash: bool) -> list[bytes]:
+    async def run():
+        context = multiprocessing.get_context("spawn")
+        with context.Manager() as manager, ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            queue = manager.Queue()
+            future = asyncio.get_running_loop().run_in_executor(executor, stream_then_exit, queue.put, crash)
+            chunks = [chunk async for chunk in worker_pool._receive_chunks(queue, future)]
+            await future
+            return chunks
+    return asyncio.run(asyncio.wait_for(run(), 30))
+
+def test_stream_ends_with_none():
+    assert receive(crash=False) == [b"chunk 1", b"chunk 2"]
+
+def test_dead_worker_raises(monkeypatch):
+    monkeypatch.setattr(worker_pool, "POLL_INTERVAL", 0.05)
+    with pytest.raises(BrokenProcessPool):
+        receive(crash=True)
@@ -1,7 +1,8 @@
 from .abstract_tts import AbstractTTS
 from .genie import GenieTTS
 from .dashscope import DashscopeTTS
-from typing import Literal
+from .cache import CachedTTS
+from typing import Literal, Optional
 
 REGISTRY = {
     "genie": GenieTTS,
@@ -10,7 +11,10 @@ REGISTRY = {
 
 Available_TTS_Methods = Literal["genie", "dashscope"]
 
-def create_tts(tts_method_name: Available_TTS_Methods, **kwargs) -> AbstractTTS:
+def create_tts(tts_method_name: Available_TTS_Methods, cache_dir: Optional[str] = None, **kwargs) -> AbstractTTS:
     if tts_method_name not in REGISTRY:
         raise ValueError(f"TTS {tts_method_name} not found in registry")
-    return REGISTRY[tts_method_name](**kwargs)
+    tts = REGISTRY[tts_method_name](**kwargs)
+    if cache_dir:
+        tts = CachedTTS(tts, cache_dir)
+    return tts
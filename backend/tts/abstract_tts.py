@@ -7,6 +7,9 @@ class AbstractTTS(ABC):
     """
     Abstract class for TTS service.
     """
+    # whether synthesize / synthesize_stream may run concurrently on one instance
+    supports_concurrency: bool = True
+
     def __init__(self, format: Format, **kwargs):
         self.format = format
 
@@ -15,6 +18,14 @@ class AbstractTTS(ABC):
             self.channels = kwargs.get("channels", 1)
             self.bits_per_sample = kwargs.get("bits_per_sample", 16)
 
+    def cache_identity(self) -> dict:
+        """
+        What determines the synthesized audio besides the text and the audio format (voice / speaker, model...).
+
+        Part of the `CachedTTS` key, so it must be stable across restarts.
+        """
+        return {"tts": type(self).__name__}
+
     @abstractmethod
     async def synthesize(self, text: str) -> bytes:
         """
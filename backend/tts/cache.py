@@ -0,0 +1,238 @@
+"""
+Content-addressed cache for synthesized audio
+"""
+from typing import AsyncGenerator, Optional
+from collections import OrderedDict
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import struct
+import threading
+import unicodedata
+
+from .abstract_tts import AbstractTTS
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"TTSC"
+_WHITESPACE = re.compile(r"\s+")
+
+Chunks = tuple[bytes, ...]
+
+def normalize_text(text: str) -> str:
+    """NFKC (full-width / half-width variants), collapsed whitespace, stripped"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+class MemoryTier:
+    """LRU of audio chunks with a byte budget"""
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.size = 0
+        self.entries: OrderedDict[str, Chunks] = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Chunks]:
+        chunks = self.entries.get(key)
+        if chunks is not None:
+            self.entries.move_to_end(key)
+        return chunks
+
+    def put(self, key: str, chunks: Chunks):
+        size = sum(map(len, chunks))
+        if size > self.budget:
+            return
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.size -= sum(map(len, old))
+        self.entries[key] = chunks
+        self.size += size
+        while self.size > self.budget:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= sum(map(len, evicted))
+            self.evictions += 1
+
+class DiskTier:
+    """
+    One file per entry (`<dir>/<key[:2]>/<key>.bin`), read chunk by chunk (each chunk is read straight
+    into its own bytes object, without an intermediate copy of the file), evicted oldest-first
+    (by modification time, refreshed on every hit) when the directory exceeds the byte budget.
+    `get` / `put` do blocking file I/O and may be called from worker threads.
+
+    File layout: b"TTSC", chunk count (u32), chunk lengths (u32 each), chunk data.
+    """
+
+    def __init__(self, directory: str, budget: int):
+        self.directory = directory
+        self.budget = budget
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        self.files: dict[str, tuple[float, int]] = {} # path -> (mtime, size)
+        for root, _, names in os.walk(directory):
+            for name in names:
+                if name.endswith(".bin"):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    self.files[path] = (stat.st_mtime, stat.st_size)
+        self.size = sum(size for _, size in self.files.values())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.bin")
+
+    def get(self, key: str) -> Optional[Chunks]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                header = f.read(8)
+                if header[:4] != _MAGIC:
+                    raise ValueError("bad magic")
+                count, = struct.unpack_from("<I", header, 4)
+                lengths = struct.unpack(f"<{count}I", f.read(4 * count))
+                chunks = [f.read(length) for length in lengths]
+                if any(len(chunk) != length for chunk, length in zip(chunks, lengths)):
+                    raise ValueError("truncated")
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (ValueError, struct.error, OSError) as e:
+            logger.warning(f"Dropping corrupt TTS cache file {path}: {e!r}")
+            self._remove(path)
+            return None
+        self._track(path)
+        return tuple(chunks)
+
+    def put(self, key: str, chunks: Chunks):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        header = _MAGIC + struct.pack(f"<I{len(chunks)}I", len(chunks), *map(len, chunks))
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(header)
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp_path, path) # atomic: readers never see a partial file
+        self._track(path)
+
+        with self._lock:
+            if self.size <= self.budget:
+                return
+            oldest = sorted(self.files.items(), key=lambda item: item[1][0])
+        for old_path, _ in oldest:
+            if self.size <= self.budget:
+                break
+            if old_path != path:
+                self._remove(old_path)
+                self.evictions += 1
+
+    def _track(self, path: str):
+        stat = os.stat(path)
+        with self._lock:
+            _, old_size = self.files.get(path, (0, 0))
+            self.files[path] = (stat.st_mtime, stat.st_size)
+            self.size += stat.st_size - old_size
+
+    def _remove(self, path: str):
+        with self._lock:
+            _, size = self.files.pop(path, (0, 0))
+            self.size -= size
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+class CachedTTS(AbstractTTS):
+    """
+    Wraps any `AbstractTTS` and caches its audio by content.
+
+    The key is a hash of the normalized text (`normalize_text`), the wrapped TTS's `cache_identity()`
+    (voice / speaker, model), the audio format and the mode ("stream" or "whole": a streamed entry may be
+    several self-contained files, e.g. one WAV per clause, that `synthesize` must not concatenate). Entries live in an in-memory LRU (`memory_budget`
+    bytes) and, if `cache_dir` is given, on disk (`disk_budget` bytes, survives restarts).
+
+    Streamed audio is cached chunk by chunk and replayed as the same chunks; a stream that fails or
+    is cancelled is not cached. Empty audio is never cached.
+    """
+
+    def __init__(self, tts: AbstractTTS, cache_dir: Optional[str] = None,
+                 memory_budget: int = 64 * 1024 * 1024, disk_budget: int = 1024 * 1024 * 1024):
+        if tts.format == "pcm":
+            super().__init__(tts.format, sample_rate=tts.sample_rate, channels=tts.channels, bits_per_sample=tts.bits_per_sample)
+        else:
+            super().__init__(tts.format)
+        self.tts = tts
+        self.supports_concurrency = tts.supports_concurrency
+
+        self.memory = MemoryTier(memory_budget)
+        self.disk = DiskTier(cache_dir, disk_budget) if cache_dir else None
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+
+        identity = {**tts.cache_identity(), "format": self.format}
+        if self.format == "pcm":
+            identity.update(sample_rate=self.sample_rate, channels=self.channels, bits_per_sample=self.bits_per_sample)
+        self._identity = json.dumps(identity, sort_keys=True, ensure_ascii=False)
+
+    def cache_identity(self) -> dict:
+        return self.tts.cache_identity()
+
+    def key(self, text: str, mode: str = "stream") -> str:
+        return hashlib.sha256(f"{self._identity}\n{mode}\n{normalize_text(text)}".encode()).hexdigest()
+
+    async def lookup(self, text: str, mode: str = "stream") -> Optional[Chunks]:
+        """Cached chunks of `text` synthesized in `mode`, or None"""
+        key = self.key(text, mode)
+        chunks = self.memory.get(key)
+        if chunks is not None:
+            self._stats["memory_hits"] += 1
+            return chunks
+        if self.disk is not None:
+            chunks = await asyncio.to_thread(self.disk.get, key)
+            if chunks is not None:
+                self._stats["disk_hits"] += 1
+                self.memory.put(key, chunks)
+                return chunks
+        self._stats["misses"] += 1
+        return None
+
+    async def store(self, text: str, chunks: Chunks, mode: str = "stream"):
+        if not any(chunks):
+            return
+        key = self.key(text, mode)
+        self._stats["stores"] += 1
+        self.memory.put(key, chunks)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.put, key, chunks)
+
+    async def synthesize(self, text: str) -> bytes:
+        chunks = await self.lookup(text, "whole")
+        if chunks is not None:
+            return chunks[0]
+        audio = await self.tts.synthesize(text)
+        await self.store(text, (audio,), "whole")
+        return audio
+
+    async def synthesize_stream(self, text: str) -> AsyncGenerator[bytes, None]:
+        chunks = await self.lookup(text)
+        if chunks is not None:
+            for chunk in chunks:
+                yield chunk
+            return
+
+        received = []
+        async for chunk in self.tts.synthesize_stream(text):
+            received.append(chunk)
+            yield chunk
+        await self.store(text, tuple(received))
+
+    def stats(self) -> dict:
+        """Hit / miss / eviction counters and tier sizes"""
+        stats = {**self._stats, "memory_evictions": self.memory.evictions,
+                 "memory_entries": len(self.memory.entries), "memory_bytes": self.memory.size}
+        if self.disk is not None:
+            stats.update(disk_evictions=self.disk.evictions, disk_entries=len(self.disk.files), disk_bytes=self.disk.size)
+        return stats
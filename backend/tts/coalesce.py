@@ -0,0 +1,59 @@
+"""
+Coalescing of streamed TTS audio chunks into fewer, larger `say_aloud` frames
+"""
+from typing import AsyncGenerator, AsyncIterable, Callable, Optional, Union
+
+import time
+
+BytesLike = Union[bytes, bytearray, memoryview]
+Frame = tuple[BytesLike, ...]
+
+# a frame is sent early once the listener has less audio left than this plus two chunk intervals
+MIN_LEAD = 0.05
+
+async def coalesce(chunks: AsyncIterable[BytesLike], frame_ms: Optional[int], byte_rate: Callable[[BytesLike], int],
+                   clock: Callable[[], float] = time.monotonic) -> AsyncGenerator[Frame, None]:
+    """
+    Group the audio chunks of one utterance into frames of about `frame_ms` of audio.
+
+    - the first chunk is yielded on its own as soon as it arrives (time to first audio is unchanged)
+    - after it, chunks are collected until the frame holds `frame_ms` of audio, but only while the
+      listener (assumed to start playing when the first chunk is yielded) has enough audio left
+      (`MIN_LEAD` plus two chunk intervals): a slow TTS gets smaller frames instead of gaps in the playback
+    - the rest is yielded when the stream ends
+
+    The chunks are not joined (a frame is a tuple of them, see `WavStreamEncoder.encode`).
+    `byte_rate(chunk)` gives the bytes per second of the audio (asked once, for the first chunk);
+    with `frame_ms=None` every chunk is its own frame. Empty chunks (e.g. Genie's b"" for a sentence
+    of punctuation) are skipped: an utterance without audio yields no frames.
+    """
+    rate = None
+    last = None
+    frame: list[BytesLike] = []
+    frame_size = 0
+    async for chunk in chunks:
+        if not len(chunk):
+            continue
+        if frame_ms is None:
+            yield (chunk,)
+            continue
+        if rate is None:
+            rate = byte_rate(chunk)
+            frame_bytes = rate * frame_ms // 1000
+            start = last = clock()
+            sent = len(chunk)
+            yield (chunk,)
+            continue
+
+        frame.append(chunk)
+        frame_size += len(chunk)
+        now = clock()
+        interval, last = now - last, now
+        ahead = sent / rate - (now - start) # seconds of audio the listener has not played yet
+        if frame_size >= frame_bytes or ahead < MIN_LEAD + 2 * interval:
+            sent += frame_size
+            yield tuple(frame)
+            frame, frame_size = [], 0
+
+    if frame:
+        yield tuple(frame)
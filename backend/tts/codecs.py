@@ -0,0 +1,341 @@
+"""
+Compressed audio codecs for `say_aloud` events
+
+    "wav"        uncompressed (a WAV header per utterance, then raw PCM "pcm" if every frontend decodes it,
+                 otherwise a complete WAV per event, see `wav_stream.py`), always available
+    "mulaw"      G.711 μ-law, 8 bits per sample (NumPy only)
+    "ima_adpcm"  IMA ADPCM, 4 bits per sample (pure Python)
+    "mp3"        MP3 frames, only if `lameenc` is installed
+    "opus"       Opus packets (20 ms), only if `opuslib` and libopus are installed
+
+All codecs take 16-bit PCM. A codec keeps its state for one utterance (`CodecStream`); every event
+payload decodes on its own for "mulaw" / "ima_adpcm", the packets of "mp3" / "opus" must be fed to one
+decoder per utterance in order. Payload layouts (all little endian):
+
+    mulaw       one byte per sample, channels interleaved
+    ima_adpcm   uint32 samples per channel, per channel {int16 predictor, uint8 step index, uint8 0},
+                then 4-bit codes of the interleaved samples (low nibble first)
+    mp3 / opus  packets, each as uint16 length + packet (one MP3 frame / Opus packet)
+"""
+from abc import ABC, abstractmethod
+from typing import AsyncGenerator, AsyncIterable, ClassVar, Iterable, Optional, Sequence
+
+import struct
+
+import numpy as np
+
+from .wav_stream import AudioFrame, BytesLike, PcmFormat, WavStreamEncoder
+
+WAV = "wav"
+PCM = "pcm" # raw PCM continuation frames of "wav" audio
+
+class CodecStream(ABC):
+    """Encoder state of one utterance"""
+
+    @abstractmethod
+    def encode(self, pcm: BytesLike) -> bytes:
+        """Encode whole 16-bit samples (interleaved channels); may return b"" while the encoder buffers"""
+
+    def flush(self) -> bytes:
+        """Encode what is still buffered at the end of the utterance"""
+        return b""
+
+class AudioCodec(ABC):
+    name: ClassVar[str]
+
+    def supports(self, audio_format: PcmFormat) -> bool:
+        return audio_format.bits_per_sample == 16
+
+    @abstractmethod
+    def stream(self, audio_format: PcmFormat) -> CodecStream:
+        """A new encoder for one utterance"""
+
+CODECS: dict[str, AudioCodec] = {}
+
+def register_codec(codec: AudioCodec):
+    CODECS[codec.name] = codec
+
+def available_codecs() -> list[str]:
+    """Names of the codecs that can be used here ("wav" included)"""
+    return [WAV, *CODECS]
+
+def negotiate(preferred: Sequence[str], frontend_formats: Iterable[Sequence[str]]) -> list[AudioCodec]:
+    """
+    The codecs of `preferred` (in order) that are available here and decoded by every frontend.
+
+    "wav" in `preferred` ends the list (wav is the fallback anyway); no frontends: no codecs.
+    """
+    frontend_formats = list(frontend_formats)
+    if not frontend_formats:
+        return []
+    codecs = []
+    for name in preferred:
+        if name == WAV:
+            break
+        if name in CODECS and all(name in formats for formats in frontend_formats):
+            codecs.append(CODECS[name])
+    return codecs
+
+def negotiate_pcm(frontend_formats: Iterable[Sequence[str]]) -> bool:
+    """Whether raw PCM continuation frames can be sent: there are frontends, and all of them decode "pcm" """
+    frontend_formats = list(frontend_formats)
+    return bool(frontend_formats) and all(PCM in formats for formats in frontend_formats)
+
+async def encode_utterance(frames: AsyncIterable[AudioFrame], encoder: WavStreamEncoder,
+                           codecs: Sequence[AudioCodec] = (), pcm_continuation: bool = False) -> AsyncGenerator[tuple[dict, AudioFrame], None]:
+    """
+    Encode the audio frames of one utterance, yielding (say_aloud fields, payload parts).
+
+    The first of `codecs` that supports the audio's format is used (checked on the first frame),
+    otherwise the audio is sent by `encoder` as WAV + PCM (`pcm_continuation`, see `negotiate_pcm`) or
+    as one complete WAV per frame. Codec events carry `format`, `sample_rate` and `channels`; the first
+    one of the utterance also `first: true`.
+    """
+    first = True
+    stream: Optional[CodecStream] = None
+    fields: dict = None
+    async for frame in frames:
+        if first:
+            audio_format = encoder.chunk_format(frame[0])
+            codec = next((codec for codec in codecs if codec.supports(audio_format)), None)
+            if codec is not None:
+                stream = codec.stream(audio_format)
+                fields = {"format": codec.name, "sample_rate": audio_format.sample_rate, "channels": audio_format.channels}
+
+        if stream is None:
+            wav_format, parts = encoder.encode(frame, first, pcm_continuation)
+            yield {"format": wav_format}, parts
+        else:
+            payload = b"".join([stream.encode(part) for part in encoder.samples(frame)])
+            yield ({**fields, "first": True} if first else fields), (payload,)
+        first = False
+
+    if stream is not None and (tail := stream.flush()):
+        yield fields, (tail,)
+
+# G.711 μ-law
+
+_MULAW_BIAS = 0x21 # on 14-bit magnitudes, as the G.711 reference code
+_MULAW_CLIP = 8159
+
+def _mulaw_table() -> np.ndarray:
+    """μ-law code of every 16-bit sample, indexed by the sample as uint16"""
+    samples = np.arange(65536, dtype=np.uint16).view(np.int16).astype(np.int32) >> 2
+    sign = np.where(samples < 0, 0x00, 0x80) # inverted with the other bits
+    magnitude = np.minimum(np.abs(samples), _MULAW_CLIP) + _MULAW_BIAS
+    segment = np.frexp(magnitude)[1] - 6 # magnitude in [2 ** (segment + 5), 2 ** (segment + 6))
+    code = np.where(segment > 7, 0x7F, (np.minimum(segment, 7) << 4) | ((magnitude >> (segment + 1)) & 0x0F))
+    return ((code ^ 0x7F) | sign).astype(np.uint8)
+
+_MULAW = _mulaw_table()
+
+class _MuLawStream(CodecStream):
+    def encode(self, pcm: BytesLike) -> bytes:
+        return _MULAW[np.frombuffer(pcm, dtype="<u2")].tobytes()
+
+class MuLawCodec(AudioCodec):
+    name = "mulaw"
+
+    def stream(self, audio_format: PcmFormat) -> CodecStream:
+        return _MuLawStream()
+
+# IMA ADPCM
+
+_IMA_STEPS = [
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45,
+    50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209, 230, 253, 279, 307,
+    337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876, 963, 1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066,
+    2272, 2499, 2749, 3024, 3327, 3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442, 11487, 12635, 13899,
+    15289, 16818, 18500, 20350, 22385, 24623, 27086, 29794, 32767,
+]
+_IMA_INDEX = [-1, -1, -1, -1, 2, 4, 6, 8] * 2
+# step index after each (index, code), clamped to 0-88
+_IMA_NEXT_INDEX = [min(max(index + _IMA_INDEX[code], 0), 88) for index in range(89) for code in range(16)]
+_ADPCM_FRAME = struct.Struct("<I")
+_ADPCM_CHANNEL = struct.Struct("<hBx")
+
+def _adpcm_encode(samples: list[int], predictor: int, index: int) -> tuple[bytearray, int, int]:
+    """4-bit codes (one per byte) of one channel, and the state after it"""
+    codes = bytearray(len(samples))
+    steps, next_index = _IMA_STEPS, _IMA_NEXT_INDEX
+    for i, sample in enumerate(samples):
+        step = steps[index]
+        diff = sample - predictor
+        if diff < 0:
+            code = 8
+            diff = -diff
+        else:
+            code = 0
+        delta = step >> 3
+        if diff >= step:
+            code |= 4
+            diff -= step
+            delta += step
+        step >>= 1
+        if diff >= step:
+            code |= 2
+            diff -= step
+            delta += step
+        if diff >= step >> 1:
+            code |= 1
+            delta += step >> 1
+        if code & 8:
+            predictor -= delta
+            if predictor < -32768:
+                predictor = -32768
+        else:
+            predictor += delta
+            if predictor > 32767:
+                predictor = 32767
+        index = next_index[index * 16 + code]
+        codes[i] = code
+    return codes, predictor, index
+
+class _AdpcmStream(CodecStream):
+    def __init__(self, channels: int):
+        self.channels = channels
+        self.state = [(0, 0)] * channels # (predictor, step index) per channel
+
+    def encode(self, pcm: BytesLike) -> bytes:
+        samples = np.frombuffer(pcm, dtype="<i2").reshape(-1, self.channels)
+        header = bytearray(_ADPCM_FRAME.pack(len(samples)))
+        codes = np.empty(samples.shape, dtype=np.uint8)
+        for channel in range(self.channels):
+            predictor, index = self.state[channel]
+            header += _ADPCM_CHANNEL.pack(predictor, index)
+            channel_codes, predictor, index = _adpcm_encode(samples[:, channel].tolist(), predictor, index)
+            codes[:, channel] = np.frombuffer(channel_codes, dtype=np.uint8)
+            self.state[channel] = (predictor, index)
+
+        codes = codes.ravel()
+        if len(codes) & 1:
+            codes = np.append(codes, np.uint8(0))
+        return bytes(header) + (codes[0::2] | (codes[1::2] << 4)).tobytes()
+
+class ImaAdpcmCodec(AudioCodec):
+    name = "ima_adpcm"
+
+    def stream(self, audio_format: PcmFormat) -> CodecStream:
+        return _AdpcmStream(audio_format.channels)
+
+_PACKET_LENGTH = struct.Struct("<H")
+
+def _packets(packets: Iterable[bytes]) -> bytes:
+    return b"".join([_PACKET_LENGTH.pack(len(packet)) + packet for packet in packets])
+
+# MP3 (lameenc)
+
+try:
+    import lameenc
+except ImportError:
+    lameenc = None
+
+_MP3_BITRATES = { # kbps by bitrate index, Layer III
+    "mpeg1": [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    "mpeg2": [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]} # by version bits
+
+def _mp3_frame_size(header: BytesLike) -> int:
+    """Length of the MP3 (Layer III) frame starting with `header` (4 bytes)"""
+    if header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        raise ValueError("lost MP3 frame sync")
+    version = (header[1] >> 3) & 3
+    bitrate = _MP3_BITRATES["mpeg1" if version == 3 else "mpeg2"][header[2] >> 4]
+    sample_rate = _MP3_SAMPLE_RATES[version][(header[2] >> 2) & 3]
+    padding = (header[2] >> 1) & 1
+    return (144000 if version == 3 else 72000) * bitrate // sample_rate + padding
+
+class _Mp3Stream(CodecStream):
+    def __init__(self, audio_format: PcmFormat, bitrate: int, quality: int):
+        self.encoder = lameenc.Encoder()
+        self.encoder.set_bit_rate(bitrate)
+        self.encoder.set_in_sample_rate(audio_format.sample_rate)
+        self.encoder.set_channels(audio_format.channels)
+        self.encoder.set_quality(quality)
+        self.buffer = bytearray() # lame's output is not cut at frame boundaries
+
+    def _frames(self, data: bytes) -> bytes:
+        self.buffer += data
+        frames = []
+        offset = 0
+        while offset + 4 <= len(self.buffer):
+            size = _mp3_frame_size(self.buffer[offset:offset + 4])
+            if offset + size > len(self.buffer):
+                break
+            frames.append(bytes(self.buffer[offset:offset + size]))
+            offset += size
+        del self.buffer[:offset]
+        return _packets(frames)
+
+    def encode(self, pcm: BytesLike) -> bytes:
+        return self._frames(self.encoder.encode(bytes(pcm)))
+
+    def flush(self) -> bytes:
+        return self._frames(self.encoder.flush())
+
+class Mp3Codec(AudioCodec):
+    name = "mp3"
+    SAMPLE_RATES = (8000, 11025, 12000, 16000, 22050, 24000, 32000, 44100, 48000)
+
+    def __init__(self, bitrate: int = 48, quality: int = 7):
+        self.bitrate = bitrate # kbps
+        self.quality = quality # 2 (best) - 7 (fastest)
+
+    def supports(self, audio_format: PcmFormat) -> bool:
+        return super().supports(audio_format) and audio_format.sample_rate in self.SAMPLE_RATES and audio_format.channels in (1, 2)
+
+    def stream(self, audio_format: PcmFormat) -> CodecStream:
+        return _Mp3Stream(audio_format, self.bitrate, self.quality)
+
+# Opus (opuslib)
+
+try:
+    import opuslib
+except Exception: # opuslib raises a plain Exception if libopus is missing
+    opuslib = None
+
+class _OpusStream(CodecStream):
+    def __init__(self, audio_format: PcmFormat, bitrate: int, frame_ms: int):
+        self.encoder = opuslib.Encoder(audio_format.sample_rate, audio_format.channels, "audio")
+        self.encoder.bitrate = bitrate
+        self.frame_samples = audio_format.sample_rate * frame_ms // 1000
+        self.frame_bytes = self.frame_samples * audio_format.channels * 2
+        self.buffer = bytearray() # samples of the next, incomplete packet
+
+    def _encode_buffered(self) -> bytes:
+        end = len(self.buffer) - len(self.buffer) % self.frame_bytes
+        packets = [self.encoder.encode(bytes(self.buffer[offset:offset + self.frame_bytes]), self.frame_samples)
+                   for offset in range(0, end, self.frame_bytes)]
+        del self.buffer[:end]
+        return _packets(packets)
+
+    def encode(self, pcm: BytesLike) -> bytes:
+        self.buffer += pcm
+        return self._encode_buffered()
+
+    def flush(self) -> bytes:
+        if self.buffer:
+            self.buffer += bytes(self.frame_bytes - len(self.buffer)) # pad the last packet with silence
+        return self._encode_buffered()
+
+class OpusCodec(AudioCodec):
+    name = "opus"
+    SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+    def __init__(self, bitrate: int = 24000, frame_ms: int = 20):
+        self.bitrate = bitrate # bps
+        self.frame_ms = frame_ms
+
+    def supports(self, audio_format: PcmFormat) -> bool:
+        return super().supports(audio_format) and audio_format.sample_rate in self.SAMPLE_RATES and audio_format.channels in (1, 2)
+
+    def stream(self, audio_format: PcmFormat) -> CodecStream:
+        return _OpusStream(audio_format, self.bitrate, self.frame_ms)
+
+register_codec(MuLawCodec())
+register_codec(ImaAdpcmCodec())
+if lameenc is not None:
+    register_codec(Mp3Codec())
+if opuslib is not None:
+    register_codec(OpusCodec())
@@ -1,19 +1,16 @@
-import base64
-import threading
-import time
-import dashscope  # DashScope Python SDK 版本需要不低于1.23.9
-import queue
 import asyncio
+import logging
 
-from dashscope.audio.qwen_tts_realtime import QwenTtsRealtime, QwenTtsRealtimeCallback, AudioFormat
 from ..abstract_tts import AbstractTTS
-from typing import Literal, AsyncGenerator, List
+from .session_pool import URL, SessionPool, get_session_pool
+from typing import Literal, AsyncGenerator
 
 PCM_Format = Literal['pcm']
 
-URL = "wss://dashscope.aliyuncs.com/api-ws/v1/realtime"
 DEFAULT_TARGET_MODEL = "qwen3-tts-vc-realtime-2025-11-27"
 
+logger = logging.getLogger(__name__)
+
 def is_nonsense(text: str):
     """
     Check if the text is nonsense
@@ -25,167 +22,83 @@ def is_nonsense(text: str):
 class DashscopeTTS(AbstractTTS):
     """
     Dashscope TTS
+
+    Sentences are synthesized on warm realtime sessions taken from a `SessionPool`
+    (shared by all instances with the same `url` unless `pool` is given).
+
+    Every request has its own session and audio channel, so one instance can synthesize several
+    sentences in parallel (at most `max_concurrency`, further requests wait).
     """
 
-    def __init__(self, api_key: str, voice: str, model: str = DEFAULT_TARGET_MODEL):
+    def __init__(self, api_key: str, voice: str, model: str = DEFAULT_TARGET_MODEL, url: str = URL, pool: SessionPool = None,
+                 chunk_timeout: float = 30.0, max_concurrency: int = 4):
         super().__init__(format='pcm', sample_rate=24000, channels=1, bits_per_sample=16)
         
         self.api_key = api_key
         self.voice = voice
         self.model = model
-        self.audio_queue = queue.Queue()
-        self.complete_event = threading.Event()
-        self.error_event = threading.Event()
-        self.error_message = None
-        self._callback = None
-        self._qwen_tts_realtime = None
-        
-    class AsyncCallback(QwenTtsRealtimeCallback):
-        def __init__(self, audio_queue: queue.Queue, complete_event: threading.Event, 
-                    error_event: threading.Event, error_message: List):
-            self.audio_queue = audio_queue
-            self.complete_event = complete_event
-            self.error_event = error_event
-            self.error_message = error_message
-            
-        def on_open(self) -> None:
-            print('[TTS] 连接已建立')
-            
-        def on_close(self, close_status_code, close_msg) -> None:
-            print(f'[TTS] 连接关闭 code={close_status_code}, msg={close_msg}')
-            if close_status_code != 1000:  # 非正常关闭
-                self.error_message.append(f"连接关闭: code={close_status_code}, msg={close_msg}")
-                self.error_event.set()
-            self.complete_event.set()
-            
-        def on_event(self, response: dict) -> None:
-            try:
-                event_type = response.get('type', '')
-                if event_type == 'session.created':
-                    print(f'[TTS] 会话开始: {response["session"]["id"]}')
-                elif event_type == 'response.audio.delta':
-                    audio_data = base64.b64decode(response['delta'])
-                    self.audio_queue.put(audio_data)
-                elif event_type == 'response.done':
-                    print(f'[TTS] 响应完成')
-                elif event_type == 'session.finished':
-                    print('[TTS] 会话结束')
-                    self.complete_event.set()
-            except Exception as e:
-                print(f'[Error] 处理回调事件异常: {e}')
-                self.error_message.append(str(e))
-                self.error_event.set()
-                self.complete_event.set()
+        self.pool = pool or get_session_pool(url)
+        self.chunk_timeout = chunk_timeout # 等待下一段音频的最长时间 (秒)
+        self.max_concurrency = max_concurrency
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    def cache_identity(self) -> dict:
+        return {"tts": "dashscope", "model": self.model, "voice": self.voice}
+
+    async def prewarm(self, count: int = 1):
+        """
+        提前建立 realtime 会话，避免第一句话等待握手
+        """
+        await self.pool.prewarm(self.api_key, self.model, self.voice, count)
     
-    async def synthesize_stream(self, text: str, chunk_delay: float = 0.1) -> AsyncGenerator[bytes, None]:
+    async def synthesize_stream(self, text: str, chunk_delay: float = None) -> AsyncGenerator[bytes, None]:
         """
         生成语音数据的异步生成器
         
         Args:
             text: 要合成的文本
-            chunk_delay: 发送文本块之间的延迟（秒）
+            chunk_delay: 已废弃, 会被忽略 (文本一次性发送到预热的会话, 不再分块等待)
             
         Yields:
             bytes: PCM音频数据块
         """
-        # 初始化dashscope
-        dashscope.api_key = self.api_key
-        
-        # 清空状态
-        self.audio_queue = queue.Queue()
-        self.complete_event = threading.Event()
-        self.error_event = threading.Event()
-        self.error_message = []
-        
-        # 创建回调
-        self._callback = self.AsyncCallback(
-            self.audio_queue, 
-            self.complete_event, 
-            self.error_event, 
-            self.error_message
-        )
-        
-        # 创建TTS实时实例
-        self._qwen_tts_realtime = QwenTtsRealtime(
-            model=self.model,
-            callback=self._callback,
-            url=URL
-        )
-        
-        # 连接并设置参数
-        self._qwen_tts_realtime.connect()
-        self._qwen_tts_realtime.update_session(
-            voice=self.voice,
-            response_format=AudioFormat.PCM_24000HZ_MONO_16BIT,
-            mode='server_commit'
-        )
-        
         # 检查文本是否为空
         if is_nonsense(text):
-            print(f'[Warning] 文本为空或仅包含标点符号: {text}')
-            self.complete_event.set()
+            logger.warning(f'文本为空或仅包含标点符号: {text!r}')
             yield b''
             return
-        
-        # 启动后台线程发送文本
-        def send_texts():
+
+        async with self._slots:
+            # 本次请求独占的会话与音频通道
+            session = await self.pool.acquire(self.api_key, self.model, self.voice)
+            reusable = False # 出错或被取消 (仍有音频在途) 的会话不放回池中
             try:
-                print(f'[发送文本]: {text}')
-                self._qwen_tts_realtime.append_text(text)
-                time.sleep(chunk_delay)
-                self._qwen_tts_realtime.finish()
-            except Exception as e:
-                print(f'[Error] 发送文本异常: {e}')
-                self.error_message.append(str(e))
-                self.error_event.set()
-                self.complete_event.set()
-        
-        send_thread = threading.Thread(target=send_texts, daemon=True)
-        send_thread.start()
-        
-        # 异步生成音频数据
-        try:
-            while not self.complete_event.is_set():
-                try:
-                    # 非阻塞获取音频数据
-                    audio_data = self.audio_queue.get(timeout=0.1)
-                    yield audio_data
-                except queue.Empty:
-                    # 检查是否出错
-                    if self.error_event.is_set():
-                        raise Exception(f"TTS合成出错: {self.error_message}")
-                    # 继续等待
-                    await asyncio.sleep(0.01)
-                except Exception as e:
-                    print(f'[Error] 获取音频数据异常: {e}')
-                    break
-            
-            # 处理队列中剩余的数据
-            while not self.audio_queue.empty():
-                try:
-                    audio_data = self.audio_queue.get_nowait()
+                logger.debug(f'[发送文本]: {text}')
+                channel = session.begin_response()
+                await asyncio.to_thread(session.send_text, text)
+
+                # 音频由 SDK 线程通过 call_soon_threadsafe 送入事件循环, 等待时不阻塞事件循环
+                while (audio_data := await asyncio.wait_for(channel.get(), self.chunk_timeout)) is not None:
                     yield audio_data
-                except queue.Empty:
-                    break
-            
-        finally:
-            # 清理资源
-            if self._qwen_tts_realtime:
-                self._qwen_tts_realtime.close()
+
+                if channel.error_message:
+                    raise Exception(f"TTS合成出错: {channel.error_message}")
+                reusable = True
+            finally:
+                self.pool.release(session, reusable)
             
-    async def synthesize(self, text: str, chunk_delay: float = 0.1) -> bytes:
+    async def synthesize(self, text: str, chunk_delay: float = None) -> bytes:
         """
         生成完整的音频数据
         
         Args:
             text: 要合成的文本
-            chunk_delay: 发送文本块之间的延迟（秒）
+            chunk_delay: 已废弃, 会被忽略
             
         Returns:
             bytes: 完整的PCM音频数据
         """
         audio_chunks = []
-        async for chunk in self.synthesize_stream(text, chunk_delay):
+        async for chunk in self.synthesize_stream(text):
             audio_chunks.append(chunk)
         return b''.join(audio_chunks)
-
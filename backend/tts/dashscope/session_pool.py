@@ -0,0 +1,283 @@
+"""
+DashScope realtime TTS 会话池
+
+每句话新建 `QwenTtsRealtime` 需要一次完整的 WebSocket 握手和会话配置。会话池按 (api_key, model, voice)
+保留已连接、已配置好的会话 (commit 模式)，后续句子直接在长连接上合成。
+
+- 取出会话时检查健康状态 (连接仍然打开、未超过 `max_session_age`)，不健康的会话被关闭并替换
+- 空闲超过 `idle_timeout` 的会话被关闭 (后台任务定期清理)
+- 合成出错或被取消的会话不会放回池中
+"""
+from typing import Optional
+from collections import deque
+
+import asyncio
+import base64
+import logging
+import threading
+import time
+
+# DashScope Python SDK 版本需要不低于1.23.9
+from dashscope.audio.qwen_tts_realtime import QwenTtsRealtime, QwenTtsRealtimeCallback, AudioFormat
+
+logger = logging.getLogger(__name__)
+
+URL = "wss://dashscope.aliyuncs.com/api-ws/v1/realtime"
+
+SessionKey = tuple[str, str, str] # (api_key, model, voice)
+
+class AudioChannel:
+    """
+    把 SDK WebSocket 线程收到的音频交给事件循环 (`call_soon_threadsafe` -> `asyncio.Queue`)
+
+    `put` / `finish` 可在任意线程调用; `get` / `wait_done` 在创建它的事件循环中 await，不会阻塞事件循环。
+    """
+
+    def __init__(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue[Optional[bytes]] = asyncio.Queue()
+        self._done = asyncio.Event()
+        self.error_message: list[str] = []
+
+    def _call(self, func, *args):
+        try:
+            self._loop.call_soon_threadsafe(func, *args)
+        except RuntimeError: # 事件循环已关闭
+            pass
+
+    def put(self, audio: bytes):
+        self._call(self._queue.put_nowait, audio)
+
+    def finish(self, error: Optional[str] = None):
+        """结束 (可附带错误信息); 只有第一次调用生效"""
+        if error is not None:
+            self.error_message.append(error)
+        self._call(self._finish)
+
+    def _finish(self):
+        if not self._done.is_set():
+            self._done.set()
+            self._queue.put_nowait(None)
+
+    async def get(self) -> Optional[bytes]:
+        """下一段音频; 结束后返回 None"""
+        return await self._queue.get()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    async def wait_done(self):
+        await self._done.wait()
+
+class RealtimeSession:
+    """
+    一个已配置好 voice 的 realtime 会话 (commit 模式: 每次 append_text + commit 生成一个 response)
+
+    `open` / `send_text` / `close` 会阻塞 (网络 I/O)，应在线程中调用。
+    """
+
+    def __init__(self, api_key: str, model: str, voice: str, url: str = URL):
+        self.api_key = api_key
+        self.model = model
+        self.voice = voice
+        self.url = url
+
+        # 当前 response 的音频 (由 SDK 的 WebSocket 线程写入)
+        self.channel: Optional[AudioChannel] = None
+
+        self.closed = threading.Event()
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.responses = 0
+
+        self._realtime: Optional[QwenTtsRealtime] = None
+
+    @property
+    def key(self) -> SessionKey:
+        return (self.api_key, self.model, self.voice)
+
+    class Callback(QwenTtsRealtimeCallback):
+        def __init__(self, session: 'RealtimeSession'):
+            self.session = session
+
+        def on_close(self, close_status_code, close_msg) -> None:
+            session = self.session
+            logger.debug(f"[TTS] 会话连接关闭 code={close_status_code}, msg={close_msg}")
+            session.closed.set()
+            if session.channel is not None:
+                error = None if close_status_code in (None, 1000) else f"连接关闭: code={close_status_code}, msg={close_msg}"
+                session.channel.finish(error)
+
+        def on_event(self, response: dict) -> None:
+            session = self.session
+            event_type = response.get('type', '')
+            if event_type == 'session.created':
+                logger.debug(f"[TTS] 会话开始: {response['session']['id']}")
+            elif session.channel is None:
+                return
+            elif event_type == 'response.audio.delta':
+                session.channel.put(base64.b64decode(response['delta']))
+            elif event_type == 'response.done':
+                session.channel.finish()
+            elif event_type == 'error':
+                session.channel.finish(str(response.get('error', response)))
+
+    def open(self):
+        """连接并配置会话"""
+        self._realtime = QwenTtsRealtime(model=self.model, callback=self.Callback(self), url=self.url)
+        # QwenTtsRealtime 默认使用全局的 dashscope.api_key; 多个会话可能在不同线程中同时建立, 不修改全局变量
+        self._realtime.apikey = self.api_key
+        self._realtime.connect()
+        self._realtime.update_session(
+            voice=self.voice,
+            response_format=AudioFormat.PCM_24000HZ_MONO_16BIT,
+            mode='commit'
+        )
+        if self.closed.is_set(): # 连接期间已被关闭 (例如 acquire 被取消)
+            self._realtime.close()
+
+    def begin_response(self) -> AudioChannel:
+        """为下一个 response 创建音频通道 (在事件循环中调用)"""
+        self.channel = AudioChannel()
+        return self.channel
+
+    def send_text(self, text: str):
+        """提交一段文本开始合成 (阻塞)"""
+        self.responses += 1
+        self._realtime.append_text(text)
+        self._realtime.commit()
+
+    @property
+    def connected(self) -> bool:
+        ws = self._realtime.ws if self._realtime is not None else None
+        return not self.closed.is_set() and ws is not None and ws.sock is not None and ws.sock.connected
+
+    def close(self):
+        self.closed.set()
+        if self._realtime is not None and self._realtime.ws is not None:
+            try:
+                self._realtime.close()
+            except Exception as e:
+                logger.debug(f"[TTS] 关闭会话异常: {e!r}")
+
+class SessionPool:
+    """
+    按 (api_key, model, voice) 复用 `RealtimeSession`
+
+    Usage:
+        ```
+        session = await pool.acquire(api_key, model, voice)
+        try:
+            channel = session.begin_response()
+            await asyncio.to_thread(session.send_text, text)
+            while (audio := await channel.get()) is not None: ...
+        finally:
+            pool.release(session, reusable=ok)
+        ```
+    """
+
+    def __init__(self, url: str = URL, max_idle_sessions: int = 4, idle_timeout: float = 60.0,
+                 max_session_age: float = 600.0):
+        """
+        Args:
+            url (str): realtime WebSocket 地址
+            max_idle_sessions (int): 每个 (api_key, model, voice) 最多保留的空闲会话数 (0: 不复用)
+            idle_timeout (float): 空闲超过该时长 (秒) 的会话被关闭
+            max_session_age (float): 建立超过该时长 (秒) 的会话不再复用 (避免被服务器端超时断开)
+        """
+        self.url = url
+        self.max_idle_sessions = max_idle_sessions
+        self.idle_timeout = idle_timeout
+        self.max_session_age = max_session_age
+
+        self.idle: dict[SessionKey, deque[RealtimeSession]] = {}
+        self.stats = {"created": 0, "reused": 0, "evicted": 0, "unhealthy": 0, "discarded": 0}
+        self._janitor: Optional[asyncio.Task] = None
+
+    def healthy(self, session: RealtimeSession) -> bool:
+        now = time.monotonic()
+        return (session.connected
+                and now - session.created_at < self.max_session_age
+                and now - session.last_used < self.idle_timeout)
+
+    async def acquire(self, api_key: str, model: str, voice: str) -> RealtimeSession:
+        """取出一个空闲的健康会话，没有则新建"""
+        idle = self.idle.get((api_key, model, voice))
+        while idle:
+            session = idle.pop() # 最近使用的会话
+            if self.healthy(session):
+                self.stats["reused"] += 1
+                return session
+            self.stats["unhealthy"] += 1
+            self._close(session)
+
+        session = RealtimeSession(api_key, model, voice, self.url)
+        try:
+            await asyncio.to_thread(session.open)
+        except BaseException:
+            self._close(session)
+            raise
+        self.stats["created"] += 1
+        return session
+
+    def release(self, session: RealtimeSession, reusable: bool = True):
+        """归还会话; 出错或被取消的会话 (`reusable=False`) 直接关闭"""
+        session.last_used = time.monotonic()
+        session.channel = None
+        idle = self.idle.setdefault(session.key, deque())
+        if not reusable or not self.healthy(session) or len(idle) >= self.max_idle_sessions:
+            self.stats["discarded"] += 1
+            self._close(session)
+            return
+
+        idle.append(session)
+        if self._janitor is None or self._janitor.done():
+            self._janitor = asyncio.create_task(self._evict_loop())
+
+    async def prewarm(self, api_key: str, model: str, voice: str, count: int = 1):
+        """提前建立会话 (例如在智能体启动时)"""
+        sessions = await asyncio.gather(*(self.acquire(api_key, model, voice) for _ in range(count)))
+        for session in sessions:
+            self.release(session)
+
+    def evict_idle(self):
+        """关闭空闲过久或已断开的会话"""
+        for key, idle in list(self.idle.items()):
+            for session in [s for s in idle if not self.healthy(s)]:
+                idle.remove(session)
+                self.stats["evicted"] += 1
+                self._close(session)
+            if not idle:
+                del self.idle[key]
+
+    async def _evict_loop(self):
+        while self.idle:
+            await asyncio.sleep(self.idle_timeout / 2)
+            self.evict_idle()
+
+    def _close(self, session: RealtimeSession):
+        # close 会发送关闭帧 (阻塞)，放到线程中
+        try:
+            asyncio.get_running_loop().run_in_executor(None, session.close)
+        except RuntimeError: # 没有运行中的事件循环
+            session.close()
+
+    def close(self):
+        """关闭所有空闲会话"""
+        if self._janitor is not None:
+            self._janitor.cancel()
+            self._janitor = None
+        for idle in self.idle.values():
+            for session in idle:
+                self._close(session)
+        self.idle.clear()
+
+_shared_pools: dict[str, SessionPool] = {}
+
+def get_session_pool(url: str = URL) -> SessionPool:
+    """同一地址的 DashscopeTTS 实例共享的会话池"""
+    pool = _shared_pools.get(url)
+    if pool is None:
+        pool = _shared_pools[url] = SessionPool(url)
+    return pool
@@ -1,24 +1,78 @@
 from ..abstract_tts import AbstractTTS
-from .functional_api import define_speaker, get_tts_wav
-from uuid import uuid4 as uuid
+from .functional_api import LEAD_SILENCE_MS, TRAIL_SILENCE_MS, REFERENCE_CACHE_DIR
+from .worker_pool import GenieWorkerPool, WorkerMode
+from .tuning import PROFILES, ProfileName, INT8_DIR
+from typing import AsyncGenerator, Literal, Optional
+import hashlib
+import json
+import os
 
 class GenieTTS(AbstractTTS):
-    def __init__(self, onnx_model_dir: str, language: str, ref_audio_path: str, ref_audio_text: str, ref_audio_language: str):
+    """
+    Genie TTS
+
+    Inference runs in a `GenieWorkerPool` (the Genie thread, or `workers` processes with
+    `worker_mode="process"`), never on the event loop.
+
+    `synthesize_stream` yields one WAV per clause as Genie finishes it.
+
+    Instances with the same speaker config share one loaded speaker per process. Each worker loads it
+    with the reference features cached on disk (`reference_cache`) and synthesizes `warmup_text` once.
+
+    `inference_profile` tunes the ONNX Runtime sessions for CPU ("latency": one sentence as fast as
+    possible, "throughput": process workers pinned to disjoint cores), `model_variant="int8"` loads the
+    quantized models created by `tts/genie/quantize.py`.
+    """
+
+    def __init__(self, onnx_model_dir: str, language: str, ref_audio_path: str, ref_audio_text: str, ref_audio_language: str,
+                 workers: int = 1, worker_mode: WorkerMode = "thread", lead_silence_ms: int = LEAD_SILENCE_MS, trail_silence_ms: int = TRAIL_SILENCE_MS,
+                 warmup_text: Optional[str] = "你好。", reference_cache: bool = True, reference_cache_dir: Optional[str] = None,
+                 inference_profile: ProfileName = "default", intra_op_threads: Optional[int] = None, model_variant: Literal["fp32", "int8"] = "fp32"):
         super().__init__(format="wav")
 
-        self.speaker_name = str(uuid())
+        if inference_profile not in PROFILES:
+            raise ValueError(f"Unknown Genie inference profile: {inference_profile}")
+        if model_variant == "int8": # created by tts/genie/quantize.py
+            onnx_model_dir = os.path.join(onnx_model_dir, INT8_DIR)
+
+        self.speaker_config = {
+            "onnx_model_dir": onnx_model_dir,
+            "language": language,
+            "ref_audio_path": ref_audio_path,
+            "ref_audio_text": ref_audio_text,
+            "ref_audio_language": ref_audio_language,
+        }
+        # same config -> same speaker name -> loaded once per process
+        self.speaker_name = "genie-" + hashlib.sha256(json.dumps(self.speaker_config, sort_keys=True).encode()).hexdigest()[:16]
 
-        define_speaker(
-            self.speaker_name,
-            onnx_model_dir,
-            language,
-            ref_audio_path,
-            ref_audio_text,
-            ref_audio_language,
-        )
+        # leading / trailing silence of every sentence is cut or padded to these lengths
+        self.audio_options = {"lead_silence_ms": lead_silence_ms, "trail_silence_ms": trail_silence_ms}
 
-    def synthesize(self, text: str) -> bytes:
-        return get_tts_wav(text, self.speaker_name)
+        preload_options = {
+            "warmup_text": warmup_text,
+            "reference_cache_dir": (reference_cache_dir or REFERENCE_CACHE_DIR) if reference_cache else None,
+            "inference_profile": inference_profile,
+            "intra_op_threads": intra_op_threads,
+        }
+
+        # the speaker is loaded by the workers (the calling thread does not wait for it)
+        self.pool = GenieWorkerPool(self.speaker_name, self.speaker_config, workers, worker_mode, self.audio_options, preload_options)
+
+    def cache_identity(self) -> dict:
+        return {"tts": "genie", **self.speaker_config, **self.audio_options}
+
+    async def prewarm(self):
+        """
+        Wait until every worker has loaded (and warmed up) the speaker
+        """
+        await self.pool.prewarm()
+
+    async def synthesize(self, text: str) -> bytes:
+        return await self.pool.synthesize(text)
     
-    def synthesize_stream(self, text: str):
-        raise NotImplementedError('GenieTTS does not support streaming synthesis!')
+    async def synthesize_stream(self, text: str) -> AsyncGenerator[bytes, None]:
+        async for chunk in self.pool.synthesize_stream(text):
+            yield chunk
+
+    def close(self):
+        self.pool.close()
@@ -1,10 +1,12 @@
 import sys
 import os
-import io
-import wave
-import numpy as np
+import time
+import asyncio
+import logging
+from typing import AsyncGenerator, Optional
 # from .tts import *
 from config_types import TTS_Config
+from ..postprocess import AudioBuffer, StreamingSilence
 
 
 curr_dir = os.path.dirname(os.path.abspath(__file__))
@@ -14,6 +16,12 @@ sys.path.insert(0, os.path.join(curr_dir, "Genie-TTS", "src")) # use local Genie
 os.environ['HF_ENDPOINT'] = 'https://hf-mirror.com'
 os.environ["GENIE_DATA_DIR"] = os.path.join(curr_dir, "pretrained", "GenieData")
 import genie_tts as genie
+from .reference_cache import ReferenceCache, reference_key
+from .tuning import PROFILES, apply_profile
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_CACHE_DIR = os.path.join(curr_dir, "pretrained", "reference_cache")
 
 def is_nonsense(text: str):
     """
@@ -39,7 +47,61 @@ def define_speaker(name: str, onnx_model_dir: str, language: str, ref_audio_path
         language=ref_audio_language
     )
 
-async def get_tts_wav(text: str, speaker_name: str) -> bytes:
+def preload_speaker(name: str, speaker_config: dict, warmup_text: Optional[str] = None, reference_cache_dir: Optional[str] = None,
+                    inference_profile: str = "default", intra_op_threads: Optional[int] = None):
+    """
+    Define a speaker, reusing reference features cached in `reference_cache_dir`, and run a warm-up synthesis
+    (the first inference of a session is much slower). Blocking; runs in a Genie worker.
+
+    The speaker's ONNX sessions are created with `inference_profile` (see tuning.py).
+    """
+    start = time.perf_counter()
+    apply_profile(PROFILES[inference_profile], intra_op_threads)
+    cache = ReferenceCache(reference_cache_dir) if reference_cache_dir else None
+    key = reference_key(**speaker_config) if cache else None
+    cached = cache is not None and cache.load(key, speaker_config["ref_audio_path"], speaker_config["ref_audio_text"])
+
+    define_speaker(name, **speaker_config)
+    loaded = time.perf_counter()
+
+    if warmup_text:
+        asyncio.run(get_tts_wav(warmup_text, name))
+    if cache is not None and not cached:
+        # 预热之后保存, 以包含首次推理时才计算的说话人特征
+        cache.save(key, speaker_config["ref_audio_path"])
+
+    logger.info(f"Genie speaker {name} loaded in {loaded - start:.2f}s (reference features {'from cache' if cached else 'computed'})"
+                + (f", warm-up {time.perf_counter() - loaded:.2f}s" if warmup_text else ""))
+
+SAMPLE_RATE = 32000 # 32kHz
+LEAD_SILENCE_MS = 50 # 句首静音长度（毫秒）
+TRAIL_SILENCE_MS = 200 # 句尾静音长度（毫秒）
+
+async def stream_tts_wav(text: str, speaker_name: str, lead_silence_ms: int = LEAD_SILENCE_MS, trail_silence_ms: int = TRAIL_SILENCE_MS) -> AsyncGenerator[bytes, None]:
+    """
+    Generate TTS audio for the given text, speaker name, yielding one WAV per chunk as Genie produces it
+
+    The text is split into clauses so that Genie synthesizes (and yields) them one by one; only the
+    leading silence and the trailing silence of the last chunks are held back and normalized.
+    """
+    if is_nonsense(text):
+        return
+
+    iterator = genie.tts_async(
+        character_name=speaker_name,
+        text=text,
+        play=False, # 不允许播放
+        split_sentence=True, # 逐个分句合成, 每个分句完成后立即产出音频
+    )
+
+    silence = StreamingSilence(SAMPLE_RATE, lead_silence_ms=lead_silence_ms, trail_silence_ms=trail_silence_ms)
+    async for chunk in iterator:
+        wav = silence.push(chunk)
+        if wav is not None:
+            yield wav
+    yield silence.finish()
+
+async def get_tts_wav(text: str, speaker_name: str, lead_silence_ms: int = LEAD_SILENCE_MS, trail_silence_ms: int = TRAIL_SILENCE_MS) -> bytes:
     """
     Generate TTS wav data for the given text, speaker name
     """
@@ -59,7 +121,7 @@ async def get_tts_wav(text: str, speaker_name: str) -> bytes:
     #     wav_data = f.read()
     # return wav_data
 
-    # async (Genie / GPT-SoVITS does not support streaming! This is actually fake streaming.)
+    # async (collects every chunk; see stream_tts_wav for streaming)
     iterator = genie.tts_async(
         character_name=speaker_name,
         text=text,
@@ -68,58 +130,10 @@ async def get_tts_wav(text: str, speaker_name: str) -> bytes:
         # save_path=None
     )
 
-    audio_chunks = []
+    # 音频块只复制一次 (进入 AudioBuffer), 静音规整与 WAV 文件头都在原缓冲区上完成
+    audio = AudioBuffer(SAMPLE_RATE, lead_silence_ms=lead_silence_ms, trail_silence_ms=trail_silence_ms)
     async for chunk in iterator:
-        audio_chunk = np.frombuffer(chunk, dtype=np.int16)
-        audio_chunks.append(audio_chunk)
-
-    combined_audio = np.concatenate(audio_chunks)
-
-    sample_rate = 32000 # 32kHz
-    target_silence_ms = 200 # 目标静音长度（毫秒）
-
-    # 保证固定的静音时长
-    if not audio_chunks:
-        target_samples = int(sample_rate * target_silence_ms / 1000)
-        final_audio = np.zeros(target_samples, dtype=np.int16)
-    else:
-        combined_audio = np.concatenate(audio_chunks)
-        
-        # 从后向前找到第一个非零值（简单静音检测）
-        # 找到绝对值大于10的最后一个样本的位置
-        non_silent_indices = np.where(np.abs(combined_audio) > 10)[0]
-        
-        if len(non_silent_indices) == 0:
-            # 整个音频都是静音
-            audio_end = 0
-        else:
-            audio_end = non_silent_indices[-1] + 1  # 最后一个有声音的索引+1
-        
-        # 计算需要添加的静音
-        target_samples = int(sample_rate * target_silence_ms / 1000)
-        current_samples_after_end = len(combined_audio) - audio_end
-        
-        if current_samples_after_end >= target_samples:
-            # 如果已有足够静音，截取到音频结束+目标静音长度
-            final_audio = combined_audio[:audio_end + target_samples]
-        else:
-            # 如果静音不足，添加静音
-            samples_to_add = target_samples - current_samples_after_end
-            silence_to_add = np.zeros(samples_to_add, dtype=np.int16)
-            final_audio = np.concatenate([combined_audio[:audio_end + current_samples_after_end], silence_to_add])
-    
+        audio.append(chunk)
+    audio.normalize_silence()
 
-    # 2. 创建WAV文件二进制数据
-    # 使用BytesIO作为内存文件
-    wav_bytesio = io.BytesIO()
-    
-    with wave.open(wav_bytesio, 'wb') as wav_file:
-        # 设置WAV参数
-        wav_file.setnchannels(1)  # 单声道
-        wav_file.setsampwidth(2)   # 16位 = 2字节
-        wav_file.setframerate(sample_rate)
-        wav_file.writeframes(final_audio.tobytes())
-
-    wav_bytesio = wav_bytesio.getvalue()
-    
-    return wav_bytesio
+    return audio.to_wav()
@@ -0,0 +1,92 @@
+"""
+Create an int8-quantized variant of a Genie ONNX model directory (for `model_variant="int8"`)
+
+The fp16 / fp32 external weights are merged into each model, the MatMul weights are quantized
+(ONNX Runtime dynamic quantization) and the self-contained models are written to `<model_dir>/int8`
+under the original file names. Genie still checks for the weight files, so empty placeholders are
+created for them (the quantized models do not reference them).
+
+Usage:
+    uv run tts/genie/quantize.py <onnx_model_dir> [--vits]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy as np
+import onnx
+from onnxruntime.quantization import QuantType, quantize_dynamic
+
+INT8_DIR = "int8" # = tuning.INT8_DIR (this script runs standalone)
+
+# model file -> fp16 weight file (as genie_tts.ModelManager), None: weights in <model>.bin (fp32)
+T2S_MODELS = {
+    "t2s_encoder_fp32.onnx": None,
+    "t2s_first_stage_decoder_fp32.onnx": "t2s_shared_fp16.bin",
+    "t2s_stage_decoder_fp32.onnx": "t2s_shared_fp16.bin",
+}
+VITS_MODELS = {
+    "vits_fp32.onnx": "vits_fp16.bin",
+}
+COPIED_MODELS = { # not quantized, but their weights are merged so the int8 directory is self-contained
+    "vits_fp32.onnx": "vits_fp16.bin",
+    "prompt_encoder_fp32.onnx": "prompt_encoder_fp16.bin",
+}
+WEIGHT_FILES = ["t2s_encoder_fp32.bin", "t2s_shared_fp16.bin", "vits_fp16.bin", "prompt_encoder_fp16.bin"]
+
+def load_merged(model_dir: str, model_file: str, fp16_weights: str = None) -> onnx.ModelProto:
+    """
+    Load a model with its external weights inlined (fp16 weights converted to fp32)
+    """
+    path = os.path.join(model_dir, model_file)
+    if fp16_weights is None:
+        return onnx.load(path, load_external_data=True)
+
+    model = onnx.load(path, load_external_data=False)
+    weights = np.fromfile(os.path.join(model_dir, fp16_weights), dtype=np.float16).astype(np.float32).tobytes()
+    for tensor in model.graph.initializer:
+        if tensor.data_location != onnx.TensorProto.EXTERNAL:
+            continue
+        info = {entry.key: entry.value for entry in tensor.external_data}
+        offset, length = int(info.get("offset", 0)), int(info.get("length", 0))
+        tensor.raw_data = weights[offset:offset + length]
+        del tensor.external_data[:]
+        tensor.data_location = onnx.TensorProto.DEFAULT
+    return model
+
+def quantize_model_dir(model_dir: str, quantize_vits: bool = False) -> str:
+    output_dir = os.path.join(model_dir, INT8_DIR)
+    os.makedirs(output_dir, exist_ok=True)
+
+    to_quantize = {**T2S_MODELS, **(VITS_MODELS if quantize_vits else {})}
+    to_copy = {name: weights for name, weights in COPIED_MODELS.items() if name not in to_quantize}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for model_file, fp16_weights in to_quantize.items():
+            print(f"quantizing {model_file}...")
+            merged_path = os.path.join(tmp_dir, model_file)
+            onnx.save(load_merged(model_dir, model_file, fp16_weights), merged_path)
+            quantize_dynamic(merged_path, os.path.join(output_dir, model_file),
+                             op_types_to_quantize=["MatMul"], weight_type=QuantType.QInt8)
+
+    for model_file, fp16_weights in to_copy.items():
+        if os.path.exists(os.path.join(model_dir, model_file)):
+            print(f"copying {model_file}...")
+            onnx.save(load_merged(model_dir, model_file, fp16_weights), os.path.join(output_dir, model_file))
+
+    for weight_file in WEIGHT_FILES:
+        if os.path.exists(os.path.join(model_dir, weight_file)):
+            open(os.path.join(output_dir, weight_file), "wb").close()
+
+    return output_dir
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("model_dir", help="Genie ONNX model directory")
+    parser.add_argument("--vits", action="store_true", help="also quantize the VITS vocoder (smaller speed-up, may cost quality)")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.model_dir):
+        sys.exit(f"not a directory: {args.model_dir}")
+    print(f"int8 model written to {quantize_model_dir(args.model_dir, args.vits)}")
@@ -0,0 +1,121 @@
+"""
+On-disk cache of Genie reference audio features
+"""
+from typing import Optional
+from collections.abc import MutableMapping
+
+import hashlib
+import importlib.metadata
+import json
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    from genie_tts.Audio.ReferenceAudio import ReferenceAudio
+except ImportError: # a Genie-TTS version without this module: features are always computed
+    ReferenceAudio = None
+
+def _genie_version() -> Optional[str]:
+    try:
+        return importlib.metadata.version("genie-tts")
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+# Cached features are only reused by the Genie-TTS version that computed them (part of `reference_key`)
+GENIE_VERSION = _genie_version()
+
+# ReferenceAudio attributes computed from the reference audio / text (CN-HuBERT, BERT, speaker embeddings)
+FEATURES = ("audio_32k", "audio_16k", "ssl_content", "phonemes_seq", "text_bert", "global_emb", "global_emb_advanced")
+
+def reference_key(onnx_model_dir: str, ref_audio_path: str, ref_audio_text: str, ref_audio_language: str, language: str) -> str:
+    """
+    Hash of the Genie-TTS version, of the model directory (path, file sizes and modification times)
+    and of the reference audio content
+    """
+    model_dir = os.path.abspath(onnx_model_dir)
+    model_files = sorted(
+        (entry.name, entry.stat().st_size, entry.stat().st_mtime_ns)
+        for entry in os.scandir(model_dir) if entry.is_file()
+    ) if os.path.isdir(model_dir) else []
+    digest = hashlib.sha256()
+    digest.update(json.dumps([GENIE_VERSION, model_dir, model_files, ref_audio_text, ref_audio_language, language], ensure_ascii=False).encode())
+    with open(ref_audio_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ReferenceCache:
+    """
+    One `<key>.npz` per reference (see `reference_key`), holding the `FEATURES` of Genie's `ReferenceAudio`.
+
+    `load` puts the cached features into Genie's in-memory reference cache before `set_reference_audio`,
+    so the reference audio is neither decoded nor run through CN-HuBERT again; `save` writes them after
+    they were computed (after a warm-up synthesis they include the speaker embeddings).
+
+    Both rely on a private attribute of `ReferenceAudio` (`_prompt_cache`). If it is missing, or the
+    Genie-TTS version is unknown, the cache is disabled and Genie loads the reference audio as usual.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def _prompt_cache(self) -> Optional[MutableMapping]:
+        """Genie's in-memory reference cache, or None when it cannot be used safely"""
+        if ReferenceAudio is None:
+            return None
+        prompt_cache = getattr(ReferenceAudio, "_prompt_cache", None)
+        if GENIE_VERSION is None or not isinstance(prompt_cache, MutableMapping):
+            logger.warning(f"Genie reference cache disabled: unsupported Genie-TTS ({GENIE_VERSION or 'unknown version'}, "
+                           f"ReferenceAudio._prompt_cache {'missing' if prompt_cache is None else type(prompt_cache).__name__})")
+            return None
+        return prompt_cache
+
+    def load(self, key: str, ref_audio_path: str, ref_audio_text: str) -> bool:
+        prompt_cache = self._prompt_cache()
+        if prompt_cache is None:
+            return False
+        if ref_audio_path in prompt_cache: # already in memory (e.g. another speaker of this process)
+            return False
+        try:
+            with np.load(self._path(key), allow_pickle=False) as data:
+                features = {name: data[name] for name in data.files}
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable Genie reference cache {self._path(key)}: {e!r}")
+            return False
+
+        # ReferenceAudio 以音频路径为键缓存实例, 注入后 set_reference_audio / tts_async 直接复用
+        try:
+            reference = object.__new__(ReferenceAudio)
+            reference.text = ref_audio_text
+            for name in FEATURES:
+                setattr(reference, name, features.get(name))
+            reference._initialized = True
+        except Exception as e:
+            logger.warning(f"Cannot restore Genie reference features, computing them: {e!r}")
+            return False
+        prompt_cache[ref_audio_path] = reference
+        return True
+
+    def save(self, key: str, ref_audio_path: str) -> bool:
+        prompt_cache = self._prompt_cache()
+        if prompt_cache is None:
+            return False
+        reference = prompt_cache.get(ref_audio_path)
+        if reference is None or not all(hasattr(reference, name) for name in FEATURES):
+            return False
+
+        features = {name: value for name in FEATURES if (value := getattr(reference, name)) is not None}
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self._path(key)}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, **features)
+        os.replace(tmp_path, self._path(key)) # atomic: other workers never read a partial file
+        return True
@@ -0,0 +1,109 @@
+"""
+ONNX Runtime CPU tuning profiles for Genie inference
+"""
+from typing import Literal, NamedTuple, Optional
+
+import importlib
+import logging
+import os
+
+import onnxruntime
+
+logger = logging.getLogger(__name__)
+
+ProfileName = Literal["default", "latency", "throughput"]
+
+INT8_DIR = "int8" # model_variant="int8": quantized models in this subdirectory of the model directory (see quantize.py)
+
+class InferenceProfile(NamedTuple):
+    intra_op_threads: Optional[int] = None # None: the cores this worker may run on
+    inter_op_threads: int = 1
+    execution_mode: Literal["sequential", "parallel"] = "sequential"
+    graph_optimization: Literal["disable", "basic", "extended", "all"] = "all"
+    cpu_mem_arena: bool = True
+    allow_spinning: bool = True # intra-op threads busy-wait between ops (lower latency, burns idle CPU)
+    pin_workers: bool = False # process mode: pin every worker process to its own share of the cores
+
+PROFILES: dict[str, Optional[InferenceProfile]] = {
+    "default": None, # Genie's own session options (graph optimization only, ONNX Runtime's thread defaults)
+    # one sentence as fast as possible: every core for the worker, spinning threads
+    "latency": InferenceProfile(),
+    # many sentences in parallel (worker_mode="process"): disjoint core sets, no spinning
+    "throughput": InferenceProfile(allow_spinning=False, pin_workers=True),
+}
+
+_EXECUTION_MODES = {
+    "sequential": onnxruntime.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": onnxruntime.ExecutionMode.ORT_PARALLEL,
+}
+_GRAPH_OPTIMIZATION = {
+    "disable": onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+def available_cores() -> list[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def pin_worker(index: int, workers: int) -> list[int]:
+    """
+    Pin this process to the `index`-th of `workers` equal shares of the available cores; returns the share
+    """
+    cores = available_cores()
+    per_worker = max(1, len(cores) // workers)
+    start = (index % max(1, len(cores) // per_worker)) * per_worker
+    share = cores[start:start + per_worker]
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, share)
+    else:
+        logger.warning("Pinning Genie workers to cores is not supported on this platform")
+    return share
+
+def configure(options: onnxruntime.SessionOptions, profile: InferenceProfile, intra_op_threads: Optional[int] = None) -> onnxruntime.SessionOptions:
+    options.intra_op_num_threads = intra_op_threads or profile.intra_op_threads or len(available_cores())
+    options.inter_op_num_threads = profile.inter_op_threads
+    options.execution_mode = _EXECUTION_MODES[profile.execution_mode]
+    options.graph_optimization_level = _GRAPH_OPTIMIZATION[profile.graph_optimization]
+    options.enable_cpu_mem_arena = profile.cpu_mem_arena
+    options.add_session_config_entry("session.intra_op.allow_spinning", "1" if profile.allow_spinning else "0")
+    return options
+
+class _TunedOnnxRuntime:
+    """
+    Stands in for the `onnxruntime` module inside Genie's model manager, which builds its own session
+    options for every model: the profile is applied to them when the session is created.
+    """
+
+    def __init__(self, profile: InferenceProfile, intra_op_threads: Optional[int]):
+        self.profile = profile
+        self.intra_op_threads = intra_op_threads
+
+    def InferenceSession(self, *args, sess_options=None, **kwargs) -> onnxruntime.InferenceSession:
+        options = configure(sess_options or onnxruntime.SessionOptions(), self.profile, self.intra_op_threads)
+        return onnxruntime.InferenceSession(*args, sess_options=options, **kwargs)
+
+    def __getattr__(self, name: str):
+        return getattr(onnxruntime, name)
+
+def apply_profile(profile: Optional[InferenceProfile], intra_op_threads: Optional[int] = None):
+    """
+    Use `profile` for the ONNX sessions of the Genie models loaded from now on in this process
+    (None: Genie's own options)
+    """
+    try:
+        model_manager_module = importlib.import_module("genie_tts.ModelManager")
+    except ImportError:
+        logger.warning("This Genie-TTS version has no genie_tts.ModelManager, ignoring the inference profile")
+        return
+
+    if profile is None and intra_op_threads is None:
+        model_manager_module.onnxruntime = onnxruntime
+        model_manager_module.InferenceSession = onnxruntime.InferenceSession
+        return
+
+    tuned = _TunedOnnxRuntime(profile or InferenceProfile(), intra_op_threads)
+    model_manager_module.onnxruntime = tuned
+    model_manager_module.InferenceSession = tuned.InferenceSession
@@ -0,0 +1,190 @@
+"""
+Runs Genie inference off the event loop
+"""
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from queue import Empty
+from typing import AsyncGenerator, Callable, Literal, Optional
+
+import asyncio
+import logging
+import multiprocessing
+import threading
+
+from .functional_api import preload_speaker, get_tts_wav, stream_tts_wav
+from .tuning import PROFILES, pin_worker
+
+logger = logging.getLogger(__name__)
+
+WorkerMode = Literal["thread", "process"]
+
+# (speaker name, speaker config, preload options), see preload_speaker
+Speaker = tuple[str, dict, dict]
+
+# how long a wait for the next streamed chunk of a worker process lasts before checking that the worker is still running
+POLL_INTERVAL = 0.5
+
+# speakers already defined in this process (a worker process, or the agent process in thread mode);
+# GenieTTS instances with the same config share one loaded speaker
+_speakers: set[str] = set()
+
+def _load_speaker(speaker: Speaker):
+    speaker_name, speaker_config, preload_options = speaker
+    if speaker_name not in _speakers:
+        preload_speaker(speaker_name, speaker_config, **preload_options)
+        _speakers.add(speaker_name)
+
+def _init_worker(speaker: Speaker, pin_index, workers: int):
+    """Process worker initializer: pin to a share of the cores (if `pin_index`, a shared counter), then load the speaker"""
+    if pin_index is not None:
+        with pin_index.get_lock():
+            index = pin_index.value
+            pin_index.value += 1
+        cores = pin_worker(index, workers)
+        logger.info(f"Genie worker {index} pinned to cores {cores}")
+    _load_speaker(speaker)
+
+def _synthesize(speaker: Speaker, audio_options: dict, text: str) -> bytes:
+    _load_speaker(speaker) # no-op once the speaker is preloaded
+    # tts_async 需要一个事件循环: 在工作线程 / 进程中单独运行, 推理与 NumPy 后处理都不占用 agent 的事件循环
+    return asyncio.run(get_tts_wav(text, speaker[0], **audio_options))
+
+def _synthesize_stream(speaker: Speaker, audio_options: dict, text: str, sink: Callable[[Optional[bytes]], None]):
+    """Passes every WAV chunk to `sink` as soon as it is produced, then None (also on error)"""
+    async def stream():
+        async for chunk in stream_tts_wav(text, speaker[0], **audio_options):
+            sink(chunk)
+
+    try:
+        _load_speaker(speaker)
+        asyncio.run(stream())
+    finally:
+        sink(None)
+
+async def _receive_chunks(queue, future: asyncio.Future) -> AsyncGenerator[bytes, None]:
+    """
+    Chunks put into a manager queue by `_synthesize_stream` in a worker process, until its None
+
+    A worker process that dies mid-sentence (e.g. out of memory) never sends the None: the queue is
+    polled, and once `future` is done without one, the worker's error is raised.
+    """
+    while True:
+        try:
+            chunk = await asyncio.to_thread(queue.get, True, POLL_INTERVAL)
+        except Empty:
+            if not future.done():
+                continue
+            try: # the worker has stopped: what it sent before is already in the queue
+                chunk = queue.get_nowait()
+            except Empty:
+                await future # e.g. BrokenProcessPool
+                raise RuntimeError("Genie worker stopped without ending the stream")
+        if chunk is None:
+            return
+        yield chunk
+
+_thread_executor: Optional[ThreadPoolExecutor] = None
+_thread_executor_lock = threading.Lock()
+
+def _get_thread_executor() -> ThreadPoolExecutor:
+    """
+    The single Genie thread of this process.
+
+    genie_tts keeps one global player and model manager per process, so syntheses of all speakers
+    in a process must run one at a time.
+    """
+    global _thread_executor
+    with _thread_executor_lock:
+        if _thread_executor is None:
+            _thread_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="genie")
+        return _thread_executor
+
+class GenieWorkerPool:
+    """
+    Synthesizes sentences of one speaker in a thread or in worker processes.
+
+    mode="thread": the speaker is loaded and synthesized on the single Genie thread of this process
+        (`workers` must be 1). Frees the event loop, but sentences still run one at a time.
+    mode="process": `workers` processes (spawn start method), each loading (and warming up) the speaker
+        once in its initializer; up to `workers` sentences are synthesized in parallel.
+
+    `preload_options` are passed to `preload_speaker` (warm-up text, reference cache directory),
+    `audio_options` to `get_tts_wav` / `stream_tts_wav` (silence lengths).
+    """
+
+    def __init__(self, speaker_name: str, speaker_config: dict, workers: int = 1, mode: WorkerMode = "thread",
+                 audio_options: Optional[dict] = None, preload_options: Optional[dict] = None):
+        if workers < 1:
+            raise ValueError(f"workers must be >= 1, got {workers}")
+        self.speaker_name = speaker_name
+        self.speaker_config = speaker_config
+        self.speaker: Speaker = (speaker_name, speaker_config, preload_options or {})
+        self.audio_options = audio_options or {}
+        self.mode = mode
+
+        if mode == "thread":
+            if workers != 1:
+                logger.warning(f"Genie thread mode synthesizes one sentence at a time per process, ignoring workers={workers} (use worker_mode='process')")
+            self.workers = 1
+            self.executor: Executor = _get_thread_executor()
+            # 模型在 Genie 线程中加载, 不阻塞构造者; 加载失败时在第一次合成时重新抛出
+            self.executor.submit(_load_speaker, self.speaker)
+        elif mode == "process":
+            self.workers = workers
+            context = multiprocessing.get_context("spawn") # fork 不能安全复制 ONNX 线程与事件循环
+            self._manager = context.Manager() # its queues carry streamed chunks between processes
+            profile = PROFILES[self.speaker[2].get("inference_profile", "default")]
+            pin_index = context.Value("i", 0) if profile is not None and profile.pin_workers else None
+            self.executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self.speaker, pin_index, workers),
+            )
+        else:
+            raise ValueError(f"Unknown Genie worker mode: {mode}")
+
+    async def synthesize(self, text: str) -> bytes:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, _synthesize, self.speaker, self.audio_options, text)
+
+    async def synthesize_stream(self, text: str) -> AsyncGenerator[bytes, None]:
+        """
+        WAV chunks of `text` as the worker produces them
+
+        A stream abandoned by the consumer still finishes in its worker (Genie cannot stop a sentence
+        midway); its remaining chunks are discarded.
+        """
+        loop = asyncio.get_running_loop()
+        if self.mode == "thread":
+            queue: asyncio.Queue[Optional[bytes]] = asyncio.Queue()
+            sink = lambda chunk: loop.call_soon_threadsafe(queue.put_nowait, chunk)
+        else:
+            queue = self._manager.Queue()
+            sink = queue.put
+
+        future = loop.run_in_executor(self.executor, _synthesize_stream, self.speaker, self.audio_options, text, sink)
+        if self.mode == "thread":
+            while (chunk := await queue.get()) is not None:
+                yield chunk
+        else:
+            async for chunk in _receive_chunks(queue, future):
+                yield chunk
+        await future # raises the worker's error, if any
+
+    async def prewarm(self):
+        """
+        Start every worker and wait until the speaker is loaded in each
+        """
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(self.executor, _load_speaker, self.speaker)
+            for _ in range(self.workers)
+        ))
+
+    def close(self):
+        """
+        Stop the worker processes (the shared Genie thread of thread mode keeps running)
+        """
+        if self.mode == "process":
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self._manager.shutdown()
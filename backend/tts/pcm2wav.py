@@ -1,28 +1,28 @@
 import struct
 
-def pcm2wav(pcm_data: bytes, 
-               sample_rate: int = 24000, 
-               channels: int = 1, 
-               bits_per_sample: int = 16) -> bytes:
+WAV_HEADER = struct.Struct('<4sI4s4sIHHIIHH4sI')
+WAV_HEADER_SIZE = WAV_HEADER.size # 44
+
+def pack_wav_header_into(buffer, offset: int, data_size: int,
+                         sample_rate: int = 24000,
+                         channels: int = 1,
+                         bits_per_sample: int = 16):
     """
-    将PCM数据转换为WAV格式
+    将WAV文件头写入 buffer 的 offset 处 (占 WAV_HEADER_SIZE 字节)
     
     Args:
-        pcm_data: 原始PCM数据
+        buffer: 可写的缓冲区 (bytearray / memoryview)
+        offset: 写入位置
+        data_size: PCM数据长度
         sample_rate: 采样率
         channels: 声道数
         bits_per_sample: 位深度
-        
-    Returns:
-        bytes: WAV格式音频数据
     """
-    data_size = len(pcm_data)
     byte_rate = sample_rate * channels * (bits_per_sample // 8)
     block_align = channels * (bits_per_sample // 8)
     
-    # 创建WAV文件头
-    header = struct.pack(
-        '<4sI4s4sIHHIIHH4sI',
+    WAV_HEADER.pack_into(
+        buffer, offset,
         b'RIFF',                     # 文件标识
         36 + data_size,              # 文件总长度减去8字节
         b'WAVE',                     # 格式标识
@@ -37,5 +37,25 @@ def pcm2wav(pcm_data: bytes,
         b'data',                     # 数据标识
         data_size                    # 数据长度
     )
+
+def pcm2wav(pcm_data: bytes, 
+               sample_rate: int = 24000, 
+               channels: int = 1, 
+               bits_per_sample: int = 16) -> bytes:
+    """
+    将PCM数据转换为WAV格式
+    
+    Args:
+        pcm_data: 原始PCM数据
+        sample_rate: 采样率
+        channels: 声道数
+        bits_per_sample: 位深度
+        
+    Returns:
+        bytes: WAV格式音频数据
+    """
+    # 创建WAV文件头
+    header = bytearray(WAV_HEADER_SIZE)
+    pack_wav_header_into(header, 0, len(pcm_data), sample_rate, channels, bits_per_sample)
     
-    return header + pcm_data
+    return bytes(header) + pcm_data
@@ -0,0 +1,184 @@
+"""
+Post-processing of 16-bit PCM audio: leading / trailing silence normalization and WAV assembly
+
+Silence is found by scanning blockwise from the clip edges only (the middle of a clip is never read),
+with preallocated scratch masks. `AudioBuffer` normalizes a whole clip in place and writes the WAV
+header into reserved room in front of the samples; `StreamingSilence` does the same for audio that
+arrives in chunks, holding back only the silence that may turn out to be leading or trailing.
+"""
+from typing import Optional
+
+import numpy as np
+
+from .pcm2wav import WAV_HEADER_SIZE, pack_wav_header_into
+
+SCAN_BLOCK = 2048 # samples checked at a time when looking for the first / last loud sample
+SILENCE_THRESHOLD = 10 # samples with an absolute value up to this are silence
+
+class EdgeScanner:
+    """Finds the first / last loud sample of int16 audio, scanning from the respective edge"""
+
+    def __init__(self, threshold: int = SILENCE_THRESHOLD, block: int = SCAN_BLOCK):
+        self.threshold = threshold
+        self.block = block
+        self._loud = np.empty(block, dtype=bool)
+        self._negative = np.empty(block, dtype=bool)
+
+    def _mask(self, samples: np.ndarray) -> np.ndarray:
+        loud, negative = self._loud[:len(samples)], self._negative[:len(samples)]
+        # |x| > threshold without np.abs (which allocates, and overflows for -32768)
+        np.greater(samples, self.threshold, out=loud)
+        np.less(samples, -self.threshold, out=negative)
+        np.logical_or(loud, negative, out=loud)
+        return loud
+
+    def first_loud(self, samples: np.ndarray) -> int:
+        """Index of the first loud sample, `len(samples)` if there is none"""
+        for start in range(0, len(samples), self.block):
+            mask = self._mask(samples[start:start + self.block])
+            if mask.any():
+                return start + int(mask.argmax())
+        return len(samples)
+
+    def end_of_loud(self, samples: np.ndarray) -> int:
+        """Index after the last loud sample, 0 if there is none"""
+        for end in range(len(samples), 0, -self.block):
+            mask = self._mask(samples[max(0, end - self.block):end])
+            if mask.any():
+                return end - int(mask[::-1].argmax())
+        return 0
+
+class AudioBuffer:
+    """
+    Growable int16 PCM buffer with room in front for a WAV header and leading silence padding.
+
+    Chunks are copied in once (`append`, preallocate with `capacity` bytes); `normalize_silence` keeps
+    at most `lead_silence_ms` / `trail_silence_ms` of the existing silence around the loud part and
+    zero pads it up to these lengths, by moving the window over the buffer (no sample is copied);
+    `to_wav` writes the header in front of the window and returns the buffer itself.
+    """
+
+    def __init__(self, sample_rate: int, channels: int = 1, lead_silence_ms: int = 50, trail_silence_ms: int = 200,
+                 threshold: int = SILENCE_THRESHOLD, capacity: int = 0):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.lead_samples = int(sample_rate * lead_silence_ms / 1000) * channels
+        self.trail_samples = int(sample_rate * trail_silence_ms / 1000) * channels
+        self.scanner = EdgeScanner(threshold)
+
+        self.data = bytearray(WAV_HEADER_SIZE + 2 * self.lead_samples + capacity)
+        self.start = self.end = WAV_HEADER_SIZE + 2 * self.lead_samples # window of samples (byte offsets)
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def append(self, pcm):
+        self.data[self.end:self.end + len(pcm)] = pcm # grows the bytearray past its capacity
+        self.end += len(pcm)
+
+    def samples(self) -> np.ndarray:
+        """int16 view of the window (release it before the next `append`: a view pins the buffer size)"""
+        return np.frombuffer(self.data, dtype=np.int16, count=len(self) // 2, offset=self.start)
+
+    def normalize_silence(self):
+        samples = self.samples()
+        first = self.scanner.first_loud(samples)
+        if first == len(samples): # 整段静音: 只保留句尾静音
+            first = end_of_loud = 0
+        else:
+            end_of_loud = self.scanner.end_of_loud(samples)
+            first -= first % self.channels
+            end_of_loud += -end_of_loud % self.channels
+        trail = min(len(samples) - end_of_loud, self.trail_samples) # 保留的原有句尾静音
+        del samples
+
+        lead = min(first, self.lead_samples) if end_of_loud else 0 # 保留的原有句首静音
+        lead_pad = self.lead_samples - lead if end_of_loud else 0
+        end = self.start + 2 * (end_of_loud + trail)
+        self.start += 2 * (first - lead)
+        self._zero(self.start - 2 * lead_pad, self.start)
+        self.start -= 2 * lead_pad
+
+        trail_pad = self.trail_samples - trail
+        if len(self.data) < end + 2 * trail_pad:
+            self.data.extend(bytes(end + 2 * trail_pad - len(self.data)))
+        self._zero(end, end + 2 * trail_pad)
+        self.end = end + 2 * trail_pad
+
+    def _zero(self, start: int, end: int):
+        if end > start:
+            np.frombuffer(self.data, dtype=np.uint8, count=end - start, offset=start).fill(0)
+
+    def to_wav(self) -> bytearray:
+        """
+        WAV file of the window. Returns the buffer itself (trimmed in place), which must not be used afterwards
+        """
+        pack_wav_header_into(self.data, self.start - WAV_HEADER_SIZE, len(self), self.sample_rate, self.channels)
+        del self.data[self.end:]
+        del self.data[:self.start - WAV_HEADER_SIZE] # O(1) in CPython (moves the start of the bytearray)
+        return self.data
+
+class StreamingSilence:
+    """
+    `AudioBuffer.normalize_silence` for audio that arrives in chunks, producing the same samples.
+
+    `push` returns a WAV of everything that is known to be neither leading nor trailing silence (or
+    None): leading silence is held back until the first loud sample, and after that the silence
+    following the last loud sample. `finish` returns the WAV of the held-back trailing silence, cut
+    or zero padded to `trail_silence_ms`.
+    """
+
+    def __init__(self, sample_rate: int, channels: int = 1, lead_silence_ms: int = 50, trail_silence_ms: int = 200,
+                 threshold: int = SILENCE_THRESHOLD):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.lead_samples = int(sample_rate * lead_silence_ms / 1000) * channels
+        self.trail_samples = int(sample_rate * trail_silence_ms / 1000) * channels
+        self.scanner = EdgeScanner(threshold)
+        self.started = False # a loud sample has been seen
+        self.held = bytearray() # silence that may still be leading / trailing
+
+    def push(self, pcm) -> Optional[bytearray]:
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        view = memoryview(pcm).cast("B")
+        if not self.started:
+            first = self.scanner.first_loud(samples)
+            if first == len(samples):
+                self.held += view
+                return None
+            self.started = True
+            first -= first % self.channels
+            leading = len(self.held) // 2 + first
+            lead = min(leading, self.lead_samples)
+            end_of_loud = self.scanner.end_of_loud(samples)
+            end_of_loud += -end_of_loud % self.channels
+            # 原有句首静音的最后 lead 个样本 (可能一部分在 held 中)
+            from_chunk = min(lead, first)
+            from_held = lead - from_chunk
+            parts = [self.held[len(self.held) - 2 * from_held:], view[2 * (first - from_chunk):2 * end_of_loud]]
+            wav = self._wav(parts, 2 * (self.lead_samples - lead), 0)
+        else:
+            end_of_loud = self.scanner.end_of_loud(samples)
+            if end_of_loud == 0:
+                self.held += view
+                return None
+            end_of_loud += -end_of_loud % self.channels
+            wav = self._wav([self.held, view[:2 * end_of_loud]], 0, 0)
+        self.held = bytearray(view[2 * end_of_loud:])
+        return wav
+
+    def finish(self) -> bytearray:
+        trail = self.held[:2 * self.trail_samples]
+        self.held = bytearray()
+        self.started = False
+        return self._wav([trail], 0, 2 * self.trail_samples - len(trail))
+
+    def _wav(self, parts: list, lead_pad: int, trail_pad: int) -> bytearray:
+        size = lead_pad + sum(len(part) for part in parts) + trail_pad
+        wav = bytearray(WAV_HEADER_SIZE + size) # zero filled: the padding needs no writes
+        pack_wav_header_into(wav, 0, size, self.sample_rate, self.channels)
+        offset = WAV_HEADER_SIZE + lead_pad
+        for part in parts:
+            wav[offset:offset + len(part)] = part
+            offset += len(part)
+        return wav
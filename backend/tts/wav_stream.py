@@ -0,0 +1,123 @@
+"""
+Framing of streamed TTS audio for `say_aloud` events: one WAV header per utterance, then raw PCM
+(or, for frontends that cannot decode raw PCM, a complete WAV per event)
+"""
+from typing import Literal, NamedTuple, Optional, Sequence, Union
+
+import struct
+
+from .pcm2wav import WAV_HEADER_SIZE, pack_wav_header_into
+
+BytesLike = Union[bytes, bytearray, memoryview]
+# payload of one `say_aloud` event: parts sent back to back (see `ws_protocol.encode_frame_into`)
+AudioFrame = tuple[BytesLike, ...]
+
+_UINT32 = struct.Struct("<I")
+_RIFF_SIZE_OFFSET = 4
+_BYTE_RATE_OFFSET = 28
+_FMT = struct.Struct("<HHIIHH") # format tag, channels, sample rate, byte rate, block align, bits per sample
+
+class PcmFormat(NamedTuple):
+    sample_rate: int
+    channels: int
+    bits_per_sample: int
+
+def _find_chunk(wav: BytesLike, wanted: bytes) -> int:
+    """Offset of the body of the first `wanted` chunk of a WAV file"""
+    offset = 12 # after "RIFF" <size> "WAVE"
+    while offset + 8 <= len(wav):
+        chunk_id = bytes(wav[offset:offset + 4])
+        (chunk_size,) = _UINT32.unpack_from(wav, offset + 4)
+        if chunk_id == wanted:
+            return offset + 8
+        offset += 8 + chunk_size + (chunk_size & 1)
+    raise ValueError(f"WAV audio has no {wanted.decode().strip()} chunk")
+
+def wav_data_offset(wav: BytesLike) -> int:
+    """
+    Offset of the samples in a PCM WAV file (after the `data` chunk header)
+    """
+    return _find_chunk(wav, b"data")
+
+def wav_format(wav: BytesLike) -> PcmFormat:
+    """
+    Sample format of a PCM WAV file (from its `fmt ` chunk)
+    """
+    _, channels, sample_rate, _, _, bits_per_sample = _FMT.unpack_from(wav, _find_chunk(wav, b"fmt "))
+    return PcmFormat(sample_rate, channels, bits_per_sample)
+
+class WavStreamEncoder:
+    """
+    Turns the audio of each utterance into `say_aloud` payloads without joining or re-encoding it.
+
+    The audio comes in frames of one or more chunks (see `tts.coalesce`). The first frame of an
+    utterance is sent as a WAV file ("wav"): the header is precomputed once per stream format (for
+    WAV sources, e.g. Genie's clauses, taken from the first chunk), only its two size fields are filled
+    in per utterance, and it travels as a separate part in front of the untouched chunks. All further
+    frames of the utterance are raw PCM continuation frames ("pcm", same format as the WAV header
+    before them); for WAV sources these are views of the chunks behind their own headers. Without
+    `pcm_continuation` (some frontend does not decode "pcm"), every frame is a complete WAV instead.
+    """
+
+    def __init__(self, source_format: Literal["pcm", "wav"], sample_rate: int = 24000, channels: int = 1, bits_per_sample: int = 16):
+        if source_format not in ("pcm", "wav"):
+            raise ValueError(f"Cannot stream {source_format} audio as WAV + PCM")
+        self.source_format = source_format
+        self.format = PcmFormat(sample_rate, channels, bits_per_sample)
+        self.byte_rate = sample_rate * channels * (bits_per_sample // 8)
+        self._header = bytearray(WAV_HEADER_SIZE)
+        pack_wav_header_into(self._header, 0, 0, sample_rate, channels, bits_per_sample)
+
+    @classmethod
+    def for_tts(cls, tts) -> Optional["WavStreamEncoder"]:
+        """Encoder for the audio of an `AbstractTTS` (None if its format cannot be streamed this way)"""
+        if tts.format == "pcm":
+            return cls("pcm", tts.sample_rate, tts.channels, tts.bits_per_sample)
+        if tts.format == "wav":
+            return cls("wav")
+        return None
+
+    def chunk_byte_rate(self, chunk: BytesLike) -> int:
+        """Bytes per second of the audio in `chunk`"""
+        if self.source_format == "wav":
+            return _UINT32.unpack_from(chunk, _BYTE_RATE_OFFSET)[0]
+        return self.byte_rate
+
+    def chunk_format(self, chunk: BytesLike) -> PcmFormat:
+        """Sample format of the audio in `chunk`"""
+        if self.source_format == "wav":
+            return wav_format(chunk)
+        return self.format
+
+    def samples(self, chunks: Sequence[BytesLike]) -> AudioFrame:
+        """The raw PCM of a frame of chunks (views behind the headers of WAV chunks, nothing is copied)"""
+        if self.source_format == "wav":
+            return tuple(memoryview(chunk)[wav_data_offset(chunk):] for chunk in chunks)
+        return tuple(chunks)
+
+    def header(self, data_size: int, template: BytesLike = None) -> bytearray:
+        """WAV header for `data_size` bytes of samples (a copy of `template`, e.g. a WAV chunk's own header)"""
+        header = bytearray(self._header if template is None else template) # per utterance; events may be buffered, so never reused
+        _UINT32.pack_into(header, _RIFF_SIZE_OFFSET, len(header) - 8 + data_size)
+        _UINT32.pack_into(header, len(header) - 4, data_size)
+        return header
+
+    def encode(self, chunks: Sequence[BytesLike], first: bool, pcm_continuation: bool = False) -> tuple[str, AudioFrame]:
+        """
+        (format, payload parts) of a frame of chunks; `first` starts a new utterance, `pcm_continuation`
+        allows raw PCM ("pcm") for the frames after the first
+        """
+        header_needed = first or not pcm_continuation
+        if self.source_format == "wav":
+            if header_needed and len(chunks) == 1:
+                return "wav", (chunks[0],) # already a complete WAV
+            offsets = [wav_data_offset(chunk) for chunk in chunks]
+            samples = tuple(memoryview(chunk)[offset:] for chunk, offset in zip(chunks, offsets))
+            if not header_needed:
+                return "pcm", samples
+            header = self.header(sum(len(part) for part in samples), memoryview(chunks[0])[:offsets[0]])
+            return "wav", (header, *samples)
+
+        if not header_needed:
+            return "pcm", tuple(chunks)
+        return "wav", (self.header(sum(len(chunk) for chunk in chunks)), *chunks)
@@ -0,0 +1,13 @@
+"""
+WebSocket message protocol shared by the server, agents and frontends
+"""
+from .binary_frame import (
+    BINARY_FRAMES_CAPABILITY,
+    encode_frame,
+    encode_frame_into,
+    decode_frame,
+    peek_header,
+    frame_to_json_message,
+)
+from .envelope import peek_type, extract_event_data, make_event_envelope
+from . import json_codec
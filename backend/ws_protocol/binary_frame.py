@@ -0,0 +1,110 @@
+"""
+Binary frame protocol
+
+Large payloads (e.g. the audio of a `say_aloud` event) are sent as WebSocket binary messages
+instead of base64 strings inside JSON. One binary message carries exactly one frame:
+
+    +-----------------------------+---------------------------+----------------------+
+    | header length (uint32, BE)  | header (utf-8 JSON)       | payload (raw bytes)  |
+    +-----------------------------+---------------------------+----------------------+
+
+The header is the same envelope a JSON text message would use (e.g. `{"type": "event", "data": {...}}`),
+minus the payload field. The payload field name is kept in `header["payload_key"]` so that a
+binary frame can be converted back to a legacy JSON message for peers that did not negotiate
+binary frames.
+"""
+from typing import Sequence, Union
+
+import base64
+import struct
+
+from .json_codec import dumps, loads
+
+# capability name advertised / requested during connection negotiation
+BINARY_FRAMES_CAPABILITY = "binary_frames"
+
+DEFAULT_PAYLOAD_KEY = "media_data"
+
+_HEADER_LEN = struct.Struct(">I")
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+def encode_frame(header: dict, payload: BytesLike = b"", payload_key: str = DEFAULT_PAYLOAD_KEY) -> bytes:
+    """
+    Pack a header dict and a raw payload into one binary frame.
+
+    Args:
+        header (dict): JSON-serializable envelope, e.g. `{"type": "event", "data": {...}}`.
+        payload (bytes-like): Raw payload bytes (not base64 encoded).
+        payload_key (str): Name of the field the payload replaces in `header["data"]`.
+
+    Returns:
+        bytes: The encoded frame.
+    """
+    header = {**header, "payload_key": payload_key}
+    header_bytes = dumps(header).encode("utf-8")
+    return b"".join((_HEADER_LEN.pack(len(header_bytes)), header_bytes, payload))
+
+def encode_frame_into(buffer: bytearray, header: dict, payload_parts: Sequence[BytesLike] = (),
+                      payload_key: str = DEFAULT_PAYLOAD_KEY) -> memoryview:
+    """
+    Pack a header dict and a payload given in parts into `buffer`, reusing its memory.
+
+    The buffer only grows (call it with the same bytearray for every frame of a stream), and the parts
+    are copied straight into it, so e.g. a WAV header and the PCM data behind it need no join first.
+
+    Returns:
+        memoryview: The encoded frame (a view of `buffer`; release it before the next call).
+    """
+    header = {**header, "payload_key": payload_key}
+    header_bytes = dumps(header).encode("utf-8")
+    end = _HEADER_LEN.size + len(header_bytes) + sum(len(part) for part in payload_parts)
+    if len(buffer) < end:
+        buffer.extend(bytes(end - len(buffer)))
+
+    _HEADER_LEN.pack_into(buffer, 0, len(header_bytes))
+    offset = _HEADER_LEN.size
+    with memoryview(buffer) as view: # bytearray slice assignment would copy each part to a temporary first
+        for part in (header_bytes, *payload_parts):
+            view[offset:offset + len(part)] = part
+            offset += len(part)
+    return memoryview(buffer)[:end]
+
+def _header_end(frame: BytesLike) -> int:
+    if len(frame) < _HEADER_LEN.size:
+        raise ValueError("binary frame too short")
+    (header_len,) = _HEADER_LEN.unpack_from(frame, 0)
+    end = _HEADER_LEN.size + header_len
+    if end > len(frame):
+        raise ValueError("binary frame header length exceeds frame size")
+    return end
+
+def peek_header(frame: BytesLike) -> dict:
+    """
+    Decode only the JSON header of a frame, leaving the payload untouched.
+    """
+    end = _header_end(frame)
+    return loads(memoryview(frame)[_HEADER_LEN.size:end])
+
+def decode_frame(frame: BytesLike) -> tuple[dict, memoryview]:
+    """
+    Decode a binary frame.
+
+    Returns:
+        tuple[dict, memoryview]: The header and a zero-copy view of the payload.
+    """
+    end = _header_end(frame)
+    view = memoryview(frame)
+    header = loads(view[_HEADER_LEN.size:end])
+    return header, view[end:]
+
+def frame_to_json_message(frame: BytesLike) -> dict:
+    """
+    Convert a binary frame to the legacy JSON message (payload base64 encoded into `data[payload_key]`).
+    """
+    header, payload = decode_frame(frame)
+    payload_key = header.pop("payload_key", DEFAULT_PAYLOAD_KEY)
+    data = header.get("data")
+    if isinstance(data, dict):
+        data[payload_key] = base64.b64encode(payload).decode("utf-8")
+    return header
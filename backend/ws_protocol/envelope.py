@@ -0,0 +1,67 @@
+"""
+Zero-copy helpers for relaying JSON text messages
+
+The relay server only needs the message `type` to route a message, so these helpers read it
+with an anchored regex over the first few bytes, and cut out the raw `data` value of an event
+so that it is embedded into the envelope as is, without building Python objects for it and
+serializing them again.
+
+The fast path relies on the layout produced by `Agent.emit`: `{"type": ..., "data": ...}` with
+`type` as the first key and `data` as the last key. Messages with any other layout, or that are
+not valid JSON, are not matched, and the caller should fall back to a full decode.
+"""
+from typing import Optional
+import json
+import re
+
+from .json_codec import dumps
+
+_TYPE_FIELD = re.compile(r'\s*\{\s*"type"\s*:\s*"([A-Za-z0-9_\-]*)"')
+_EVENT_PREFIX = re.compile(r'\s*\{\s*"type"\s*:\s*"event"\s*,\s*"data"\s*:\s*')
+_OBJECT_END = re.compile(r'\s*\}\s*$')
+_SCANNER = json.JSONDecoder()
+
+def peek_type(message: str) -> Optional[str]:
+    """
+    Read the `type` field of a JSON object message without decoding it.
+
+    Returns:
+        str | None: The type, or None if `type` is not the first key of the message.
+    """
+    match = _TYPE_FIELD.match(message)
+    return match.group(1) if match else None
+
+def extract_event_data(message: str) -> Optional[str]:
+    """
+    Cut the raw JSON text of `data` out of a `{"type": "event", "data": ...}` message.
+
+    The `data` value is validated by scanning it (`JSONDecoder.raw_decode`, which also gives
+    where it ends); only the closing brace of the message may follow it.
+
+    Returns:
+        str | None: The raw `data` value, or None if the message does not have this layout
+        (other keys after `data`) or is not valid JSON.
+    """
+    match = _EVENT_PREFIX.match(message)
+    if not match:
+        return None
+    try:
+        _, end = _SCANNER.raw_decode(message, match.end())
+    except ValueError:
+        return None
+    if not _OBJECT_END.match(message, end):
+        return None
+    return message[match.end():end]
+
+def make_event_envelope(time_iso: str, data: Optional[str] = None, data_obj=None) -> str:
+    """
+    Build the `{"time": ..., "data": ...}` envelope sent to the receivers of an event.
+
+    Args:
+        time_iso (str): Timestamp of the event.
+        data (str, optional): Raw JSON text of the event data (as returned by `extract_event_data`), embedded as is.
+        data_obj (optional): Event data object, serialized when `data` is not given.
+    """
+    if data is None:
+        data = dumps(data_obj)
+    return '{"time": "' + time_iso + '", "data": ' + data + '}'
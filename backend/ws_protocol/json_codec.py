@@ -0,0 +1,30 @@
+"""
+JSON codec
+
+Uses `orjson` when it is installed (several times faster for large messages), otherwise the standard `json` module.
+Both `dumps` and `loads` behave like their `json` counterparts (`dumps` returns str, non-ASCII characters are kept as is).
+"""
+from typing import Any, Union
+
+try:
+    import orjson
+
+    def dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+
+    def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+        return orjson.loads(data)
+
+    CODEC_NAME = "orjson"
+except ImportError:
+    import json
+
+    def dumps(obj: Any) -> str:
+        return json.dumps(obj, ensure_ascii=False)
+
+    def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        return json.loads(data)
+
+    CODEC_NAME = "json"
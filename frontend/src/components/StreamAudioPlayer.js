@@ -1,4 +1,49 @@
+// G.711 μ-law -> [-1, 1)
+const MULAW_TABLE = (() => {
+  const table = new Float32Array(256);
+  for (let i = 0; i < 256; i++) {
+    const code = ~i & 0xFF;
+    const magnitude = ((((code & 0x0F) << 3) + 0x84) << ((code >> 4) & 0x07)) - 0x84;
+    table[i] = (code & 0x80 ? -magnitude : magnitude) / 32768;
+  }
+  return table;
+})();
+
+// IMA ADPCM
+const IMA_STEPS = [
+  7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45,
+  50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209, 230, 253, 279, 307,
+  337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876, 963, 1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066,
+  2272, 2499, 2749, 3024, 3327, 3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442, 11487, 12635, 13899,
+  15289, 16818, 18500, 20350, 22385, 24623, 27086, 29794, 32767,
+];
+const IMA_INDEX = [-1, -1, -1, -1, 2, 4, 6, 8, -1, -1, -1, -1, 2, 4, 6, 8];
+
+// mp3 / opus: 解码器输出不足时, 最多等这么久再 flush
+const PACKET_DECODE_TIMEOUT_MS = 100;
+
 export default class StreamAudioPlayer {
+  /**
+   * 本浏览器能解码的 say_aloud 音频格式 (wav / pcm 续帧 / mulaw / ima_adpcm 总是支持, mp3 / opus 需要 WebCodecs)
+   */
+  static async supportedFormats() {
+    const formats = ['wav', 'pcm', 'mulaw', 'ima_adpcm'];
+    if (typeof AudioDecoder === 'undefined') {
+      return formats;
+    }
+    for (const codec of ['mp3', 'opus']) {
+      try {
+        const { supported } = await AudioDecoder.isConfigSupported({ codec, sampleRate: 48000, numberOfChannels: 1 });
+        if (supported) {
+          formats.push(codec);
+        }
+      } catch (error) {
+        console.warn(`Audio codec ${codec} is not supported:`, error);
+      }
+    }
+    return formats;
+  }
+
   constructor() {
     this.audioContext = null;
     this.sourceNode = null;
@@ -8,10 +53,16 @@ export default class StreamAudioPlayer {
     this.bufferPosition = 0;
     this.expectedSampleRate = 24000; // 常见TTS采样率
     this.numChannels = 1; // 默认单声道
+    // 最近一个 WAV 头的格式, 用于解码其后的 PCM 续帧
+    this.pcmFormat = { sampleRate: this.expectedSampleRate, numChannels: 1, bitsPerSample: 16 };
     this.isStreaming = false;
     this.mediaIdCounter = 0;
     this.mediaMap = new Map();
     this.isContextSuspended = false;
+    // 音频按到达顺序解码、追加 (mp3 / opus 的解码是异步的)
+    this.decodeQueue = Promise.resolve();
+    // 当前这句话的 mp3 / opus 解码器 (WebCodecs)
+    this.packetDecoder = null;
 
     // 音量计算相关属性
     this.volume = 0; // 当前音量 (0-1)
@@ -168,34 +219,55 @@ export default class StreamAudioPlayer {
   }
 
   /**
-   * 添加 base64 编码的 WAV 音频数据
+   * 添加 say_aloud 事件的音频, format 为:
+   *   - "wav" (一句话的开头, 带 WAV 头) 或 "pcm" (同一句话的后续 PCM 续帧)
+   *   - 压缩格式 "mulaw" / "ima_adpcm" / "mp3" / "opus" (见 backend/tts/codecs.py),
+   *     event 为事件本身 (sample_rate, channels; 一句话的第一条带 first)
+   *   - 不带 sample_rate 的 "mp3": TTS 直接输出的完整 mp3 文件
    */
-  async addWavData(base64WavData) {
+  async addAudioData(data, format = 'wav', event = {}) {
+    switch (format) {
+      case 'pcm':
+        return this.addPcmData(data);
+      case 'mulaw':
+        return this.addDecodedData(async () => this.toContextRate(this.decodeMulaw(this.toArrayBuffer(data)), event));
+      case 'ima_adpcm':
+        return this.addDecodedData(async () => this.toContextRate(this.decodeImaAdpcm(this.toArrayBuffer(data), event.channels || 1), event));
+      case 'mp3':
+      case 'opus':
+        if (event.sample_rate === undefined) {
+          return this.addDecodedData(async () => this.decodeAudioFile(this.toArrayBuffer(data)));
+        }
+        return this.addDecodedData(async () => this.decodePackets(this.toArrayBuffer(data), format, event));
+      default:
+        return this.addWavData(data);
+    }
+  }
+
+  /**
+   * 添加 WAV 音频数据 (base64 字符串或二进制帧中的 ArrayBuffer)
+   */
+  async addWavData(wavData) {
+    return this.addDecodedData(async () => this.decodeWavData(this.toArrayBuffer(wavData)));
+  }
+
+  /**
+   * 添加 PCM 续帧 (格式与之前最近的 WAV 头相同)
+   */
+  async addPcmData(pcmData) {
+    return this.addDecodedData(async () => this.decodePcmData(this.toArrayBuffer(pcmData)));
+  }
+
+  async addDecodedData(decode) {
     if (!this.isStreaming) {
       console.warn('Stream not started. Call startStream() first.');
       return -1;
     }
 
-    try {
-      const mediaId = ++this.mediaIdCounter;
-      
-      // 解码 base64
-      let binaryString;
-      if (base64WavData.startsWith('data:audio/wav;base64,')) {
-        // 如果包含data URL前缀，移除它
-        const base64Data = base64WavData.split(',')[1];
-        binaryString = atob(base64Data);
-      } else {
-        binaryString = atob(base64WavData);
-      }
-      
-      const bytes = new Uint8Array(binaryString.length);
-      for (let i = 0; i < binaryString.length; i++) {
-        bytes[i] = binaryString.charCodeAt(i);
-      }
-      
-      // 解析WAV并获取音频数据
-      const audioData = await this.decodeWavData(bytes.buffer);
+    const mediaId = ++this.mediaIdCounter;
+    const task = this.decodeQueue.then(async () => {
+      // 解析音频数据
+      const audioData = await decode();
       
       // 添加到缓冲区
       this.appendAudioData(audioData);
@@ -204,14 +276,197 @@ export default class StreamAudioPlayer {
         timestamp: Date.now(),
         endTime: this.getTotalDuration()
       });
-      
+    });
+    this.decodeQueue = task.catch(() => {});
+
+    try {
+      await task;
       return mediaId;
     } catch (error) {
-      console.error('Failed to add WAV data:', error);
+      console.error('Failed to add audio data:', error);
       return -1;
     }
   }
 
+  /**
+   * base64 字符串 (可带 data URL 前缀) 或 ArrayBuffer -> ArrayBuffer
+   */
+  toArrayBuffer(data) {
+    if (data instanceof ArrayBuffer) {
+      // 二进制帧, 无需解码
+      return data;
+    }
+
+    // 解码 base64
+    let binaryString;
+    if (data.startsWith('data:')) {
+      // 如果包含data URL前缀，移除它
+      binaryString = atob(data.split(',')[1]);
+    } else {
+      binaryString = atob(data);
+    }
+    
+    const bytes = new Uint8Array(binaryString.length);
+    for (let i = 0; i < binaryString.length; i++) {
+      bytes[i] = binaryString.charCodeAt(i);
+    }
+    return bytes.buffer;
+  }
+
+  /**
+   * 解码 PCM 续帧
+   */
+  decodePcmData(pcmArrayBuffer) {
+    const { sampleRate, numChannels, bitsPerSample } = this.pcmFormat;
+    const bytesPerFrame = numChannels * bitsPerSample / 8;
+    const size = pcmArrayBuffer.byteLength - pcmArrayBuffer.byteLength % bytesPerFrame;
+    let audioData = this.extractAudioData(new DataView(pcmArrayBuffer), 0, size, numChannels, bitsPerSample);
+    if (sampleRate !== this.audioContext.sampleRate) {
+      audioData = this.resampleAudioData(audioData, sampleRate, this.audioContext.sampleRate, numChannels);
+    }
+    return audioData;
+  }
+
+  /**
+   * 重采样到音频上下文的采样率 (event.sample_rate, event.channels 为音频的格式)
+   */
+  toContextRate(audioData, event) {
+    const sampleRate = event.sample_rate || this.expectedSampleRate;
+    if (sampleRate !== this.audioContext.sampleRate) {
+      audioData = this.resampleAudioData(audioData, sampleRate, this.audioContext.sampleRate, event.channels || 1);
+    }
+    return audioData;
+  }
+
+  /**
+   * 解码 μ-law: 每个字节一个采样
+   */
+  decodeMulaw(arrayBuffer) {
+    const codes = new Uint8Array(arrayBuffer);
+    const audioData = new Float32Array(codes.length);
+    for (let i = 0; i < codes.length; i++) {
+      audioData[i] = MULAW_TABLE[codes[i]];
+    }
+    return audioData;
+  }
+
+  /**
+   * 解码 IMA ADPCM: [每声道采样数 uint32][每声道 {预测值 int16, 步长索引 uint8, 0}][4 位编码 (低半字节在前)]
+   * 每条消息带有解码器的初始状态, 可独立解码
+   */
+  decodeImaAdpcm(arrayBuffer, numChannels) {
+    const view = new DataView(arrayBuffer);
+    const total = view.getUint32(0, true) * numChannels;
+    const predictors = [];
+    const indices = [];
+    for (let c = 0; c < numChannels; c++) {
+      predictors.push(view.getInt16(4 + c * 4, true));
+      indices.push(view.getUint8(6 + c * 4));
+    }
+    const codes = new Uint8Array(arrayBuffer, 4 + numChannels * 4);
+
+    const audioData = new Float32Array(total);
+    for (let i = 0; i < total; i++) {
+      const c = i % numChannels;
+      const code = (codes[i >> 1] >> ((i & 1) * 4)) & 0x0F;
+      const step = IMA_STEPS[indices[c]];
+      let delta = step >> 3;
+      if (code & 4) delta += step;
+      if (code & 2) delta += step >> 1;
+      if (code & 1) delta += step >> 2;
+      predictors[c] = code & 8 ? Math.max(predictors[c] - delta, -32768) : Math.min(predictors[c] + delta, 32767);
+      indices[c] = Math.min(Math.max(indices[c] + IMA_INDEX[code], 0), 88);
+      audioData[i] = predictors[c] / 32768;
+    }
+    return audioData;
+  }
+
+  /**
+   * 解码 mp3 / opus 包: [长度 uint16][包]...; 同一句话的包依次送入同一个 WebCodecs 解码器
+   */
+  async decodePackets(arrayBuffer, format, event) {
+    let state = this.packetDecoder;
+    if (event.first || !state || state.format !== format) {
+      if (state && state.decoder.state !== 'closed') {
+        state.decoder.close();
+      }
+      state = { format, decoded: [], received: 0, timestamp: 0, waiter: null };
+      state.decoder = new AudioDecoder({
+        output: (audioData) => {
+          state.decoded.push(this.copyAudioData(audioData));
+          audioData.close();
+          state.received++;
+          if (state.waiter && state.received >= state.waiter.expected) {
+            state.waiter.done();
+          }
+        },
+        error: (error) => console.error('Audio decoder error:', error),
+      });
+      state.decoder.configure({ codec: format, sampleRate: event.sample_rate, numberOfChannels: event.channels || 1 });
+      this.packetDecoder = state;
+    }
+
+    const view = new DataView(arrayBuffer);
+    let expected = state.received;
+    for (let offset = 0; offset + 2 <= arrayBuffer.byteLength;) {
+      const length = view.getUint16(offset, true);
+      const data = new Uint8Array(arrayBuffer, offset + 2, length);
+      state.decoder.decode(new EncodedAudioChunk({ type: 'key', timestamp: state.timestamp++, data }));
+      offset += 2 + length;
+      expected++;
+    }
+
+    // 每个包输出一段音频; 不 flush (会重置解码器状态), 除非输出迟迟不到
+    await new Promise(resolve => {
+      const timer = setTimeout(() => state.decoder.flush().then(done, done), PACKET_DECODE_TIMEOUT_MS);
+      const done = () => {
+        clearTimeout(timer);
+        state.waiter = null;
+        resolve();
+      };
+      state.waiter = { expected, done };
+      if (state.received >= expected) {
+        done();
+      }
+    });
+
+    const decoded = state.decoded;
+    state.decoded = [];
+    const audioData = new Float32Array(decoded.reduce((size, part) => size + part.samples.length, 0));
+    let offset = 0;
+    for (const part of decoded) {
+      audioData.set(part.samples, offset);
+      offset += part.samples.length;
+    }
+    const sampleRate = decoded.length > 0 ? decoded[0].sampleRate : event.sample_rate;
+    return this.toContextRate(audioData, { sample_rate: sampleRate, channels: event.channels });
+  }
+
+  /**
+   * WebCodecs AudioData -> 交错的 Float32Array
+   */
+  copyAudioData(audioData) {
+    const frames = audioData.numberOfFrames;
+    const channels = audioData.numberOfChannels;
+    const samples = new Float32Array(frames * channels);
+    const plane = new Float32Array(frames);
+    for (let c = 0; c < channels; c++) {
+      audioData.copyTo(plane, { planeIndex: c, format: 'f32-planar' });
+      for (let i = 0; i < frames; i++) {
+        samples[i * channels + c] = plane[i];
+      }
+    }
+    return { samples, sampleRate: audioData.sampleRate };
+  }
+
+  /**
+   * 解码完整的音频文件 (例如 TTS 直接输出的 mp3)
+   */
+  async decodeAudioFile(arrayBuffer) {
+    const audioBuffer = await this.audioContext.decodeAudioData(arrayBuffer);
+    return audioBuffer.getChannelData(0);
+  }
+
   async waitUntilFinish(mediaId) {
     const mediaInfo = this.mediaMap.get(mediaId);
     if (!mediaInfo) {
@@ -297,6 +552,8 @@ export default class StreamAudioPlayer {
         
         // 更新通道数
         this.numChannels = numChannels;
+        // 之后的 PCM 续帧沿用这个格式
+        this.pcmFormat = { sampleRate, numChannels, bitsPerSample };
         
         break;
       }
@@ -452,6 +709,11 @@ export default class StreamAudioPlayer {
     
     this.audioBuffer = null;
     this.mediaMap.clear();
+
+    if (this.packetDecoder && this.packetDecoder.decoder.state !== 'closed') {
+      this.packetDecoder.decoder.close();
+    }
+    this.packetDecoder = null;
   }
 
   destroy() {
@@ -1,3 +1,21 @@
+/**
+ * 解码二进制帧: [header 长度 (uint32, 大端)][header (utf-8 JSON)][payload (原始字节)]
+ * payload 以 ArrayBuffer 形式放回 header.data[header.payload_key]
+ * @param {ArrayBuffer} buffer
+ * @returns {Object} 与 JSON 文本消息结构相同的消息对象
+ */
+export function decodeBinaryFrame(buffer) {
+    const headerLength = new DataView(buffer).getUint32(0, false);
+    const headerEnd = 4 + headerLength;
+    const message = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 4, headerLength)));
+    const payloadKey = message.payload_key || 'media_data';
+    delete message.payload_key;
+    if (message.data && typeof message.data === 'object') {
+        message.data[payloadKey] = buffer.slice(headerEnd);
+    }
+    return message;
+}
+
 export default class FrontendAgent extends EventTarget {
     constructor(serverUrl, agentName) {
         super();
@@ -15,15 +33,40 @@ export default class FrontendAgent extends EventTarget {
         this.reconnectAttempts = 0;
         this.maxReconnectAttempts = 5;
         this.reconnectInterval = 3000;
+
+        // 向服务器声明的连接能力
+        this.capabilities = ['binary_frames'];
+        // 能解码的 say_aloud 音频格式 (由服务器转告智能体, 见 StreamAudioPlayer.supportedFormats)
+        this.audioFormats = ['wav'];
+    }
+
+    /**
+     * 发送 hello: 协商连接能力, 声明能解码的音频格式
+     */
+    sendHello() {
+        this.ws.send(JSON.stringify({ type: 'hello', capabilities: this.capabilities, audio_formats: this.audioFormats }));
+    }
+
+    /**
+     * 更新能解码的音频格式 (已连接时重新发送 hello)
+     * @param {string[]} formats
+     */
+    setAudioFormats(formats) {
+        this.audioFormats = formats;
+        if (this.ws && this.ws.readyState === WebSocket.OPEN) {
+            this.sendHello();
+        }
     }
 
     connect() {
         try {
             this.ws = new WebSocket(`${this.serverUrl}/ws/frontend/${this.agentName}`); // 连接到指定的 agent
+            this.ws.binaryType = 'arraybuffer';
             
             this.ws.onopen = () => {
                 console.log('WebSocket connection opened');
                 this.reconnectAttempts = 0;
+                this.sendHello(); // 协商连接能力
                 this.dispatchEvent(new CustomEvent('connection', { 
                     detail: { status: 'connected' } 
                 }));
@@ -31,9 +74,17 @@ export default class FrontendAgent extends EventTarget {
 
             this.ws.onmessage = (event) => {
                 try {
-                    const message = JSON.parse(event.data);
+                    const message = event.data instanceof ArrayBuffer
+                        ? decodeBinaryFrame(event.data)
+                        : JSON.parse(event.data);
 
                     console.log(message);
+
+                    if (message.type === 'system' && message.request === 'hello') {
+                        // 智能体 (重新) 连接, 服务器请求重新声明音频格式
+                        this.sendHello();
+                        return;
+                    }
                     
                     if (message.data && typeof message.data === 'object' && message.data.type) {
                         // 触发特定事件类型